@@ -0,0 +1,151 @@
+"""Compare the context-tracking AdvNodeVisitor with NodeVisitor, with
+the baseline implementation of both (copied below), and with the
+implementation that preceded the current context tracking.
+
+The baseline looked up handlers with getattr() on each node, pushed a
+(node, field, index) tuple per node, and passed the field and index to
+each visit() call as keyword arguments. Unlike the current classes, it
+also visits the primitive fields of each node and does not prune. The
+preceding implementation tracked context as the baseline did, but
+already used the current dispatch tables and traversal of NodeVisitor,
+so it isolates the cost of the context tracking itself.
+
+Usage: python bench_adv.py [num_functions]
+"""
+
+
+import sys
+
+from iast.node import AST
+from iast.visitor import NodeVisitor, AdvNodeVisitor, _get_handler
+
+from bench_visit import make_wide
+import corpus
+
+
+class BaselineNodeVisitor:
+
+    @classmethod
+    def run(cls, tree, *args, **kargs):
+        visitor = cls(*args, **kargs)
+        result = visitor.process(tree)
+        return result
+
+    def process(self, tree):
+        result = self.visit(tree)
+        return result
+
+
+class BaselineAdvNodeVisitor(BaselineNodeVisitor):
+
+    def process(self, tree):
+        self._visit_stack = []
+        result = super().process(tree)
+        assert len(self._visit_stack) == 0, 'Visit stack unbalanced'
+        return result
+
+    def visit(self, tree, *args, **kargs):
+        if isinstance(tree, AST):
+            return self.node_visit(tree, *args, **kargs)
+        elif isinstance(tree, tuple):
+            return self.seq_visit(tree, *args, **kargs)
+        else:
+            return tree
+
+    def node_visit(self, node, *args, _field=None, _index=None, **kargs):
+        entry = (node, _field, _index)
+        self._visit_stack.append(entry)
+
+        method = 'visit_' + node.__class__.__name__
+        visitor = getattr(self, method, self.generic_visit)
+        result = visitor(node, *args, **kargs)
+
+        self._visit_stack.pop()
+        return result
+
+    def seq_visit(self, seq, *args, **kargs):
+        for i, item in enumerate(seq):
+            self.visit(item, _index=i, *args, **kargs)
+
+    def generic_visit(self, node, *args, **kargs):
+        for field in node._fields:
+            value = getattr(node, field)
+            self.visit(value, _field=field, *args, **kargs)
+
+
+class PrecedingAdvNodeVisitor(NodeVisitor):
+
+    def process(self, tree):
+        self._visit_stack = []
+        result = super().process(tree)
+        assert len(self._visit_stack) == 0, 'Visit stack unbalanced'
+        return result
+
+    def visit(self, tree, *args, **kargs):
+        if isinstance(tree, AST):
+            return self.node_visit(tree, *args, **kargs)
+        elif isinstance(tree, tuple):
+            return self.seq_visit(tree, *args, **kargs)
+        else:
+            return tree
+
+    def node_visit(self, node, *args, _field=None, _index=None, **kargs):
+        entry = (node, _field, _index)
+        self._visit_stack.append(entry)
+
+        node_cls = node.__class__
+        try:
+            handler = self._dispatch[node_cls]
+        except KeyError:
+            handler = _get_handler(type(self), node_cls)
+        if handler is None:
+            result = self.generic_visit(node, *args, **kargs)
+        else:
+            result = handler(self, node, *args, **kargs)
+
+        self._visit_stack.pop()
+        return result
+
+    def seq_visit(self, seq, *args, **kargs):
+        for i, item in enumerate(seq):
+            self.visit(item, _index=i, *args, **kargs)
+
+    def generic_visit(self, node, *args, **kargs):
+        fields = node._child_fields
+        if fields is None or self._visit_primitives:
+            fields = node._fields
+        for field in fields:
+            value = getattr(node, field)
+            self.visit(value, _field=field, *args, **kargs)
+
+
+def make_classes(base):
+    class NamesInCalls(base):
+        """Count the Names that are the function of a call."""
+        def process(self, tree):
+            self.count = 0
+            super().process(tree)
+            return self.count
+        def visit_Name(self, node):
+            if base is not NodeVisitor:
+                if self._visit_stack[-1][1] == 'func':
+                    self.count += 1
+    return NamesInCalls
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    tree = make_wide(n)
+    bases = [NodeVisitor, BaselineAdvNodeVisitor, PrecedingAdvNodeVisitor,
+             AdvNodeVisitor]
+    classes = [make_classes(base) for base in bases]
+    assert classes[1].run(tree) == classes[2].run(tree) == classes[3].run(tree)
+
+    print('{:<24} {:>12}'.format('class', 'time'))
+    for base, cls in zip(bases, classes):
+        t = corpus.timeit(lambda: cls.run(tree), repeat=10)
+        print('{:<24} {:>11.4f}s'.format(base.__name__, t))
+
+
+if __name__ == '__main__':
+    main()
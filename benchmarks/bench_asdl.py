@@ -0,0 +1,65 @@
+"""Measure tokenizing and parsing of synthetic ASDL grammars of
+growing size, and of the bundled Python grammar for reference.
+
+Usage: python bench_asdl.py [max_constructors]
+"""
+
+
+import sys
+
+from iast.asdl import py_asdl34_filename
+from iast.asdl.asdl import tokenize_asdl, ASDLParser
+
+import corpus
+
+
+def make_grammar(n):
+    """Return the source of an ASDL module with n constructors,
+    spread over sum types of ten constructors each. Each constructor
+    has a few fields of varied quantifiers, and each sum has
+    attributes and a comment, as in Python.asdl.
+    """
+    lines = ['-- Synthetic grammar with {} constructors'.format(n),
+             'module Synthetic', '{']
+    ntypes = (n + 9) // 10
+    lines.append('    top = Root(t0* body)')
+    for t in range(ntypes):
+        conses = []
+        for c in range(t * 10, min(n, (t + 1) * 10)):
+            other = 't{}'.format((t + c) % ntypes)
+            conses.append('C{}(t{} left, {}? right, identifier* names, '
+                          'int n)'.format(c, t, other))
+        lines.append('    -- type number {}'.format(t))
+        lines.append('    t{} = '.format(t) +
+                     '\n        | '.join(conses))
+        lines.append('        attributes (int lineno, int col_offset)')
+    lines.append('    pair = (t0 first, t0 second)')
+    lines.append('}')
+    return '\n'.join(lines) + '\n'
+
+
+def main():
+    limit = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    sizes = []
+    n = 10
+    while n <= limit:
+        sizes.append(n)
+        n *= 10
+
+    with open(py_asdl34_filename, 'rt') as file:
+        inputs = [('Python34.asdl', file.read())]
+    inputs.extend(('{} constructors'.format(n), make_grammar(n))
+                  for n in sizes)
+
+    print('{:<20} {:>10} {:>12} {:>12} {:>12}'.format(
+          'grammar', 'tokens', 'tokenize (s)', 'parse (s)', 'us/token'))
+    for label, source in inputs:
+        ntokens = len(list(tokenize_asdl(source)))
+        t_tok = corpus.timeit(lambda: list(tokenize_asdl(source)))
+        t_parse = corpus.timeit(lambda: ASDLParser().parse(source))
+        print('{:<20} {:>10} {:>12.6f} {:>12.6f} {:>12.3f}'.format(
+              label, ntokens, t_tok, t_parse, 1e6 * t_parse / ntokens))
+
+
+if __name__ == '__main__':
+    main()
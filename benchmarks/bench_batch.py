@@ -0,0 +1,52 @@
+"""Measure the throughput of NodeTransformer.run_many() over many
+modules as the number of worker processes grows, with trees sent
+between processes in the iast.binary encoding and as pickles. One
+worker means processing in the calling process, where the encoding
+does not matter.
+
+Usage: python bench_batch.py [num_modules [functions_per_module]]
+"""
+
+
+import os
+import sys
+
+import iast.python.python34 as L
+from iast.visitor import NodeTransformer
+
+from bench_visit import make_wide
+import corpus
+
+
+class Rename(NodeTransformer):
+    def visit_Name(self, node):
+        if node.id == 'y':
+            return node._replace(id='z')
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    k = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    trees = [make_wide(k) for _ in range(n)]
+    # Keep only the classes, in case py_nodes has other entries.
+    nodes = {name: cls for name, cls in L.py_nodes.items()
+             if isinstance(cls, type)}
+    exp = [Rename.run(tree) for tree in trees]
+    assert list(Rename.run_many(trees, workers=2, nodes=nodes)) == exp
+
+    counts = [1]
+    while counts[-1] * 2 <= max(4, os.cpu_count() or 1):
+        counts.append(counts[-1] * 2)
+    print('{:<10} {:>16} {:>16}'.format('workers', 'binary', 'pickle'))
+    for workers in counts:
+        row = []
+        for shipped in [nodes, None]:
+            t = corpus.timeit(lambda: list(Rename.run_many(
+                trees, workers=workers, nodes=shipped,
+                chunksize=32)), repeat=3)
+            row.append('{:>7.0f} trees/s'.format(n / t))
+        print('{:<10} {:>16} {:>16}'.format(workers, *row))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,83 @@
+"""Measure node construction and _replace() throughput, for node
+classes with generated methods versus the generic simplestruct path,
+along with the cost of creating the classes.
+
+The "classes" column is the time taken by nodes_from_asdl() for the
+Python 3.4 grammar, and "first use" adds building one statement with
+the new classes, which is when generated methods get compiled (for
+the 9 classes involved). The "typed unchecked" row builds typed nodes
+inside unchecked().
+
+Usage: python bench_construct.py [num_statements]
+"""
+
+
+import sys
+from contextlib import ExitStack
+
+from iast.asdl import python34_asdl
+from iast.node import nodes_from_asdl, unchecked
+
+import corpus
+
+
+def make_module(L, n):
+    """Return a Module with n small statements, using the node
+    classes in mapping L.
+    """
+    body = []
+    for i in range(n):
+        expr = L['BinOp'](L['Name']('x', L['Load']()), L['Add'](),
+                          L['Call'](L['Name']('f', L['Load']()),
+                                    (L['Num'](i),), (), None, None))
+        body.append(L['Assign']((L['Name']('v', L['Store']()),), expr))
+    return L['Module'](tuple(body))
+
+
+def replace_all(tree):
+    """Call _replace() on each statement of a module, and on the
+    module itself, as a transformer would along changed paths.
+    """
+    body = tuple(stmt._replace(value=stmt.value._replace(
+                                         left=stmt.value.right))
+                 for stmt in tree.body)
+    return tree._replace(body=body)
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    
+    print('{:<20} {:>9} {:>12} {:>12} {:>14} {:>14}'.format(
+          'mode', 'codegen', 'classes ms', 'first use ms',
+          'construct/s', 'replace/s'))
+    for label, kargs in [('untyped', {}),
+                         ('typed', {'typed': True}),
+                         ('typed compact', {'typed': True,
+                                            'compact': True}),
+                         ('typed unchecked', {'typed': True,
+                                              'compact': True,
+                                              'trusted': True}),
+                         ('compact interned', {'compact': True,
+                                               'interned': True})]:
+        trusted = kargs.pop('trusted', False)
+        for codegen in [False, True]:
+            def make_classes():
+                return nodes_from_asdl(python34_asdl, codegen=codegen,
+                                       **kargs)
+            t_classes = corpus.timeit(make_classes)
+            t_first = corpus.timeit(lambda: make_module(make_classes(), 1))
+            L = make_classes()
+            with unchecked() if trusted else ExitStack():
+                tree = make_module(L, n)
+                count = corpus.count_nodes(tree)
+                t_make = corpus.timeit(lambda: make_module(L, n))
+                t_repl = corpus.timeit(lambda: replace_all(tree))
+            # Each statement's replacement rebuilds two nodes.
+            print('{:<20} {:>9} {:>12.1f} {:>12.1f} {:>14.0f} {:>14.0f}'
+                  .format(label, str(codegen), 1000 * t_classes,
+                          1000 * t_first, count / t_make,
+                          (2 * n + 1) / t_repl))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,48 @@
+"""Compare running several analysis visitors one after another with
+running them in one fused traversal (iast.visitor.run_fused()), on a
+tree of many small functions.
+
+Usage: python bench_fuse.py [num_functions [num_visitors]]
+"""
+
+
+import sys
+
+from iast.visitor import NodeVisitor, run_fused
+
+from bench_visit import make_wide
+import corpus
+
+
+def make_counter(node_type):
+    """Return a visitor class counting the nodes of the given type."""
+    class Counter(NodeVisitor):
+        def process(self, tree):
+            self.count = 0
+            super().process(tree)
+            return self.count
+        def count_node(self, node):
+            self.count += 1
+    setattr(Counter, 'visit_' + node_type, Counter.count_node)
+    return Counter
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    k = int(sys.argv[2]) if len(sys.argv) > 2 else 4
+    tree = make_wide(n)
+    node_types = ['Name', 'Num', 'Str', 'Attribute', 'arg', 'Load']
+    visitors = [make_counter(node_types[i % len(node_types)])
+                for i in range(k)]
+    assert run_fused(tree, visitors) == [v.run(tree) for v in visitors]
+
+    print('{:<10} {:>12} {:>12}'.format('visitors', 'separate', 'fused'))
+    for count in range(1, k + 1):
+        vs = visitors[:count]
+        t_sep = corpus.timeit(lambda: [v.run(tree) for v in vs], repeat=10)
+        t_fused = corpus.timeit(lambda: run_fused(tree, vs), repeat=10)
+        print('{:<10} {:>11.4f}s {:>11.4f}s'.format(count, t_sep, t_fused))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,93 @@
+"""Measure hashing and comparison of large trees, whose node hashes
+are cached at construction. For reference, the same operations are
+timed with an uncached recursive hash and comparison, as computed by
+simplestruct.Struct.
+
+Usage: python bench_hash.py [num_statements [depth]]
+"""
+
+
+import sys
+
+from simplestruct.struct import hash_seq
+
+import iast.python.python34 as L
+from iast.node import AST
+
+import corpus
+
+
+def make_module(n, depth):
+    """Return a Module of n statements. Each statement assigns to a
+    variable a chain of additions nested to the given depth.
+    """
+    body = []
+    for i in range(n):
+        expr = L.Num(i)
+        for j in range(depth):
+            expr = L.BinOp(expr, L.Add(), L.Name('x' + str(j), L.Load()))
+        body.append(L.Assign((L.Name('v' + str(i), L.Store()),), expr))
+    return L.Module(tuple(body))
+
+
+def uncached_hash(value):
+    """Recursive hash, as computed by simplestruct.Struct.__hash__()."""
+    if isinstance(value, AST):
+        return hash_seq(uncached_hash(v) for v in value)
+    elif isinstance(value, tuple):
+        return hash(tuple(uncached_hash(v) for v in value))
+    else:
+        return hash(value)
+
+
+def uncached_eq(value1, value2):
+    """Recursive equality, as computed by simplestruct.Struct.__eq__()."""
+    if isinstance(value1, AST):
+        return (type(value1) == type(value2) and
+                all(uncached_eq(v1, v2) for v1, v2 in zip(value1, value2)))
+    elif isinstance(value1, tuple):
+        return (isinstance(value2, tuple) and len(value1) == len(value2) and
+                all(uncached_eq(v1, v2) for v1, v2 in zip(value1, value2)))
+    else:
+        return value1 == value2
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    depth = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+    sys.setrecursionlimit(max(sys.getrecursionlimit(), 10 * depth + 1000))
+    
+    t = corpus.timeit(lambda: make_module(n, depth), repeat=1)
+    print('construct module ({} stmts, depth {}): {:.3f}s'.format(
+          n, depth, t))
+    
+    tree1 = make_module(n, depth)
+    tree2 = make_module(n, depth)
+    # Differs from tree1 only in its last statement.
+    tree3 = tree1._replace(body=tree1.body[:-1] +
+                                (L.Assign((L.Name('w', L.Store()),),
+                                          L.Num(0)),))
+    subtrees = [stmt.value for stmt in tree1.body]
+    
+    rows = [
+        ('hash(tree)',
+            lambda: hash(tree1),
+            lambda: uncached_hash(tree1)),
+        ('set of subtrees',
+            lambda: set(subtrees),
+            lambda: [uncached_hash(st) for st in subtrees]),
+        ('tree == equal tree',
+            lambda: tree1 == tree2,
+            lambda: uncached_eq(tree1, tree2)),
+        ('tree == unequal tree',
+            lambda: tree1 == tree3,
+            lambda: uncached_eq(tree1, tree3)),
+    ]
+    print('{:<24} {:>12} {:>12}'.format('operation', 'cached', 'uncached'))
+    for label, cached, uncached in rows:
+        print('{:<24} {:>11.6f}s {:>11.6f}s'.format(
+              label, corpus.timeit(cached), corpus.timeit(uncached)))
+
+
+if __name__ == '__main__':
+    main()
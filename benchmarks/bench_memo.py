@@ -0,0 +1,64 @@
+"""Compare NodeTransformer with MemoNodeTransformer on trees that share
+subtrees: a module whose functions all have the same body object, as
+substitution into a template produces, and an expression DAG in which
+each level adds its operand to itself, whose tree size doubles with
+each level. A tree without sharing is shown for comparison.
+
+Usage: python bench_memo.py [num_functions [dag_depth]]
+"""
+
+
+import sys
+
+import iast.python.python34 as L
+from iast.visitor import NodeTransformer, MemoNodeTransformer
+
+from bench_visit import make_wide
+import corpus
+
+
+def make_templated(n):
+    """Return a Module of n function definitions sharing one body."""
+    wide = make_wide(1)
+    func = wide.body[0]
+    return L.Module(tuple(func._replace(name='f' + str(i))
+                          for i in range(n)))
+
+
+def make_dag(depth):
+    """Return an expression of the given depth, each level of which
+    is a BinOp with the same object as both operands.
+    """
+    expr = L.Name('x', L.Load())
+    for _ in range(depth):
+        expr = L.BinOp(expr, L.Add(), expr)
+    return L.Module((L.Expr(expr),))
+
+
+def make_classes(transformer_base):
+    class Rename(transformer_base):
+        def visit_Name(self, node):
+            if node.id in ['x', 'y']:
+                return node._replace(id='z')
+    return Rename
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    depth = int(sys.argv[2]) if len(sys.argv) > 2 else 16
+    trees = [('unshared ({} functions)'.format(n), make_wide(n)),
+             ('templated ({} functions)'.format(n), make_templated(n)),
+             ('dag (depth {})'.format(depth), make_dag(depth))]
+    plain = make_classes(NodeTransformer)
+    memo = make_classes(MemoNodeTransformer)
+
+    print('{:<28} {:>12} {:>12}'.format('tree', 'plain', 'memoized'))
+    for label, tree in trees:
+        assert plain.run(tree) == memo.run(tree)
+        times = [corpus.timeit(lambda: cls.run(tree), repeat=5)
+                 for cls in [plain, memo]]
+        print('{:<28} {:>11.4f}s {:>11.4f}s'.format(label, *times))
+
+
+if __name__ == '__main__':
+    main()
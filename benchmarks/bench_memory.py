@@ -0,0 +1,81 @@
+"""Measure the memory used per node by ordinary, compact, and interned
+node classes, on a corpus built from the standard library. For
+interned classes the node count is of the trees as written, so shared
+subtrees are counted at each occurrence.
+
+The "flat" row measures FlatTree encodings of typed compact trees
+(primitive values are shared with the trees, and not counted).
+
+Usage: python bench_memory.py [max_files]
+
+Requires tracemalloc (Python 3.4).
+"""
+
+
+import sys
+import gc
+import tracemalloc
+
+from iast.node import nodes_from_asdl
+from iast.flat import to_flat
+
+import corpus
+
+
+def measure(nodes, natives):
+    """Convert the native trees with the given node set, and return
+    the number of nodes and the number of bytes allocated to hold
+    them.
+    """
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    trees = [corpus.convert(tree, nodes) for tree in natives]
+    gc.collect()
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    count = sum(corpus.count_nodes(tree) for tree in trees)
+    return count, after - before
+
+
+def measure_flat(nodes, natives):
+    """Like measure(), but for the FlatTree encodings of the trees."""
+    trees = [corpus.convert(tree, nodes) for tree in natives]
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    flats = [to_flat(tree) for tree in trees]
+    gc.collect()
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    count = sum(len(flat) for flat in flats)
+    return count, after - before
+
+
+def main():
+    limit = int(sys.argv[1]) if len(sys.argv) > 1 else None
+    natives = corpus.native_corpus(limit)
+    grammar = corpus.python_asdl()
+    
+    print('{:<20} {:>10} {:>14} {:>10}'.format(
+          'mode', 'nodes', 'bytes', 'bytes/node'))
+    for label, kargs in [('untyped', {}),
+                         ('typed', {'typed': True}),
+                         ('untyped compact', {'compact': True}),
+                         ('typed compact', {'typed': True,
+                                            'compact': True}),
+                         ('compact interned', {'compact': True,
+                                               'interned': True})]:
+        nodes = nodes_from_asdl(grammar, **kargs)
+        count, size = measure(nodes, natives)
+        print('{:<20} {:>10} {:>14} {:>10.1f}'.format(
+              label, count, size, size / count))
+    
+    nodes = nodes_from_asdl(grammar, typed=True, compact=True)
+    count, size = measure_flat(nodes, natives)
+    print('{:<20} {:>10} {:>14} {:>10.1f}'.format(
+          'flat', count, size, size / count))
+
+
+if __name__ == '__main__':
+    main()
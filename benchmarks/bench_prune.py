@@ -0,0 +1,89 @@
+"""Measure how subtree kind summaries (nodes_from_asdl(...,
+summarized=True)) speed up passes that handle few node types, on a
+tree of many small functions of which only some contain the handled
+node type. The cost of building the tree with and without summaries
+is shown for comparison.
+
+Usage: python bench_prune.py [num_functions [lambda_every]]
+"""
+
+
+import sys
+
+from iast.asdl import python34_asdl
+from iast.node import AST, nodes_from_asdl
+from iast.visitor import (NodeVisitor, NodeTransformer,
+                          IterNodeVisitor, IterNodeTransformer)
+
+from bench_visit import make_wide
+import corpus
+
+
+def convert(tree, lang):
+    """Rebuild tree with the node classes of lang."""
+    if isinstance(tree, AST):
+        return lang[type(tree).__name__](*(convert(value, lang)
+                                           for value in tree))
+    elif isinstance(tree, tuple):
+        return tuple(convert(item, lang) for item in tree)
+    else:
+        return tree
+
+
+def add_lambdas(tree, every, lang):
+    """Replace the body of every every'th function of a Module from
+    make_wide() with a return of a lambda.
+    """
+    Lambda, arguments, Num, Return = (lang[name] for name in
+        ['Lambda', 'arguments', 'Num', 'Return'])
+    body = list(tree.body)
+    for i in range(0, len(body), every):
+        lam = Lambda(arguments((), None, (), (), None, ()), Num(i))
+        body[i] = body[i]._replace(body=(Return(lam),))
+    return tree._replace(body=tuple(body))
+
+
+def make_classes(visitor_base, transformer_base):
+    class CountLambdas(visitor_base):
+        def process(self, tree):
+            self.count = 0
+            super().process(tree)
+            return self.count
+        def visit_Lambda(self, node):
+            self.count += 1
+
+    class RewriteLambdas(transformer_base):
+        def visit_Lambda(self, node):
+            return node._replace(body=node.body._replace(n=0))
+
+    return [('count lambdas', CountLambdas),
+            ('rewrite lambdas', RewriteLambdas)]
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    every = int(sys.argv[2]) if len(sys.argv) > 2 else 100
+
+    wide = make_wide(n)
+    trees = []
+    for label, summarized in [('plain', False), ('summarized', True)]:
+        lang = nodes_from_asdl(python34_asdl, typed=True, compact=True,
+                               summarized=summarized)
+        t = corpus.timeit(lambda: convert(wide, lang), repeat=3)
+        print('build {:<12} {:.4f}s'.format(label, t))
+        trees.append(add_lambdas(convert(wide, lang), every, lang))
+    print()
+
+    print('{:<36} {:>12} {:>12}'.format('pass', 'plain', 'summarized'))
+    for engine, bases in [('recursive', (NodeVisitor, NodeTransformer)),
+                          ('iterative', (IterNodeVisitor,
+                                         IterNodeTransformer))]:
+        for label, cls in make_classes(*bases):
+            times = [corpus.timeit(lambda: cls.run(tree), repeat=10)
+                     for tree in trees]
+            print('{:<36} {:>11.4f}s {:>11.4f}s'.format(
+                  '{} ({})'.format(label, engine), *times))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,44 @@
+"""Compare the size and speed of the iast.binary format with pickle,
+on a corpus built from the standard library.
+
+Usage: python bench_serialize.py [max_files]
+"""
+
+
+import sys
+import pickle
+
+from iast.binary import Codec
+
+import corpus
+
+
+def main():
+    limit = int(sys.argv[1]) if len(sys.argv) > 1 else None
+    py_nodes = corpus.python_nodes()
+    trees = corpus.load_corpus(py_nodes, limit)
+    count = sum(corpus.count_nodes(tree) for tree in trees)
+    codec = Codec(py_nodes)
+    
+    # Protocol 3 is the default used by multiprocessing on Python 3.4.
+    formats = [
+        ('pickle 3', lambda tree: pickle.dumps(tree, 3), pickle.loads),
+        ('pickle', lambda tree: pickle.dumps(tree, pickle.HIGHEST_PROTOCOL),
+                   pickle.loads),
+        ('binary', codec.dumps, codec.loads),
+    ]
+    print('{} files, {} nodes'.format(len(trees), count))
+    print('{:<10} {:>14} {:>10} {:>10} {:>10}'.format(
+          'format', 'bytes', 'bytes/node', 'dump (s)', 'load (s)'))
+    for label, dumps, loads in formats:
+        blobs = [dumps(tree) for tree in trees]
+        assert [loads(blob) for blob in blobs] == trees
+        size = sum(len(blob) for blob in blobs)
+        t_dump = corpus.timeit(lambda: [dumps(tree) for tree in trees])
+        t_load = corpus.timeit(lambda: [loads(blob) for blob in blobs])
+        print('{:<10} {:>14} {:>10.1f} {:>10.3f} {:>10.3f}'.format(
+              label, size, size / count, t_dump, t_load))
+
+
+if __name__ == '__main__':
+    main()
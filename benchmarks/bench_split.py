@@ -0,0 +1,46 @@
+"""Compare transforming one large module in the calling process (run())
+with splitting its statements over worker processes (run_split()), as
+the number of workers grows. Trees are sent in the iast.binary
+encoding.
+
+Usage: python bench_split.py [num_functions]
+"""
+
+
+import os
+import sys
+
+import iast.python.python34 as L
+from iast.visitor import NodeTransformer
+
+from bench_visit import make_wide
+import corpus
+
+
+class Rename(NodeTransformer):
+    _context_free = True
+    def visit_Name(self, node):
+        if node.id == 'y':
+            return node._replace(id='z')
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    tree = make_wide(n)
+    nodes = {name: cls for name, cls in L.py_nodes.items()
+             if isinstance(cls, type)}
+    assert Rename.run_split(tree, workers=2, nodes=nodes) == Rename.run(tree)
+
+    print('{:<12} {:>12}'.format('workers', 'time'))
+    t = corpus.timeit(lambda: Rename.run(tree), repeat=3)
+    print('{:<12} {:>11.4f}s'.format('run()', t))
+    workers = 2
+    while workers <= max(4, os.cpu_count() or 1):
+        t = corpus.timeit(lambda: Rename.run_split(
+            tree, workers=workers, nodes=nodes), repeat=3)
+        print('{:<12} {:>11.4f}s'.format(workers, t))
+        workers *= 2
+
+
+if __name__ == '__main__':
+    main()
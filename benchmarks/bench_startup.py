@@ -0,0 +1,251 @@
+"""Measure the startup cost of iast entry points. Each entry point is
+run in a fresh interpreter, several times, and the fastest run is
+reported: the wall-clock time of the whole process, the time of the
+entry point's statement alone, and the process's peak RSS. With
+--top, the modules that took longest to import are listed for each
+entry point, from the interpreter's -X importtime output (Python 3.7
+and up).
+
+Entry points that build node sets from the bundled grammars are run
+with an empty node-class cache ("cold") and with a cache filled by a
+previous run ("warm"); see iast.nodegen.load_nodes(). Entry points
+that fail to run, such as those for a Python version other than the
+executing one, are reported and skipped.
+
+With --save, the results are written to the baseline file. Otherwise,
+if the baseline file exists, each result is compared to it, and
+results that are slower or larger by more than the tolerance are
+flagged. The exit status is 1 if any result is flagged. Baselines are
+specific to the machine and interpreter they were saved with.
+
+Usage: python bench_startup.py [--runs N] [--top N] [--tolerance T]
+                               [--baseline FILE] [--save]
+"""
+
+
+import sys
+import os
+import argparse
+import json
+import subprocess
+import tempfile
+import time
+from os.path import dirname, abspath, join
+
+
+# (label, statement, uses node-class cache)
+ENTRY_POINTS = [
+    ('import iast',
+        'import iast', False),
+    ('import iast.python.default',
+        'import iast.python.default', True),
+    ('import iast.python.python33',
+        'import iast.python.python33', True),
+    ('import iast.python.python34',
+        'import iast.python.python34', True),
+    ('nodes_from_asdl(python33_asdl)',
+        'from iast.asdl import python33_asdl; '
+        'from iast.node import nodes_from_asdl; '
+        'nodes_from_asdl(python33_asdl)', False),
+    ('nodes_from_asdl(python34_asdl)',
+        'from iast.asdl import python34_asdl; '
+        'from iast.node import nodes_from_asdl; '
+        'nodes_from_asdl(python34_asdl)', False),
+]
+
+# Code run by each child process. It prints the time taken by the
+# statement and the peak RSS in bytes (-1 if unavailable).
+CHILD_TEMPLATE = '''\
+import time as _time
+_start = _time.perf_counter()
+{stmt}
+_elapsed = _time.perf_counter() - _start
+try:
+    import resource as _resource
+except ImportError:
+    _rss = -1
+else:
+    _rss = _resource.getrusage(_resource.RUSAGE_SELF).ru_maxrss * {rss_unit}
+print(_elapsed, _rss)
+'''
+
+ROOT_DIR = dirname(dirname(abspath(__file__)))
+DEFAULT_BASELINE = join(dirname(abspath(__file__)), 'startup_baseline.json')
+
+
+class ChildError(Exception):
+    pass
+
+
+def parse_importtime(text):
+    """Given the stderr of an interpreter run with -X importtime,
+    return a list of (module name, self time, cumulative time)
+    triples, with times in seconds.
+    """
+    result = []
+    for line in text.splitlines():
+        if not line.startswith('import time:'):
+            continue
+        parts = line[len('import time:'):].split('|')
+        if len(parts) != 3:
+            continue
+        self_us, cumul_us, name = parts
+        try:
+            result.append((name.strip(), int(self_us) / 1e6,
+                           int(cumul_us) / 1e6))
+        except ValueError:
+            # Header line.
+            continue
+    return result
+
+
+def run_child(stmt, cache_dir, importtime):
+    """Run stmt in a fresh interpreter, with IAST_CACHE_DIR set to
+    cache_dir. Return a dict of the process's wall-clock time, the
+    statement's time, its peak RSS, and its import times (a list as
+    returned by parse_importtime(), empty if importtime is False).
+    Raise ChildError if the child fails.
+    """
+    # ru_maxrss is in bytes on OS X, and in kilobytes elsewhere.
+    rss_unit = 1 if sys.platform == 'darwin' else 1024
+    code = CHILD_TEMPLATE.format(stmt=stmt, rss_unit=rss_unit)
+    args = [sys.executable]
+    if importtime:
+        args.extend(['-X', 'importtime'])
+    args.extend(['-c', code])
+    env = dict(os.environ)
+    env['IAST_CACHE_DIR'] = cache_dir
+    start = time.perf_counter()
+    proc = subprocess.Popen(args, cwd=ROOT_DIR, env=env,
+                            stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                            universal_newlines=True)
+    out, err = proc.communicate()
+    total = time.perf_counter() - start
+    if proc.returncode != 0:
+        lines = err.strip().splitlines()
+        raise ChildError(lines[-1] if lines else
+                         'exit status {}'.format(proc.returncode))
+    elapsed, rss = out.split()
+    return {
+        'total': total,
+        'stmt': float(elapsed),
+        'rss': int(rss) if int(rss) >= 0 else None,
+        'imports': parse_importtime(err) if importtime else [],
+    }
+
+
+def measure(stmt, cache_state, runs, importtime):
+    """Run stmt the given number of times, and return the result of
+    the fastest run, with the minimum peak RSS over all runs.
+    cache_state is None if the statement doesn't use the node-class
+    cache, and otherwise 'cold' or 'warm'.
+    """
+    results = []
+    with tempfile.TemporaryDirectory() as tmpdir:
+        if cache_state == 'warm':
+            # Fill the cache.
+            run_child(stmt, tmpdir, False)
+        for i in range(runs):
+            if cache_state == 'cold':
+                cache_dir = join(tmpdir, str(i))
+            else:
+                cache_dir = tmpdir
+            results.append(run_child(stmt, cache_dir, importtime))
+    best = min(results, key=lambda r: r['stmt'])
+    rss = [r['rss'] for r in results if r['rss'] is not None]
+    best['rss'] = min(rss) if rss else None
+    return best
+
+
+def compare(result, base, tolerance):
+    """Return a list of descriptions of how result regressed relative
+    to base, or an empty list if it didn't.
+    """
+    regressions = []
+    for key, label in [('stmt', 'time'), ('rss', 'peak RSS')]:
+        new, old = result.get(key), base.get(key)
+        if new is None or old is None or old <= 0:
+            continue
+        ratio = new / old
+        if ratio > 1 + tolerance:
+            regressions.append('{} +{:.0%}'.format(label, ratio - 1))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Measure the startup cost of iast entry points.')
+    parser.add_argument('--runs', type=int, default=5,
+                        help='runs per entry point (default 5)')
+    parser.add_argument('--top', type=int, default=0,
+                        help='list the N slowest imports of each entry '
+                             'point')
+    parser.add_argument('--tolerance', type=float, default=0.2,
+                        help='relative slowdown or growth flagged as a '
+                             'regression (default 0.2)')
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE,
+                        help='baseline file (default {})'.format(
+                             DEFAULT_BASELINE))
+    parser.add_argument('--save', action='store_true',
+                        help='write the results to the baseline file')
+    args = parser.parse_args()
+
+    importtime = args.top > 0 and sys.version_info >= (3, 7)
+    baseline = None
+    if not args.save and os.path.exists(args.baseline):
+        with open(args.baseline, 'rt') as file:
+            baseline = json.load(file)
+
+    print('{:<38} {:>10} {:>10} {:>10}  {}'.format(
+          'entry point', 'total ms', 'stmt ms', 'RSS MiB',
+          'vs. baseline' if baseline is not None else ''))
+    results = {}
+    flagged = False
+    for label, stmt, cached in ENTRY_POINTS:
+        for cache_state in (['cold', 'warm'] if cached else [None]):
+            if cache_state is not None:
+                label_full = '{} ({})'.format(label, cache_state)
+            else:
+                label_full = label
+            try:
+                result = measure(stmt, cache_state, args.runs, importtime)
+            except ChildError as exc:
+                print('{:<38} failed: {}'.format(label_full, exc))
+                continue
+
+            status = ''
+            if baseline is not None:
+                if label_full in baseline:
+                    regressions = compare(result, baseline[label_full],
+                                          args.tolerance)
+                    if regressions:
+                        flagged = True
+                        status = 'REGRESSION: ' + ', '.join(regressions)
+                    else:
+                        status = 'ok'
+                else:
+                    status = 'new'
+            rss = ('{:>10.1f}'.format(result['rss'] / 2 ** 20)
+                   if result['rss'] is not None else '{:>10}'.format('-'))
+            print('{:<38} {:>10.1f} {:>10.1f} {}  {}'.format(
+                  label_full, 1000 * result['total'],
+                  1000 * result['stmt'], rss, status))
+
+            imports = sorted(result.pop('imports'),
+                             key=lambda imp: imp[1], reverse=True)
+            for name, self_t, cumul_t in imports[:args.top]:
+                print('    {:<34} {:>10.1f} {:>10.1f}  (self, cumulative)'
+                      .format(name, 1000 * self_t, 1000 * cumul_t))
+            results[label_full] = result
+
+    if args.top > 0 and not importtime:
+        print('(import breakdown needs Python 3.7 or later)')
+    if args.save:
+        with open(args.baseline, 'wt') as file:
+            json.dump(results, file, indent=2, sort_keys=True)
+        print('Saved baseline to {}'.format(args.baseline))
+    return 1 if flagged else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,94 @@
+"""Compare the recursive visitor engines (NodeVisitor, NodeTransformer)
+with the explicit-stack ones (IterNodeVisitor, IterNodeTransformer),
+on a wide tree of many small functions and on a deep chain of elif
+clauses. The recursive engines cannot traverse chains much longer
+than the recursion limit; these are reported as RecursionError.
+
+Usage: python bench_visit.py [num_functions [elif_depth]]
+"""
+
+
+import sys
+
+import iast.python.python34 as L
+from iast.visitor import (NodeVisitor, NodeTransformer,
+                          IterNodeVisitor, IterNodeTransformer)
+
+import corpus
+
+
+def make_wide(n):
+    """Return a Module of n function definitions, each returning a
+    method call on its argument.
+    """
+    body = []
+    for i in range(n):
+        call = L.Call(L.Attribute(L.Name('x', L.Load()), 'attr', L.Load()),
+                      (L.Str('s'), L.BinOp(L.Name('y', L.Load()), L.Add(),
+                                           L.Num(i))),
+                      (), None, None)
+        body.append(L.FunctionDef(
+            'f' + str(i),
+            L.arguments((L.arg('x', None),), None, (), (), None, ()),
+            (L.Return(call),), (), None))
+    return L.Module(tuple(body))
+
+
+def make_deep(depth):
+    """Return a Module whose only statement is an if statement with
+    the given number of elif clauses.
+    """
+    stmt = L.Pass()
+    for i in range(depth):
+        test = L.Compare(L.Name('x', L.Load()), (L.Eq(),), (L.Num(i),))
+        stmt = L.If(test, (L.Expr(L.Name('y', L.Load())),), (stmt,))
+    return L.Module((stmt,))
+
+
+def make_classes(visitor_base, transformer_base):
+    class NoOp(visitor_base):
+        pass
+
+    class CountNames(visitor_base):
+        def process(self, tree):
+            self.count = 0
+            super().process(tree)
+            return self.count
+        def visit_Name(self, node):
+            self.count += 1
+
+    class Rename(transformer_base):
+        def visit_Name(self, node):
+            if node.id == 'y':
+                return node._replace(id='z')
+
+    return [('no-op visitor', NoOp), ('count names', CountNames),
+            ('rename transformer', Rename)]
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    depth = int(sys.argv[2]) if len(sys.argv) > 2 else 5000
+    trees = [('wide ({} functions)'.format(n), make_wide(n)),
+             ('deep ({} elifs)'.format(depth), make_deep(depth))]
+    engines = [make_classes(NodeVisitor, NodeTransformer),
+               make_classes(IterNodeVisitor, IterNodeTransformer)]
+
+    print('{:<24} {:<20} {:>12} {:>12}'.format(
+          'tree', 'pass', 'recursive', 'iterative'))
+    for tree_label, tree in trees:
+        for (label, rec_cls), (_, iter_cls) in zip(*engines):
+            times = []
+            for cls in [rec_cls, iter_cls]:
+                try:
+                    t = corpus.timeit(lambda: cls.run(tree), repeat=10)
+                except RecursionError:
+                    times.append('RecursionError')
+                else:
+                    times.append('{:.4f}s'.format(t))
+            print('{:<24} {:<20} {:>12} {:>12}'.format(
+                  tree_label, label, *times))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,67 @@
+"""Compare the walk functions of iast.visitor (iter_nodes(), find_first())
+with visitors doing the same, on a tree of many small functions: one
+collecting all Name nodes, and one finding a node near the start of
+the tree by raising an exception, as the occurs check of pattern
+matching used to.
+
+Usage: python bench_walk.py [num_functions]
+"""
+
+
+import sys
+
+from iast.visitor import NodeVisitor, iter_nodes, find_first
+
+from bench_visit import make_wide
+import corpus
+
+
+class CollectNames(NodeVisitor):
+    def process(self, tree):
+        self.names = []
+        super().process(tree)
+        return self.names
+    def visit_Name(self, node):
+        self.names.append(node)
+
+
+class Found(Exception):
+    pass
+
+class FindNum(NodeVisitor):
+    def __init__(self, n):
+        super().__init__()
+        self.n = n
+    def process(self, tree):
+        try:
+            super().process(tree)
+        except Found as exc:
+            return exc.args[0]
+    def visit_Num(self, node):
+        if node.n == self.n:
+            raise Found(node)
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    tree = make_wide(n)
+    target = 10
+    assert list(iter_nodes(tree, ['Name'])) == CollectNames.run(tree)
+    assert (find_first(tree, lambda node: node.n == target, ['Num']) is
+            FindNum.run(tree, target))
+
+    print('{:<20} {:>12} {:>12}'.format('task', 'visitor', 'walk'))
+    t_visit = corpus.timeit(lambda: CollectNames.run(tree), repeat=10)
+    t_walk = corpus.timeit(lambda: list(iter_nodes(tree, ['Name'])),
+                           repeat=10)
+    print('{:<20} {:>11.4f}s {:>11.4f}s'.format('all names', t_visit,
+                                               t_walk))
+    t_visit = corpus.timeit(lambda: FindNum.run(tree, target), repeat=10)
+    t_walk = corpus.timeit(lambda: find_first(
+        tree, lambda node: node.n == target, ['Num']), repeat=10)
+    print('{:<20} {:>11.4f}s {:>11.4f}s'.format('find early', t_visit,
+                                               t_walk))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,112 @@
+"""Helpers shared by the benchmark scripts.
+
+The corpus is the standard library of the executing interpreter,
+parsed with the ast module and converted to Struct nodes. Since the
+conversion goes through native nodes, it requires an interpreter
+version supported by iast.python.native.
+"""
+
+
+import ast
+import os
+import sys
+import sysconfig
+
+
+def stdlib_files(limit=None):
+    """Return a sorted list of paths of standard library source
+    files, excluding test suites. If limit is given, return at
+    most that many.
+    """
+    libdir = sysconfig.get_paths()['stdlib']
+    paths = []
+    for dirpath, dirnames, filenames in os.walk(libdir):
+        dirnames[:] = sorted(d for d in dirnames
+                             if d not in ['test', 'tests', 'site-packages']
+                             if not d.startswith('idle_test'))
+        paths.extend(os.path.join(dirpath, fn)
+                     for fn in sorted(filenames) if fn.endswith('.py'))
+    if limit is not None:
+        paths = paths[:limit]
+    return paths
+
+
+def convert(tree, nodes):
+    """Convert a native AST to Struct nodes, using the given mapping
+    from node names to classes. Like iast.python.native.pyToStruct(),
+    but for any node set built from the interpreter's grammar.
+    """
+    if isinstance(tree, ast.AST):
+        out_type = nodes[tree.__class__.__name__]
+        return out_type(*(convert(getattr(tree, field, None), nodes)
+                          for field in tree._fields))
+    elif isinstance(tree, list):
+        return tuple(convert(item, nodes) for item in tree)
+    else:
+        return tree
+
+
+def native_corpus(limit=None):
+    """Return a list of native ASTs for the standard library."""
+    trees = []
+    for path in stdlib_files(limit):
+        with open(path, 'rb') as file:
+            source = file.read()
+        try:
+            trees.append(ast.parse(source, path))
+        except (SyntaxError, ValueError):
+            # Skip files with encodings or syntax we can't handle.
+            pass
+    return trees
+
+
+def load_corpus(nodes, limit=None):
+    """Return a list of Struct ASTs for the standard library, built
+    from the given node mapping.
+    """
+    return [convert(tree, nodes) for tree in native_corpus(limit)]
+
+
+def count_nodes(tree):
+    """Return the number of AST nodes in a Struct tree."""
+    from iast.node import AST
+    count = 0
+    stack = [tree]
+    while stack:
+        value = stack.pop()
+        if isinstance(value, AST):
+            count += 1
+            stack.extend(value)
+        elif isinstance(value, tuple):
+            stack.extend(value)
+    return count
+
+
+def python_nodes():
+    """Return the node set of iast.python for the executing
+    interpreter, whose classes can be pickled.
+    """
+    from iast.python.native import py_nodes
+    return py_nodes
+
+
+def python_asdl():
+    """Return the parsed ASDL grammar for the executing interpreter."""
+    from iast import asdl
+    if sys.version_info[:2] == (3, 3):
+        return asdl.python33_asdl
+    else:
+        return asdl.python34_asdl
+
+
+def timeit(func, repeat=3):
+    """Return the best wall-clock time of several calls to func."""
+    import time
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    return best
@@ -7,3 +7,4 @@ from .util import *
 from .node import *
 from .visitor import *
 from .pattern import *
+from .flat import *
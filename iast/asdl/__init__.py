@@ -11,19 +11,21 @@ covered by the PSF license. See also:
 
 Python33.asdl and Python34.asdl are from their respective versions
 of the CPython source distribution (Parser/Python.asdl). They are
-covered by the PSF license.
+covered by the PSF license. They are parsed on first access to this
+package's python33_asdl and python34_asdl attributes.
 """
 
 
 __all__ = [
     'parse_asdl',
     'primitive_types',
-    'python33_asdl',
-    'python34_asdl',
-    # ...
+    # python33_asdl and python34_asdl are also available, but are
+    # left out here so that star imports don't load them.
 ]
 
 
+import sys
+import types
 from os.path import join, dirname
 
 from .asdl import ASDLParser
@@ -44,7 +46,25 @@ def parse_asdl(asdl_source):
 
 py_asdl33_filename = join(dirname(__file__), 'Python33.asdl')
 py_asdl34_filename = join(dirname(__file__), 'Python34.asdl')
-with open(py_asdl33_filename, 'rt') as file:
-    python33_asdl = parse_asdl(file.read())
-with open(py_asdl34_filename, 'rt') as file:
-    python34_asdl = parse_asdl(file.read())
+
+# Parsed bundled grammars, by filename.
+_bundled = {}
+
+def _load_bundled(filename):
+    tree = _bundled.get(filename)
+    if tree is None:
+        with open(filename, 'rt') as file:
+            tree = _bundled[filename] = parse_asdl(file.read())
+    return tree
+
+class _ASDLPackage(types.ModuleType):
+    
+    # Module type of this package, with properties for the bundled
+    # grammars. (Module-level __getattr__() needs Python 3.7.)
+    
+    python33_asdl = property(lambda self: _load_bundled(py_asdl33_filename))
+    python34_asdl = property(lambda self: _load_bundled(py_asdl34_filename))
+
+_package = _ASDLPackage(__name__)
+_package.__dict__.update(globals())
+sys.modules[__name__] = _package
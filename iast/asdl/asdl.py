@@ -1,3 +1,9 @@
+# 10/16/26: Modified to tokenize with a single compiled pattern, and to
+#           parse from a token list ending in an EOF sentinel (or in an
+#           Error token, for a tokenizer error that is only raised if the
+#           parser gets that far). Unmatched token errors name the token
+#           kinds.
+
 #-------------------------------------------------------------------------------
 # Parser for ASDL [1] definition files. Reads in an ASDL description and parses
 # it into an AST that describes it.
@@ -203,12 +209,18 @@ def parse(filename):
 class TokenKind:
     """TokenKind is provides a scope for enumerated token kinds."""
     (ConstructorId, TypeId, Equals, Comma, Question, Pipe, Asterisk,
-     LParen, RParen, LBrace, RBrace) = range(11)
+     LParen, RParen, LBrace, RBrace, EOF, Error) = range(13)
 
     operator_table = {
         '=': Equals, ',': Comma,    '?': Question, '|': Pipe,    '(': LParen,
         ')': RParen, '*': Asterisk, '{': LBrace,   '}': RBrace}
 
+    names = {
+        ConstructorId: 'ConstructorId', TypeId: 'TypeId', Equals: 'Equals',
+        Comma: 'Comma', Question: 'Question', Pipe: 'Pipe',
+        Asterisk: 'Asterisk', LParen: 'LParen', RParen: 'RParen',
+        LBrace: 'LBrace', RBrace: 'RBrace', EOF: 'EOF', Error: 'Error'}
+
 Token = namedtuple('Token', 'kind value lineno')
 
 class ASDLSyntaxError(Exception):
@@ -219,44 +231,76 @@ class ASDLSyntaxError(Exception):
     def __str__(self):
         return 'Syntax error on line {0.lineno}: {0.msg}'.format(self)
 
+# Master pattern for the tokenizer. Each match consumes leading blanks,
+# then a line break, a comment, a word, or a single operator character.
+# Only the groups of interest are captured, so a comment yields three
+# empty strings.
+_token_re = re.compile(r'''
+    [ \t\f\v]*
+    (?: ( \r\n? | \n ) |
+        -- [^\r\n]* |
+        ( \w+ ) |
+        ( \S ) )
+    ''', re.VERBOSE)
+
 def tokenize_asdl(buf):
     """Tokenize the given buffer. Yield Token objects."""
-    for lineno, line in enumerate(buf.splitlines(), 1):
-        for m in re.finditer(r'\s*(\w+|--.*|.)', line.strip()):
-            c = m.group(1)
-            if c[0].isalpha():
-                # Some kind of identifier
-                if c[0].isupper():
-                    yield Token(TokenKind.ConstructorId, c, lineno)
-                else:
-                    yield Token(TokenKind.TypeId, c, lineno)
-            elif c[:2] == '--':
-                # Comment
-                break
+    op_table = TokenKind.operator_table
+    ConstructorId = TokenKind.ConstructorId
+    TypeId = TokenKind.TypeId
+    # Bypass the namedtuple's argument handling.
+    new_token = tuple.__new__
+    lineno = 1
+    for newline, word, op in _token_re.findall(buf):
+        if word:
+            c0 = word[0]
+            if c0.isupper():
+                yield new_token(Token, (ConstructorId, word, lineno))
+            elif c0.isalpha():
+                yield new_token(Token, (TypeId, word, lineno))
             else:
-                # Operators
-                try:
-                    op_kind = TokenKind.operator_table[c]
-                except KeyError:
-                    raise ASDLSyntaxError('Invalid operator %s' % c, lineno)
-                yield Token(op_kind, c, lineno)
+                raise ASDLSyntaxError('Invalid operator %s' % word, lineno)
+        elif op:
+            try:
+                op_kind = op_table[op]
+            except KeyError:
+                raise ASDLSyntaxError('Invalid operator %s' % op, lineno)
+            yield new_token(Token, (op_kind, op, lineno))
+        elif newline:
+            lineno += 1
 
 class ASDLParser:
     """Parser for ASDL files.
 
     Create, then call the parse method on a buffer containing ASDL.
     This is a simple recursive descent parser that uses tokenize_asdl for the
-    lexing.
+    lexing. The whole buffer is tokenized up front, and each production
+    decides what to do from the kind of the current token alone.
     """
     def __init__(self):
-        self._tokenizer = None
+        self._tokens = None
+        self._pos = 0
         self.cur_token = None
 
     def parse(self, buf):
         """Parse the ASDL in the buffer and return an AST with a Module root.
         """
-        self._tokenizer = tokenize_asdl(buf)
-        self._advance()
+        tokens = []
+        try:
+            tokens.extend(tokenize_asdl(buf))
+        except ASDLSyntaxError as e:
+            # Raise the error only when the parser reaches the bad token,
+            # as it would if the buffer were tokenized as it is parsed.
+            tokens.append(Token(TokenKind.Error, e, e.lineno))
+        else:
+            # End-of-input sentinel, so that cur_token is always a Token.
+            lineno = tokens[-1].lineno if tokens else 1
+            tokens.append(Token(TokenKind.EOF, '<EOF>', lineno))
+        self._tokens = tokens
+        self._pos = 0
+        self.cur_token = tokens[0]
+        if self.cur_token.kind == TokenKind.Error:
+            raise self.cur_token.value
         return self._parse_module()
 
     def _parse_module(self):
@@ -274,7 +318,8 @@ class ASDLParser:
 
     def _parse_definitions(self):
         defs = []
-        while self.cur_token.kind == TokenKind.TypeId:
+        TypeId = TokenKind.TypeId
+        while self.cur_token.kind == TypeId:
             typename = self._advance()
             self._match(TokenKind.Equals)
             type = self._parse_type()
@@ -289,7 +334,7 @@ class ASDLParser:
             # Otherwise it's a sum. Look for ConstructorId
             sumlist = [Constructor(self._match(TokenKind.ConstructorId),
                                    self._parse_optional_fields())]
-            while self.cur_token.kind  == TokenKind.Pipe:
+            while self.cur_token.kind == TokenKind.Pipe:
                 # More constructors
                 self._advance()
                 sumlist.append(Constructor(
@@ -301,19 +346,44 @@ class ASDLParser:
         return Product(self._parse_fields(), self._parse_optional_attributes())
 
     def _parse_fields(self):
+        # Field lists make up most of a grammar, so this production
+        # steps through the token list directly rather than through
+        # _advance() and _match().
         fields = []
+        TypeId = TokenKind.TypeId
+        RParen = TokenKind.RParen
+        Comma = TokenKind.Comma
+        Asterisk = TokenKind.Asterisk
+        Question = TokenKind.Question
+        id_kinds = self._id_kinds
         self._match(TokenKind.LParen)
-        while self.cur_token.kind == TokenKind.TypeId:
-            typename = self._advance()
-            is_seq, is_opt = self._parse_optional_field_quantifier()
-            id = (self._advance() if self.cur_token.kind in self._id_kinds
-                                  else None)
-            fields.append(Field(typename, id, seq=is_seq, opt=is_opt))
-            if self.cur_token.kind == TokenKind.RParen:
+        tokens = self._tokens
+        pos = self._pos
+        kind, value, _ = tokens[pos]
+        while kind == TypeId:
+            typename = value
+            pos += 1
+            kind, value, _ = tokens[pos]
+            is_seq = kind == Asterisk
+            is_opt = kind == Question
+            if is_seq or is_opt:
+                pos += 1
+                kind, value, _ = tokens[pos]
+            if kind in id_kinds:
+                id = value
+                pos += 1
+                kind, value, _ = tokens[pos]
+            else:
+                id = None
+            fields.append(Field(typename, id, is_seq, is_opt))
+            if kind == RParen:
                 break
-            elif self.cur_token.kind == TokenKind.Comma:
-                self._advance()
-        self._match(TokenKind.RParen)
+            elif kind == Comma:
+                pos += 1
+                kind, value, _ = tokens[pos]
+        self._pos = pos
+        self.cur_token = tokens[pos]
+        self._match(RParen)
         return fields
 
     def _parse_optional_fields(self):
@@ -329,25 +399,17 @@ class ASDLParser:
         else:
             return None
 
-    def _parse_optional_field_quantifier(self):
-        is_seq, is_opt = False, False
-        if self.cur_token.kind == TokenKind.Asterisk:
-            is_seq = True
-            self._advance()
-        elif self.cur_token.kind == TokenKind.Question:
-            is_opt = True
-            self._advance()
-        return is_seq, is_opt
-
     def _advance(self):
         """ Return the value of the current token and read the next one into
             self.cur_token.
         """
-        cur_val = None if self.cur_token is None else self.cur_token.value
-        try:
-            self.cur_token = next(self._tokenizer)
-        except StopIteration:
-            self.cur_token = None
+        # Productions only advance past tokens they have checked the
+        # kind of, so this never runs past the EOF sentinel.
+        cur_val = self.cur_token.value
+        self._pos += 1
+        self.cur_token = cur = self._tokens[self._pos]
+        if cur.kind == TokenKind.Error:
+            raise cur.value
         return cur_val
 
     _id_kinds = (TokenKind.ConstructorId, TokenKind.TypeId)
@@ -360,15 +422,21 @@ class ASDLParser:
         * Returns the value of the current token
         * Reads in the next token
         """
-        if (isinstance(kind, tuple) and self.cur_token.kind in kind or
-            self.cur_token.kind == kind
+        cur_kind = self.cur_token.kind
+        if (cur_kind in kind if isinstance(kind, tuple)
+            else cur_kind == kind
             ):
-            value = self.cur_token.value
-            self._advance()
-            return value
+            return self._advance()
+        elif cur_kind == TokenKind.Error:
+            # Reached by _parse_fields(), which steps through the tokens
+            # itself.
+            raise self.cur_token.value
         else:
+            names = TokenKind.names
+            expected = (' or '.join(names[k] for k in kind)
+                        if isinstance(kind, tuple) else names[kind])
             raise ASDLSyntaxError(
-                'Unmatched {} (found {})'.format(kind, self.cur_token.kind),
+                'Unmatched {} (found {})'.format(expected, names[cur_kind]),
                 self.cur_token.lineno)
 
     def _at_keyword(self, keyword):
@@ -0,0 +1,388 @@
+"""Compact binary serialization of Struct ASTs.
+
+The format is driven by the grammar of a node set built by
+nodes_from_asdl(). A record consists of:
+
+    - the magic bytes b'iAST' and a format version byte
+
+    - a 4-byte fingerprint of the node set (its class names and
+      fields, in ASDLImporter order), so that data is never decoded
+      against the wrong grammar
+
+    - the length of the payload, as a varint
+
+    - the payload, which is the root value in preorder
+
+Each value in the payload starts with a varint tag. Nodes are tagged
+with NODE_BASE plus their kind id (their class's _kind_id), followed by
+their fields; since the grammar fixes the number of fields, no count
+is stored. Tuples are followed by their length and items. Strings are
+entered into a string table on first occurrence and afterwards written
+as a reference to it, and a node object that occurs more than once is
+written in full only the first time, and afterwards as a back-reference
+to its preorder index. Integers use zigzag varints.
+
+Decoded nodes are constructed unchecked (see node.unchecked()); use
+node.validate() on trees from untrusted sources.
+"""
+
+
+__all__ = [
+    'Codec',
+    'dumps',
+    'loads',
+    'dump_to',
+    'load_from',
+]
+
+
+from struct import Struct
+from operator import attrgetter
+from zlib import crc32
+
+from .node import unchecked
+
+
+MAGIC = b'iAST'
+VERSION = 1
+HEADER = Struct('>4sBI')
+
+# Value tags.
+TAG_NONE = 0
+TAG_FALSE = 1
+TAG_TRUE = 2
+TAG_INT = 3
+TAG_FLOAT = 4
+TAG_COMPLEX = 5
+TAG_BYTES = 6
+TAG_STR = 7
+TAG_STRREF = 8
+TAG_TUPLE = 9
+TAG_NODEREF = 10
+NODE_BASE = 16
+
+DOUBLE = Struct('<d')
+COMPLEX = Struct('<dd')
+
+
+def write_varint(buf, n):
+    """Append non-negative integer n to bytearray buf, seven bits per
+    byte, least significant first.
+    """
+    while n >= 0x80:
+        buf.append((n & 0x7F) | 0x80)
+        n >>= 7
+    buf.append(n)
+
+def read_varint(data, pos):
+    """Read a varint from data starting at pos. Return the integer
+    and the position after it. Raise ValueError if data ends first.
+    """
+    try:
+        b = data[pos]
+        pos += 1
+        if b < 0x80:
+            return b, pos
+        n = b & 0x7F
+        shift = 7
+        while True:
+            b = data[pos]
+            pos += 1
+            n |= (b & 0x7F) << shift
+            if b < 0x80:
+                return n, pos
+            shift += 7
+    except IndexError:
+        raise ValueError('Truncated record') from None
+
+
+class Codec:
+    
+    """Serializer for trees of one node set. Constructing a Codec
+    indexes the node set, so reuse one when serializing many trees.
+    The node set is a mapping whose values include the node classes,
+    such as the namespace of a module of nodes; other values are
+    ignored.
+    """
+    
+    def __init__(self, nodes):
+        classes = sorted((cls for cls in nodes.values()
+                          if isinstance(cls, type) and
+                             '_kind_id' in cls.__dict__),
+                         key=lambda cls: cls._kind_id)
+        if ([cls._kind_id for cls in classes] !=
+            list(range(len(classes)))):
+            raise ValueError('Node set was not built by nodes_from_asdl()')
+        self.classes = classes
+        # For each class, its tag and a function returning its field
+        # values in reverse order.
+        self.kinds = {}
+        for cls in classes:
+            fields = cls._fields[::-1]
+            if len(fields) == 0:
+                getter = lambda node: ()
+            elif len(fields) == 1:
+                getter = (lambda node, get=attrgetter(fields[0]):
+                              (get(node),))
+            else:
+                getter = attrgetter(*fields)
+            self.kinds[cls] = (NODE_BASE + cls._kind_id, getter)
+        self.arities = [len(cls._fields) for cls in classes]
+        schema = '\n'.join('{}({})'.format(cls.__name__,
+                                           ','.join(cls._fields))
+                           for cls in classes)
+        self.fingerprint = crc32(schema.encode('utf-8')) & 0xFFFFFFFF
+    
+    def dumps(self, tree):
+        """Return the encoding of a tree as a bytes object."""
+        payload = self.encode(tree)
+        buf = bytearray(HEADER.pack(MAGIC, VERSION, self.fingerprint))
+        write_varint(buf, len(payload))
+        buf += payload
+        return bytes(buf)
+    
+    def loads(self, data):
+        """Decode a tree from a bytes-like object containing exactly
+        one record.
+        """
+        data = memoryview(data).cast('B')
+        pos, length = self._read_header(data)
+        if pos + length != len(data):
+            raise ValueError('Record length does not match data length')
+        return self.decode(data, pos, pos + length)
+    
+    def dump_to(self, tree, file):
+        """Write the encoding of a tree to a binary file. Several
+        trees can be written one after another.
+        """
+        file.write(self.dumps(tree))
+    
+    def load_from(self, file):
+        """Read the next tree written by dump_to() from a binary file.
+        Raise EOFError if the file is at its end.
+        """
+        header = file.read(HEADER.size)
+        if not header:
+            raise EOFError('No more records')
+        data = bytearray(header)
+        # Read the length varint a byte at a time.
+        while True:
+            b = file.read(1)
+            if not b:
+                raise ValueError('Truncated record')
+            data += b
+            if b[0] < 0x80:
+                break
+        pos, length = self._read_header(data)
+        payload = file.read(length)
+        if len(payload) != length:
+            raise ValueError('Truncated record')
+        return self.decode(payload, 0, length)
+    
+    def _read_header(self, data):
+        if len(data) < HEADER.size:
+            raise ValueError('Truncated record')
+        magic, version, fingerprint = HEADER.unpack_from(data)
+        if magic != MAGIC:
+            raise ValueError('Not an iast binary record')
+        if version != VERSION:
+            raise ValueError('Unsupported format version {}'.format(version))
+        if fingerprint != self.fingerprint:
+            raise ValueError('Record was written for a different node set')
+        length, pos = read_varint(data, HEADER.size)
+        return pos, length
+    
+    def encode(self, tree):
+        """Return the payload for a tree, as a bytearray."""
+        buf = bytearray()
+        append = buf.append
+        kinds = self.kinds
+        strings = {}
+        seen = {}
+        
+        stack = [tree]
+        pop = stack.pop
+        extend = stack.extend
+        while stack:
+            value = pop()
+            t = type(value)
+            if t is str:
+                sid = strings.get(value)
+                if sid is None:
+                    strings[value] = len(strings)
+                    data = value.encode('utf-8', 'surrogatepass')
+                    append(TAG_STR)
+                    write_varint(buf, len(data))
+                    buf += data
+                else:
+                    append(TAG_STRREF)
+                    write_varint(buf, sid)
+            elif t is tuple:
+                append(TAG_TUPLE)
+                write_varint(buf, len(value))
+                extend(reversed(value))
+            elif value is None:
+                append(TAG_NONE)
+            elif value is False:
+                append(TAG_FALSE)
+            elif value is True:
+                append(TAG_TRUE)
+            elif t is int:
+                append(TAG_INT)
+                write_varint(buf, value << 1 if value >= 0
+                                  else ((-value) << 1) - 1)
+            elif t is float:
+                append(TAG_FLOAT)
+                buf += DOUBLE.pack(value)
+            elif t is complex:
+                append(TAG_COMPLEX)
+                buf += COMPLEX.pack(value.real, value.imag)
+            elif t is bytes:
+                append(TAG_BYTES)
+                write_varint(buf, len(value))
+                buf += value
+            else:
+                kind = kinds.get(t)
+                if kind is None:
+                    raise TypeError('Cannot serialize value of type '
+                                    '{}'.format(t.__name__))
+                ref = seen.get(id(value))
+                if ref is not None:
+                    append(TAG_NODEREF)
+                    write_varint(buf, ref)
+                    continue
+                seen[id(value)] = len(seen)
+                tag, getter = kind
+                write_varint(buf, tag)
+                extend(getter(value))
+        return buf
+    
+    def decode(self, data, pos, end):
+        """Decode the payload in data[pos:end] and return the tree.
+        Raise ValueError if the payload is truncated or malformed.
+        """
+        classes = self.classes
+        arities = self.arities
+        strings = []
+        nodes = []
+        
+        # Stack of frames for partially decoded nodes and tuples. Each
+        # frame is a list [class or None for a tuple, preorder index,
+        # number of values expected, values so far].
+        stack = []
+        with unchecked():
+            while True:
+                if pos >= end:
+                    raise ValueError('Truncated record')
+                tag = data[pos]
+                pos += 1
+                if tag >= 0x80:
+                    tag, pos = read_varint(data, pos - 1)
+                
+                if tag >= NODE_BASE:
+                    kind = tag - NODE_BASE
+                    try:
+                        cls = classes[kind]
+                    except IndexError:
+                        raise ValueError('Bad reference to node kind '
+                                         '{}'.format(kind)) from None
+                    n = arities[kind]
+                    index = len(nodes)
+                    nodes.append(None)
+                    if n > 0:
+                        stack.append([cls, index, n, []])
+                        continue
+                    value = nodes[index] = cls()
+                elif tag == TAG_STRREF:
+                    sid, pos = read_varint(data, pos)
+                    try:
+                        value = strings[sid]
+                    except IndexError:
+                        raise ValueError('Bad reference to string '
+                                         '{}'.format(sid)) from None
+                elif tag == TAG_STR:
+                    n, pos = read_varint(data, pos)
+                    value = str(data[pos:pos + n], 'utf-8', 'surrogatepass')
+                    pos += n
+                    strings.append(value)
+                elif tag == TAG_TUPLE:
+                    n, pos = read_varint(data, pos)
+                    if n > 0:
+                        stack.append([None, None, n, []])
+                        continue
+                    value = ()
+                elif tag == TAG_NODEREF:
+                    ref, pos = read_varint(data, pos)
+                    # Nodes still being decoded (the referring node's
+                    # ancestors) are None.
+                    value = nodes[ref] if ref < len(nodes) else None
+                    if value is None:
+                        raise ValueError('Bad reference to node '
+                                         '{}'.format(ref))
+                elif tag == TAG_NONE:
+                    value = None
+                elif tag == TAG_FALSE:
+                    value = False
+                elif tag == TAG_TRUE:
+                    value = True
+                elif tag == TAG_INT:
+                    n, pos = read_varint(data, pos)
+                    value = -((n + 1) >> 1) if n & 1 else n >> 1
+                elif tag == TAG_FLOAT:
+                    if pos + DOUBLE.size > end:
+                        raise ValueError('Truncated record')
+                    value, = DOUBLE.unpack_from(data, pos)
+                    pos += DOUBLE.size
+                elif tag == TAG_COMPLEX:
+                    if pos + COMPLEX.size > end:
+                        raise ValueError('Truncated record')
+                    real, imag = COMPLEX.unpack_from(data, pos)
+                    value = complex(real, imag)
+                    pos += COMPLEX.size
+                elif tag == TAG_BYTES:
+                    n, pos = read_varint(data, pos)
+                    value = bytes(data[pos:pos + n])
+                    pos += n
+                else:
+                    raise ValueError('Unknown tag {}'.format(tag))
+                # Varints, strings, and bytes may have run past the end.
+                if pos > end:
+                    raise ValueError('Truncated record')
+                
+                # Hand the value to the enclosing frames, completing
+                # those that have all their values.
+                while stack:
+                    frame = stack[-1]
+                    values = frame[3]
+                    values.append(value)
+                    if len(values) < frame[2]:
+                        break
+                    stack.pop()
+                    cls = frame[0]
+                    if cls is None:
+                        value = tuple(values)
+                    else:
+                        value = nodes[frame[1]] = cls(*values)
+                else:
+                    if pos != end:
+                        raise ValueError('Trailing data in record')
+                    return value
+
+
+def dumps(tree, nodes):
+    """Return the binary encoding of a tree whose nodes belong to the
+    given node set.
+    """
+    return Codec(nodes).dumps(tree)
+
+def loads(data, nodes):
+    """Decode a tree of the given node set from bytes."""
+    return Codec(nodes).loads(data)
+
+def dump_to(tree, file, nodes):
+    """Write the binary encoding of a tree to a file."""
+    Codec(nodes).dump_to(tree, file)
+
+def load_from(file, nodes):
+    """Read the next tree written by dump_to() from a file."""
+    return Codec(nodes).load_from(file)
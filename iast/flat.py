@@ -0,0 +1,374 @@
+"""Columnar, array-backed encoding of Struct ASTs."""
+
+
+__all__ = [
+    'FlatTree',
+    'FlatNode',
+    'FlatVisitor',
+    'to_flat',
+    'from_flat',
+]
+
+
+from array import array
+from collections import Counter
+
+from .node import AST, unchecked, _intern_key
+
+
+# Each field value is encoded as a tagged integer, whose low bits give
+# the kind of value and whose remaining bits give an index. Nodes are
+# indexed by their preorder position, sequences by their position in
+# the sequence table, and primitives by their position in the value
+# table.
+TAG_BITS = 2
+TAG_MASK = (1 << TAG_BITS) - 1
+TAG_NODE = 0
+TAG_SEQ = 1
+TAG_PRIM = 2
+
+
+class FlatTree:
+    
+    """A tree stored as parallel arrays, with nodes in preorder.
+    Create one with to_flat(). The arrays support the buffer protocol,
+    so they can be wrapped by NumPy without copying.
+    
+        classes:    list of node classes; a node's kind is its
+                    index in this list
+    
+        kinds:      for each node, its kind
+    
+        offsets:    for each node, the position in slots of its
+                    first field (its fields are contiguous), plus a
+                    final entry for the end of slots
+    
+        ends:       for each node, the preorder position just past
+                    its subtree (so the subtree of node i is the
+                    range [i, ends[i]))
+    
+        slots:      the tagged encoding of each field value
+    
+        seq_offsets:
+                    for each sequence, the position in seq_items of
+                    its first item, plus a final entry for the end
+                    of seq_items
+    
+        seq_items:  the tagged encoding of each sequence item
+    
+        values:     list of distinct primitive values
+    
+        root:       the tagged encoding of the tree's root value
+    
+    Read-only traversals (see kind_counts(), dump(), and FlatVisitor)
+    work directly on the arrays without creating node objects.
+    """
+    
+    def __init__(self):
+        self.classes = []
+        self.kinds = array('H')
+        self.offsets = array('q')
+        self.ends = array('q')
+        self.slots = array('q')
+        self.seq_offsets = array('q')
+        self.seq_items = array('q')
+        self.values = []
+        self.root = None
+    
+    def __len__(self):
+        return len(self.kinds)
+    
+    def kind(self, i):
+        """Return the class of node i."""
+        return self.classes[self.kinds[i]]
+    
+    def field_slots(self, i):
+        """Return the tagged encodings of node i's fields."""
+        return self.slots[self.offsets[i]:self.offsets[i + 1]]
+    
+    def seq(self, s):
+        """Return the tagged encodings of sequence s's items."""
+        return self.seq_items[self.seq_offsets[s]:self.seq_offsets[s + 1]]
+    
+    def kind_counts(self):
+        """Return a Counter from node class names to the number of
+        nodes of that class.
+        """
+        counts = Counter()
+        for k, n in Counter(self.kinds).items():
+            counts[self.classes[k].__name__] += n
+        return counts
+    
+    def decode(self, tagged, view=False):
+        """Decode a tagged value into a primitive, a node, or a tuple.
+        If view is True, nodes are represented by FlatNode views
+        instead of being rebuilt.
+        """
+        tag = tagged & TAG_MASK
+        index = tagged >> TAG_BITS
+        if tag == TAG_PRIM:
+            return self.values[index]
+        elif tag == TAG_SEQ:
+            return tuple(self.decode(item, view) for item in self.seq(index))
+        elif view:
+            return FlatNode(self, index)
+        else:
+            return self.build(index)
+    
+    def build(self, i):
+        """Rebuild node i (and its subtree) as Struct nodes."""
+        built = {}
+        def get(tagged):
+            tag = tagged & TAG_MASK
+            index = tagged >> TAG_BITS
+            if tag == TAG_PRIM:
+                return self.values[index]
+            elif tag == TAG_SEQ:
+                return tuple(get(item) for item in self.seq(index))
+            else:
+                return built.pop(index)
+        
+        # Children come after their parents in preorder, so build in
+        # reverse preorder.
+        with unchecked():
+            for j in reversed(range(i, self.ends[i])):
+                cls = self.classes[self.kinds[j]]
+                built[j] = cls(*(get(t) for t in self.field_slots(j)))
+        return built[i]
+    
+    def dump(self):
+        """Return the same string as node.dump() would for the tree,
+        without rebuilding it.
+        """
+        parts = []
+        self._dump(self.root, 0, parts.append)
+        return ''.join(parts)
+    
+    def _dump(self, tagged, indent, emit):
+        tag = tagged & TAG_MASK
+        index = tagged >> TAG_BITS
+        if tag == TAG_NODE:
+            cls = self.kind(index)
+            functor = cls.__name__ + '('
+            new_indent = indent + len(functor)
+            delim = ',\n' + (' ' * new_indent)
+            emit(functor)
+            for j, (key, t) in enumerate(zip(cls._fields,
+                                             self.field_slots(index))):
+                if j > 0:
+                    emit(delim)
+                emit(key + ' = ')
+                self._dump(t, len(key) + 3 + new_indent, emit)
+            emit(')')
+        elif tag == TAG_SEQ:
+            items = self.seq(index)
+            new_indent = indent + 1
+            delim = ',\n' + (' ' * new_indent)
+            emit('(')
+            for j, t in enumerate(items):
+                if j > 0:
+                    emit(delim)
+                self._dump(t, new_indent, emit)
+            emit(',)' if len(items) == 1 else ')')
+        else:
+            emit(repr(self.values[index]))
+
+
+class FlatNode:
+    
+    """Lightweight view of a node in a FlatTree. Field values are
+    decoded on attribute access, with child nodes given as further
+    views. The view's own attributes are underscore-prefixed, so as
+    not to hide fields: _flat is the FlatTree, _index the node's
+    position in it, and _kind the node's class.
+    """
+    
+    __slots__ = ('_flat', '_index')
+    
+    def __init__(self, flat, index):
+        self._flat = flat
+        self._index = index
+    
+    @property
+    def _kind(self):
+        """The node's class."""
+        return self._flat.kind(self._index)
+    
+    @property
+    def _fields(self):
+        return self._kind._fields
+    
+    def __getattr__(self, name):
+        fields = self._kind._fields
+        if name not in fields:
+            raise AttributeError(name)
+        flat = self._flat
+        tagged = flat.slots[flat.offsets[self._index] + fields.index(name)]
+        return flat.decode(tagged, view=True)
+    
+    def __repr__(self):
+        return '<FlatNode {} #{}>'.format(self._kind.__name__, self._index)
+    
+    def _build(self):
+        """Rebuild this node as a Struct node."""
+        return self._flat.build(self._index)
+
+
+def to_flat(tree):
+    """Encode a tree (an AST, or a tuple or primitive value containing
+    ASTs) as a FlatTree. Shared subtrees are encoded at each of their
+    occurrences.
+    """
+    flat = FlatTree()
+    classes = flat.classes
+    class_ids = {}
+    kinds = flat.kinds
+    offsets = flat.offsets
+    ends = flat.ends
+    slots = flat.slots
+    seq_offsets = flat.seq_offsets
+    seq_items = flat.seq_items
+    values = flat.values
+    value_ids = {}
+    
+    def prim(value):
+        # Values are shared by _intern_key(), which tells apart equal
+        # values of different types or signs of zero (e.g. 1, 1.0, and
+        # True, or 0.0 and -0.0), so that decoding is lossless.
+        try:
+            key = _intern_key(value)
+            vid = value_ids.get(key)
+        except TypeError:
+            key = vid = None
+        if vid is None:
+            vid = len(values)
+            values.append(value)
+            if key is not None:
+                value_ids[key] = vid
+        return (vid << TAG_BITS) | TAG_PRIM
+    
+    # Explicit stack of (value, target array, position to patch).
+    # An entry with value END marks the end of a node's subtree.
+    END = object()
+    root = array('q', [0])
+    stack = [(tree, root, 0)]
+    while stack:
+        value, target, pos = stack.pop()
+        if value is END:
+            ends[pos] = len(kinds)
+        elif isinstance(value, AST):
+            cls = type(value)
+            cid = class_ids.get(cls)
+            if cid is None:
+                cid = class_ids[cls] = len(classes)
+                classes.append(cls)
+            i = len(kinds)
+            target[pos] = (i << TAG_BITS) | TAG_NODE
+            kinds.append(cid)
+            ends.append(0)
+            start = len(slots)
+            offsets.append(start)
+            fvals = tuple(value)
+            slots.extend([0] * len(fvals))
+            stack.append((END, None, i))
+            for j in reversed(range(len(fvals))):
+                stack.append((fvals[j], slots, start + j))
+        elif isinstance(value, tuple):
+            s = len(seq_offsets)
+            target[pos] = (s << TAG_BITS) | TAG_SEQ
+            start = len(seq_items)
+            seq_offsets.append(start)
+            seq_items.extend([0] * len(value))
+            for j in reversed(range(len(value))):
+                stack.append((value[j], seq_items, start + j))
+        else:
+            target[pos] = prim(value)
+    offsets.append(len(slots))
+    seq_offsets.append(len(seq_items))
+    flat.root = root[0]
+    return flat
+
+
+def from_flat(flat):
+    """Rebuild the tree encoded by a FlatTree. Since the encoding came
+    from a well-formed tree, nodes are built unchecked.
+    """
+    return flat.decode(flat.root)
+
+
+class FlatVisitor:
+    
+    """Analogous to NodeVisitor, but runs over a FlatTree without
+    rebuilding it. Handlers are named 'visit_' followed by the node
+    class name, and receive a FlatNode view. As with NodeVisitor, a
+    handler is responsible for recursing over its subtree, by calling
+    self.visit() on children or self.generic_visit() on the node.
+    
+    Nodes without a handler are traversed without creating views.
+    """
+    
+    @classmethod
+    def run(cls, flat, *args, **kargs):
+        """Convenience method for instantiating the class and running
+        the visitor on a FlatTree.
+        """
+        visitor = cls(*args, **kargs)
+        result = visitor.process(flat)
+        return result
+    
+    def process(self, flat):
+        """Entry point for invoking the visitor."""
+        self.flat = flat
+        # Handler for each kind in flat.classes, or None.
+        self._handlers = [getattr(self, 'visit_' + cls.__name__, None)
+                          for cls in flat.classes]
+        return self.visit(flat.decode(flat.root, view=True))
+    
+    def visit(self, tree):
+        """Dispatch on a node view or sequence (tuple). Other kinds
+        of values are returned without processing.
+        """
+        if isinstance(tree, FlatNode):
+            return self.node_visit(tree)
+        elif isinstance(tree, tuple):
+            return self.seq_visit(tree)
+        else:
+            return tree
+    
+    def node_visit(self, node):
+        """Dispatch to a particular node handler if it exists,
+        or else to generic_visit().
+        """
+        handler = self._handlers[self.flat.kinds[node._index]]
+        if handler is None:
+            return self.generic_visit(node)
+        return handler(node)
+    
+    def seq_visit(self, seq):
+        """Dispatch to each item of a sequence."""
+        for item in seq:
+            self.visit(item)
+    
+    def generic_visit(self, node):
+        """Dispatch to each field of a node."""
+        self._generic_index(node._index)
+    
+    def _generic_index(self, i):
+        # The descendants of node i, in the order that generic
+        # recursion would reach them, are just the following nodes in
+        # preorder up to the end of its subtree. Scan them, dispatching
+        # to handlers and skipping over the subtrees they take charge
+        # of.
+        flat = self.flat
+        kinds = flat.kinds
+        ends = flat.ends
+        handlers = self._handlers
+        j = i + 1
+        end = ends[i]
+        while j < end:
+            handler = handlers[kinds[j]]
+            if handler is None:
+                j += 1
+            else:
+                handler(FlatNode(flat, j))
+                j = ends[j]
@@ -5,20 +5,125 @@ __all__ = [
     'AST',
     'dump',
     'nodes_from_asdl',
+    'unchecked',
+    'validate',
 ]
 
 
+import threading
 from collections import OrderedDict
+from contextlib import contextmanager
+from weakref import WeakValueDictionary
+from inspect import Signature, Parameter
 from simplestruct import Struct, Field, TypedField, MetaStruct
 
 from . import asdl
 
 
+class _Config(threading.local):
+    
+    """Per-thread settings for node construction."""
+    
+    check_types = True
+    """If False, TypedASTFields and generated constructors skip type
+    checking (but still normalize sequences to tuples). Set by
+    unchecked().
+    """
+
+_config = _Config()
+
+@contextmanager
+def unchecked():
+    """Context manager for trusted construction. Within its extent,
+    nodes of typed classes are built without type checking, which can
+    be done later with validate(). This setting is per-thread, so
+    nodes built by other threads meanwhile are still checked.
+    """
+    old = _config.check_types
+    _config.check_types = False
+    try:
+        yield
+    finally:
+        _config.check_types = old
+
+
+# Field.__set__() implementations whose behavior _compact_setattr()
+# knows how to reproduce.
+_compact_setters = (Field.__set__, TypedField.__set__)
+
+def _compact_setattr(self, name, value):
+    """__setattr__() for compact nodes. Since their Field descriptors
+    are not class attributes, emulate Field.__set__() (and the checking
+    and normalization of TypedField) here.
+    """
+    field = self._fieldmap.get(name)
+    if field is not None:
+        if self._immutable and self._initialized:
+            raise AttributeError('Struct is immutable')
+        if isinstance(field, TypedField):
+            field.check(self, value)
+            value = field.normalize(self, value)
+    object.__setattr__(self, name, value)
+
+
+def _interned_eq(self, other):
+    """__eq__() for interned nodes. Structurally equal nodes are the
+    same object, so identity decides equality.
+    """
+    if self is other:
+        return True
+    if type(self) is not type(other):
+        return NotImplemented
+    return False
+
+def _intern_key(value):
+    """Return a hashable key identifying value for interning. Nodes
+    and strings are their own keys, tuples are keyed elementwise, and
+    other primitive values are paired with their type so that, e.g.,
+    1, 1.0, and True are not conflated. Floats and complex numbers are
+    keyed by their repr, so that 0.0 and -0.0 are not conflated either.
+    """
+    if isinstance(value, (AST, str)):
+        return value
+    elif isinstance(value, tuple):
+        key = tuple(_intern_key(item) for item in value)
+        # Reuse the value itself if no item needed wrapping.
+        return value if key == value else key
+    elif isinstance(value, (float, complex)):
+        return (type(value), repr(value))
+    else:
+        return (type(value), value)
+
+
 class MetaAST(MetaStruct):
     
     """MetaStruct subclass for defining Struct AST nodes.
     
     Struct fields are auto-generated from the _fields tuple.
+    
+    If the class attribute _compact is true (it is inherited), the
+    field values are stored in __slots__ instead of the instance
+    dictionary. The Field descriptors are then kept only in _struct,
+    and the class attribute for each field name is the slot's member
+    descriptor.
+    
+    If the class attribute _intern_table is not None (it is inherited),
+    it should be a weakref.WeakValueDictionary, and instantiating the
+    class returns the existing node from the table if there is a live
+    node that is structurally equal to the one requested. Such nodes
+    use identity for equality and hashing.
+    
+    If the class attribute _make is not None, it is a constructor
+    generated by nodes_from_asdl(), which is called in place of the
+    usual Struct instantiation. (Until the class is first
+    instantiated, it may be a stand-in that generates it.) It is not inherited by subclasses,
+    and neither is _make_unchecked, its variant without type checks.
+    Nor are _child_fields and _child_reach, since a subclass may add
+    fields.
+    
+    If the class attribute _summarized is true (it is not inherited),
+    each instance records the kinds of nodes in its subtree as _kinds.
+    Instances of unsummarized subclasses of such a class record -1.
     """
     
     def __new__(mcls, clsname, bases, namespace, **kargs):
@@ -38,16 +143,230 @@ class MetaAST(MetaStruct):
             else:
                 namespace.move_to_end(fname)
         
-        return super().__new__(mcls, clsname, bases, namespace, **kargs)
+        interned = namespace.get('_intern_table',
+                                 next((b._intern_table for b in bases
+                                       if getattr(b, '_intern_table', None)
+                                          is not None), None))
+        if interned is not None:
+            namespace.setdefault('__eq__', _interned_eq)
+            namespace.setdefault('__hash__', object.__hash__)
+        
+        # Methods generated by nodes_from_asdl() are specific to the
+        # fields of the class they were made for. Don't let subclasses
+        # inherit them.
+        namespace.setdefault('_make', None)
+        namespace.setdefault('_make_unchecked', None)
+        namespace.setdefault('_field_kinds', None)
+        namespace.setdefault('_child_fields', None)
+        namespace.setdefault('_child_reach', None)
+        namespace.setdefault('_summarized', False)
+        if any(getattr(b, '_make', None) is not None for b in bases):
+            namespace.setdefault('__eq__', AST.__eq__)
+            namespace.setdefault('_replace', Struct._replace)
+            namespace.setdefault('__reduce_ex__', AST.__reduce_ex__)
+        
+        compact = namespace.get('_compact',
+                                any(getattr(b, '_compact', False)
+                                    for b in bases))
+        if not compact:
+            cls = super().__new__(mcls, clsname, bases, namespace, **kargs)
+            cls._fieldmap = {f.name: f for f in cls._struct}
+            return cls
+        
+        # Pull the field descriptors out of the namespace, since
+        # their names are taken by the slots. MetaStruct will not
+        # see them, so do its copying and naming here.
+        struct = []
+        for fname in fields:
+            f = namespace.pop(fname)
+            if isinstance(f, type) and issubclass(f, Field):
+                f = f()
+            if type(f).__set__ not in _compact_setters:
+                raise TypeError('Compact AST {} does not support field '
+                                'descriptor of type {}'.format(
+                                clsname, type(f).__name__))
+            f = f.copy()
+            f.name = fname
+            struct.append(f)
+        slots = fields
+        if (namespace['_summarized'] and
+            not any(getattr(b, '_summarized', False) for b in bases)):
+            slots += ('_kinds',)
+        namespace['__slots__'] = slots
+        namespace.setdefault('__setattr__', _compact_setattr)
+        
+        cls = super().__new__(mcls, clsname, bases, namespace, **kargs)
+        
+        cls._struct = tuple(struct)
+        cls._signature = Signature(
+            [Parameter(f.name, Parameter.POSITIONAL_OR_KEYWORD,
+                       default=f.default if f.has_default
+                               else Parameter.empty)
+             for f in cls._struct])
+        cls._fieldmap = {f.name: f for f in cls._struct}
+        
+        return cls
+    
+    def __call__(cls, *args, **kargs):
+        # Use the generated constructor if there is one.
+        make = cls._make
+        try:
+            if make is not None:
+                return make(*args, **kargs)
+            inst = super().__call__(*args, **kargs)
+        except TypeError as exc:
+            # Report a bad argument list the way Struct reports bad
+            # field values.
+            try:
+                cls._signature.bind(*args, **kargs)
+            except TypeError as bind_exc:
+                raise TypeError('Error constructing {}: {}'.format(
+                                cls.__name__, bind_exc)) from exc
+            raise
+        
+        if cls._summarized:
+            object.__setattr__(inst, '_kinds', _summarize(inst))
+        elif type(cls._kinds) is not int:
+            # Unsummarized subclass of a compact summarized class. Fill
+            # in the slot it inherits.
+            object.__setattr__(inst, '_kinds', -1)
+        table = cls._intern_table
+        if table is None:
+            # Cache the structural hash. Children already have theirs
+            # cached, so this is proportional to the number of fields
+            # (and sequence items) rather than the size of the tree.
+            h = None
+            if inst._immutable:
+                try:
+                    h = hash((cls,) + tuple(inst))
+                except TypeError:
+                    pass
+            object.__setattr__(inst, '_hash', h)
+            return inst
+        
+        # The new instance is built (and type-checked) regardless,
+        # and discarded if an equal node is already live.
+        try:
+            key = (cls,) + tuple(_intern_key(value) for value in inst)
+            existing = table.get(key)
+        except TypeError:
+            raise TypeError('Cannot intern {} node with unhashable '
+                            'field value'.format(cls.__name__)) from None
+        if existing is not None:
+            return existing
+        table[key] = inst
+        return inst
 
 class AST(Struct, metaclass=MetaAST):
     
     """Root of any Struct AST node class hierarchy."""
     
+    # _initialized is the only non-field attribute that Struct stores
+    # on instances, _hash is the cached hash set by MetaAST, and _valid
+    # is set by validate(). Giving them slots lets compact nodes avoid
+    # allocating a dict.
+    __slots__ = ('_initialized', '_hash', '_valid')
+    
     _meta = False
     """If True, this node is metasyntactic (e.g. for pattern matching)
     and is therefore not restricted by type constraints.
     """
+    
+    _compact = False
+    """If True, field values are stored in slots rather than in the
+    instance dictionary. See MetaAST.
+    """
+    
+    _intern_table = None
+    """If not None, a WeakValueDictionary used to intern (hash-cons)
+    nodes of this class. See MetaAST.
+    """
+    
+    _child_fields = None
+    """If not None, a tuple of the names of the fields that may hold
+    nodes or sequences of nodes, as opposed to primitive values,
+    according to the grammar the class was made from. Set by
+    nodes_from_asdl(). Visitors skip the other fields.
+    """
+    
+    _child_reach = None
+    """If not None, a tuple of bitsets parallel to _child_fields. Each
+    has bit i set if a node whose class has _kind_id i may occur in
+    the subtree under that field (see _grammar_reach()). Set by
+    nodes_from_asdl() for typed classes.
+    """
+    
+    _summarized = False
+    """If True, instances record a summary of their subtree as _kinds.
+    Set by nodes_from_asdl(summarized=True). See MetaAST.
+    """
+    
+    _kind_names = None
+    """For classes made by nodes_from_asdl(), a tuple of the names of
+    all node classes of the grammar, indexed by _kind_id. It is shared
+    by the classes of one grammar.
+    """
+    
+    _kinds = -1
+    """Bitset of the kinds of nodes in this node's subtree, including
+    itself: bit i is set if a node whose class has _kind_id i occurs.
+    -1 (all bits set) means the subtree is not summarized, e.g.
+    because it contains nodes of other classes, such as metasyntactic
+    ones. Only instances of summarized classes have a precise value.
+    """
+    
+    # Hashes are computed once, at construction, from the cached
+    # hashes of the children (see MetaAST.__call__()). A hash of None
+    # means the node is mutable or has an unhashable field value.
+    
+    def __hash__(self):
+        h = self._hash
+        if h is None:
+            # Raise the appropriate TypeError.
+            super().__hash__()
+            h = hash((type(self),) + tuple(self))
+        return h
+    
+    def __eq__(self, other):
+        if self is other:
+            return True
+        if type(self) is not type(other):
+            return NotImplemented
+        # Nodes with different cached hashes cannot be equal.
+        h1 = self._hash
+        h2 = other._hash
+        if h1 is not None and h2 is not None and h1 != h2:
+            return False
+        return super().__eq__(other)
+    
+    def __reduce_ex__(self, protocol):
+        # Pickle as the class and positional field values, rebuilt by
+        # _unpickle().
+        return (_unpickle, (type(self),) + tuple(self))
+
+def _summarize(node):
+    """Compute the _kinds of a node of a summarized class from its
+    children. This is the slow path of generated constructors.
+    """
+    kinds = 1 << node._kind_id
+    for name in node._child_fields:
+        value = getattr(node, name)
+        if value is None:
+            continue
+        items = value if type(value) is tuple else (value,)
+        for item in items:
+            kinds |= getattr(item, '_kinds', -1)
+    return kinds
+
+def _unpickle(cls, *values):
+    """Rebuild a pickled node. The field values were type-checked when
+    the node was first built, so they are not checked again.
+    """
+    make = cls._make_unchecked
+    if make is not None:
+        return make(*values)
+    with unchecked():
+        return cls(*values)
 
 class TypedASTField(TypedField):
     
@@ -72,6 +391,10 @@ class TypedASTField(TypedField):
     def copy(self):
         return type(self)(self.kind, self.quant)
     
+    def check(self, inst, value):
+        if _config.check_types:
+            super().check(inst, value)
+    
     def checktype(self, value, kind, **kargs):
         if isinstance(value, AST) and value._meta:
             return
@@ -95,36 +418,178 @@ class TypedASTField(TypedField):
     def normalize(self, inst, value):
         # Without this check, we'd end up replacing a metasyntactic
         # node with the sequence of its fields.
-        if isinstance(value, AST) and value._meta:
-            return value
+        if isinstance(value, AST):
+            if value._meta:
+                return value
+            # Likewise for a singular node where a sequence is
+            # expected. This is an error even if type checking was
+            # skipped.
+            if self.seq:
+                self.checktype_seq(value, self.kind)
         return super().normalize(inst, value)
 
 
-def dump(tree, indent=0):
+def dump(tree, indent=0, *, file=None, max_depth=None, max_width=None,
+         oneline=False):
     """A multi-line Struct-AST pretty-printer. Note that this is for
     getting the exact tree structure, not a source-like representation.
     
     If all non-node field values in the tree can be constructed from
     their reprs, then the returned string can be executed to reproduce
     the tree.
+    
+    If file is given, the output is written to it incrementally and
+    None is returned. The tree is traversed with an explicit stack,
+    so deeply nested trees do not hit the recursion limit.
+    
+    If max_depth is given, nodes and sequences nested deeper than it
+    are abbreviated with "...". If max_width is given, only that many
+    items of each sequence are shown. If oneline is True, the output
+    is on a single line, in the style of the nodes' repr.
     """
-    if isinstance(tree, AST):
-        functor = tree.__class__.__name__ + '('
-        new_indent = indent + len(functor)
-        delim = ',\n' + (' ' * new_indent)
-        return (functor +
-                delim.join(key + ' = ' + dump(item, len(key) + 3 + new_indent)
-                           for key, item in tree._asdict().items()) +
-                ')')
-    elif isinstance(tree, tuple):
-        new_indent = indent + 1
-        delim = ',\n' + (' ' * new_indent)
-        end = ',)' if len(tree) == 1 else ')'
-        return ('(' +
-                delim.join(dump(item, new_indent) for item in tree) +
-                end)
-    else:
-        return repr(tree)
+    parts = _dump_parts(tree, indent, max_depth, max_width, oneline)
+    if file is None:
+        return ''.join(parts)
+    buf = []
+    for part in parts:
+        buf.append(part)
+        if len(buf) >= 1024:
+            file.write(''.join(buf))
+            buf.clear()
+    file.write(''.join(buf))
+
+def _dump_parts(tree, indent, max_depth, max_width, oneline):
+    """Generator of the output pieces of dump()."""
+    sep = '=' if oneline else ' = '
+    # Stack of strings to emit and triples of a value to dump, its
+    # indentation, and its depth.
+    stack = [(tree, indent, 0)]
+    while stack:
+        item = stack.pop()
+        if type(item) is str:
+            yield item
+            continue
+        value, indent, depth = item
+        
+        if isinstance(value, AST):
+            if max_depth is not None and depth >= max_depth:
+                yield value.__class__.__name__ + '(...)'
+                continue
+            functor = value.__class__.__name__ + '('
+            new_indent = indent + len(functor)
+            delim = ', ' if oneline else ',\n' + (' ' * new_indent)
+            yield functor
+            entries = []
+            for f, item in zip(value._struct, value):
+                if entries:
+                    entries.append(delim)
+                entries.append(f.name + sep)
+                entries.append((item, len(f.name) + len(sep) + new_indent,
+                                depth + 1))
+            entries.append(')')
+            stack.extend(reversed(entries))
+        
+        elif isinstance(value, tuple):
+            if max_depth is not None and depth >= max_depth:
+                yield '(...)'
+                continue
+            new_indent = indent + 1
+            delim = ', ' if oneline else ',\n' + (' ' * new_indent)
+            yield '('
+            entries = []
+            for item in value[:max_width]:
+                if entries:
+                    entries.append(delim)
+                entries.append((item, new_indent, depth + 1))
+            if max_width is not None and len(value) > max_width:
+                entries.append(delim + '...)')
+            else:
+                entries.append(',)' if len(value) == 1 else ')')
+            stack.extend(reversed(entries))
+        
+        else:
+            yield repr(value)
+
+
+def _get_field_kinds(cls):
+    """Return the type table of a node class, computing and caching it
+    if nodes_from_asdl() did not already. The table has an entry for
+    each type-checked field, consisting of the field name, kind,
+    quantifier, and descriptor.
+    """
+    table = cls._field_kinds
+    if table is None:
+        table = cls._field_kinds = tuple(
+            (f.name, f.kind, f.quant, f) for f in cls._struct
+            if isinstance(f, TypedASTField))
+    return table
+
+def _format_path(path):
+    """Format a path, given as nested pairs (parent path, label), as
+    used by validate().
+    """
+    labels = []
+    while path is not None:
+        path, label = path
+        labels.append(label)
+    return ''.join(reversed(labels))
+
+def validate(tree):
+    """Type-check a whole tree, such as one built in an unchecked()
+    context, raising TypeError at the first violation. Each node is
+    checked against the type table of its class. Metasyntactic nodes
+    are exempt from checking, as they are during construction.
+    
+    Nodes are marked once their subtree passes, and subsequent calls
+    skip marked subtrees. This makes it cheap to re-validate a tree
+    after a transformation that shares most of its nodes with the
+    input.
+    """
+    set_valid = AST._valid.__set__
+    # Iterative postorder walk, so that deep trees don't exceed the
+    # recursion limit and nodes are marked only after their subtrees.
+    # Entries are (value, path, done).
+    stack = [(tree, (None, type(tree).__name__), False)]
+    while stack:
+        value, path, done = stack.pop()
+        if done:
+            set_valid(value, True)
+            continue
+        if isinstance(value, tuple):
+            for i in reversed(range(len(value))):
+                stack.append((value[i], (path, '[{}]'.format(i)), False))
+            continue
+        if not isinstance(value, AST) or getattr(value, '_valid', False):
+            continue
+        
+        stack.append((value, path, True))
+        if not value._meta:
+            for name, kind, quant, field in _get_field_kinds(type(value)):
+                fval = getattr(value, name)
+                if quant == '*' and type(fval) is tuple:
+                    ok = all(isinstance(item, kind) or
+                             (isinstance(item, AST) and item._meta)
+                             for item in fval)
+                else:
+                    ok = ((quant == '?' and fval is None) or
+                          isinstance(fval, kind) and quant != '*' or
+                          (isinstance(fval, AST) and fval._meta))
+                if not ok:
+                    try:
+                        # Bypass unchecked() and get the error message.
+                        TypedField.check(field, value, fval)
+                        if quant == '*':
+                            raise TypeError('Expected tuple; got {}'.format(
+                                            type(fval).__name__))
+                    except TypeError as exc:
+                        raise TypeError(
+                            "Error validating {} (field '{}') at {}: "
+                            "{}".format(type(value).__name__, name,
+                                        _format_path(path), exc)) from None
+        for name in reversed(value._fields):
+            fval = getattr(value, name)
+            if isinstance(fval, (AST, tuple)):
+                stack.append((fval, (path, '.' + name), False))
 
 
 class ASDLImporter:
@@ -191,8 +656,307 @@ class ASDLImporter:
             fields.append(self.visit(f, name))
         self.left_info[name] = (fields, 'AST')
 
+def _grammar_reach(info):
+    """Given the output of ASDLImporter, return a dictionary mapping
+    each node type name to the bitset of the node types, by position
+    in info, that may occur in a subtree whose root has that type:
+    the type itself, its constructors if it is a sum, and what may
+    occur under its fields, transitively.
+    """
+    ids = {name: i for i, name in enumerate(info)}
+    succs = {name: set() for name in info}
+    for name, (fields, base) in info.items():
+        if base in info:
+            succs[base].add(name)
+        succs[name].update(ft for _fn, ft, _fq in fields if ft in info)
+    
+    reach = {name: 1 << ids[name] for name in info}
+    changed = True
+    while changed:
+        changed = False
+        for name in info:
+            bits = reach[name]
+            for succ in succs[name]:
+                bits |= reach[succ]
+            if bits != reach[name]:
+                reach[name] = bits
+                changed = True
+    return reach
+
+def _check_field(cls, name, value):
+    """Check and normalize a field value using the class's Field
+    descriptor, raising TypeError the same way Struct construction
+    does. This is the slow path of generated constructors.
+    """
+    field = cls._fieldmap[name]
+    if isinstance(field, TypedField):
+        try:
+            field.check(None, value)
+        except TypeError as exc:
+            raise TypeError("Error constructing {} (field '{}'): {}".format(
+                            cls.__name__, name, exc)) from exc
+        value = field.normalize(None, value)
+    return value
+
+def _normalize_field(cls, name, value):
+    """Normalize a field value using the class's Field descriptor,
+    without type checking. Like _check_field(), this is a slow path
+    of generated constructors.
+    """
+    try:
+        return cls._fieldmap[name].normalize(None, value)
+    except TypeError as exc:
+        raise TypeError("Error constructing {} (field '{}'): {}".format(
+                        cls.__name__, name, exc)) from exc
+
+_MISSING = object()
+
+def _methods_source(cls, specs):
+    """Generate specialized source for the constructor (stored as
+    _make, and used by MetaAST.__call__()), an unchecked constructor
+    (stored as _make_unchecked), __eq__(), _replace(), and
+    __reduce_ex__() of a node class. specs is a list of triples of a
+    field name, its kind (a tuple of types, or None if unchecked), and
+    its ASDL quantifier.
+    
+    The constructor inlines the type checks of TypedASTField, the
+    hash computation or interning lookup of MetaAST.__call__(), and
+    for summarized classes, the computation of _kinds. It bypasses the
+    generic Field descriptors, signature binding, and per-field loops
+    of simplestruct.
+    
+    Return the source of a factory function, named _methods_ followed
+    by the class name, and the namespace dictionary to call it with
+    (see _methods_namespace()). The factory returns a dictionary of
+    the methods, which close over the namespace's entries. The source
+    only depends on the class through its name, fields, and flags, so
+    it can be written to a module and reused (see iast.nodegen).
+    """
+    names = [fn for fn, _kind, _quant in specs]
+    ns = _methods_namespace(cls, specs)
+    lines = []
+    emit = lines.append
+    
+    def tup(items):
+        return '(' + ', '.join(items) + (',)' if len(items) == 1 else ')')
+    
+    # Constructors. The unchecked variant (stored as _make_unchecked)
+    # skips type checks regardless of unchecked(), but still turns
+    # sequences into tuples (and rejects singular nodes given for
+    # them).
+    for fname, checked in [(cls.__name__, True),
+                           ('_unchecked_' + cls.__name__, False)]:
+        emit('def {}({}):'.format(fname, ', '.join(names)))
+        if checked and any(kind is not None and kind != (object,)
+                           for _fn, kind, _quant in specs):
+            emit('    _check = _config.check_types')
+        for fn, kind, quant in specs:
+            if quant == '*' and kind is not None and not checked:
+                emit('    if _type({0}) is not _tuple:'.format(fn))
+                emit('        {0} = _normalize_field(_cls, {0!r}, {0})'
+                     .format(fn))
+                continue
+            if kind is None or kind == (object,):
+                if quant == '*' and kind is not None:
+                    emit('    if _type({0}) is not _tuple:'.format(fn))
+                    emit('        {0} = _check_field(_cls, {0!r}, {0})'
+                         .format(fn))
+                continue
+            if not checked:
+                continue
+            bad = ('not _isinstance({0}, _kind_{1}) and '
+                   'not (_isinstance({0}, _AST) and {0}._meta)')
+            if quant == '*':
+                emit('    if _type({0}) is not _tuple:'.format(fn))
+                emit('        {0} = _check_field(_cls, {0!r}, {0})'
+                     .format(fn))
+                emit('    elif _check:')
+                emit('        for _item in {}:'.format(fn))
+                emit('            if ' + bad.format('_item', fn) + ':')
+                emit('                _check_field(_cls, {0!r}, {0})'
+                     .format(fn))
+            else:
+                cond = bad.format(fn, fn)
+                if quant == '?':
+                    cond = '{} is not None and '.format(fn) + cond
+                cond = '_check and ' + cond
+                emit('    if ' + cond + ':')
+                emit('        _check_field(_cls, {0!r}, {0})'.format(fn))
+        if cls._intern_table is not None:
+            emit('    _key = ' + tup(['_cls'] + ['_intern_key({})'.format(fn)
+                                        for fn in names]))
+            emit('    try:')
+            emit('        _self = _table.get(_key)')
+            emit('    except TypeError:')
+            emit('        raise TypeError({!r}) from None'.format(
+                 'Cannot intern {} node with unhashable field '
+                 'value'.format(cls.__name__)))
+            emit('    if _self is not None:')
+            emit('        return _self')
+        if cls._summarized:
+            # Children lacking _kinds (or malformed, if unchecked) make
+            # the summary unknown.
+            emit('    _kinds = {}'.format(1 << cls._kind_id))
+            children = [(fn, quant) for fn, _kind, quant in specs
+                        if fn in cls._child_fields]
+            if children:
+                emit('    try:')
+                for fn, quant in children:
+                    if quant == '*':
+                        emit('        for _item in {}:'.format(fn))
+                        emit('            _kinds |= _item._kinds')
+                    elif quant == '?':
+                        emit('        if {} is not None:'.format(fn))
+                        emit('            _kinds |= {}._kinds'.format(fn))
+                    else:
+                        emit('        _kinds |= {}._kinds'.format(fn))
+                emit('    except AttributeError:')
+                emit('        _kinds = -1')
+        emit('    _self = _new(_cls)')
+        if cls._compact:
+            for fn in names:
+                emit('    _set_{0}(_self, {0})'.format(fn))
+            if cls._summarized:
+                emit('    _set__kinds(_self, _kinds)')
+        else:
+            entries = ['{0!r}: {0}'.format(fn) for fn in names]
+            if cls._summarized:
+                entries.append("'_kinds': _kinds")
+            emit("    _setattr(_self, '__dict__', {{{}}})".format(
+                 ', '.join(entries)))
+        emit('    _set_initialized(_self, True)')
+        if cls._intern_table is not None:
+            emit('    _table[_key] = _self')
+        elif cls._immutable:
+            emit('    try:')
+            emit('        _set_hash(_self, _hash({}))'.format(
+                 tup(['_cls'] + names)))
+            emit('    except TypeError:')
+            emit('        _set_hash(_self, None)')
+        else:
+            emit('    _set_hash(_self, None)')
+        emit('    return _self')
+    
+    # Equality. Interned nodes keep identity-based equality.
+    if cls._intern_table is None:
+        emit('def __eq__(_self, _other):')
+        emit('    if _self is _other:')
+        emit('        return True')
+        emit('    if _type(_self) is not _type(_other):')
+        emit('        return NotImplemented')
+        emit('    _h1 = _self._hash')
+        emit('    _h2 = _other._hash')
+        emit('    if _h1 is not None and _h2 is not None and _h1 != _h2:')
+        emit('        return False')
+        emit('    return ' + (' and '.join('_self.{0} == _other.{0}'.format(fn)
+                                         for fn in names) or 'True'))
+    
+    # _replace().
+    emit('def _replace(_self{}):'.format(
+         ''.join(', {}=_MISSING'.format(fn) for fn in names)
+         .replace(', ', ', *, ', 1)))
+    for fn in names:
+        emit('    if {0} is _MISSING:'.format(fn))
+        emit('        {0} = _self.{0}'.format(fn))
+    emit('    return _make({})'.format(', '.join(names)))
+    
+    # Pickling. Protocol 4 can refer to the unchecked constructor by
+    # its qualified name (memoized once per class), which makes for a
+    # smaller pickle than passing the class to _unpickle().
+    emit('def __reduce_ex__(_self, _protocol):')
+    emit('    if _protocol >= 4:')
+    emit('        return (_make_unchecked, {})'.format(
+         tup(['_self.' + fn for fn in names])))
+    emit('    return (_unpickle, {})'.format(
+         tup(['_cls'] + ['_self.' + fn for fn in names])))
+    
+    methods = ['_make', '_make_unchecked', '_replace', '__reduce_ex__']
+    if cls._intern_table is None:
+        methods.append('__eq__')
+    factory = ['def _methods_{}(_ns):'.format(cls.__name__)]
+    factory.extend('    {0} = _ns[{0!r}]'.format(key) for key in sorted(ns))
+    factory.extend('    ' + line for line in lines)
+    factory.append('    _make = ' + cls.__name__)
+    factory.append('    _make_unchecked = _unchecked_' + cls.__name__)
+    factory.append('    return {{{}}}'.format(
+                   ', '.join('{0!r}: {0}'.format(m) for m in methods)))
+    return '\n'.join(factory) + '\n', ns
+
+def _methods_namespace(cls, specs):
+    """Return the namespace dictionary that the factory function of
+    _methods_source() is called with, without generating the source.
+    """
+    # Names, including builtins, are prefixed to avoid colliding with
+    # field names.
+    ns = {'_cls': cls, '_AST': AST, '_MISSING': _MISSING,
+          '_type': type, '_tuple': tuple, '_isinstance': isinstance,
+          '_new': object.__new__, '_hash': hash,
+          '_check_field': _check_field,
+          '_normalize_field': _normalize_field, '_intern_key': _intern_key,
+          '_unpickle': _unpickle,
+          '_table': cls._intern_table,
+          '_set_initialized': AST._initialized.__set__,
+          '_set_hash': AST._hash.__set__,
+          '_setattr': object.__setattr__,
+          '_config': _config}
+    for fn, kind, _quant in specs:
+        if kind is not None and kind != (object,):
+            ns['_kind_' + fn] = kind
+    if cls._compact:
+        for fn, _kind, _quant in specs:
+            ns['_set_' + fn] = cls.__dict__[fn].__set__
+        if cls._summarized:
+            ns['_set__kinds'] = cls._kinds.__set__
+    return ns
+
+def _gen_methods(cls, specs, factory=None):
+    """Install the specialized methods of _methods_source() on a node
+    class. If factory is not given, it is compiled from the source.
+    """
+    if factory is None:
+        source, ns = _methods_source(cls, specs)
+        code = compile(source, '<generated methods of {}>'.format(
+                       cls.__name__), 'exec')
+        namespace = {}
+        exec(code, namespace)
+        factory = namespace['_methods_' + cls.__name__]
+    else:
+        ns = _methods_namespace(cls, specs)
+    
+    methods = factory(ns)
+    for name in ['_make', '_make_unchecked']:
+        make = methods[name]
+        make.__module__ = cls.__module__
+        make.__name__ = name
+        make.__qualname__ = cls.__qualname__ + '.' + name
+    for name, method in methods.items():
+        setattr(cls, name, method)
+
+def _defer_methods(cls, specs):
+    """Install stand-ins for the _make and _make_unchecked of
+    _gen_methods(), which generate the methods when either is first
+    called. Compiling them is most of the cost of creating a class,
+    and grammars have many classes that a given program never
+    instantiates.
+    """
+    def _make(*args, **kargs):
+        if cls._make is _make:
+            _gen_methods(cls, specs)
+        return cls._make(*args, **kargs)
+    
+    def _make_unchecked(*args, **kargs):
+        if cls._make_unchecked is _make_unchecked:
+            _gen_methods(cls, specs)
+        return cls._make_unchecked(*args, **kargs)
+    
+    for make in [_make, _make_unchecked]:
+        make.__module__ = cls.__module__
+        make.__qualname__ = cls.__qualname__ + '.' + make.__name__
+        setattr(cls, make.__name__, make)
+
 def nodes_from_asdl(asdl_tree, *, module=None, typed=False,
-                    primitive_types=asdl.primitive_types):
+                    compact=False, interned=False, summarized=False,
+                    codegen=True, primitive_types=asdl.primitive_types):
     """Given an ASDL structure, return a mapping from node type
     names to node types.
     
@@ -203,6 +967,53 @@ def nodes_from_asdl(asdl_tree, *, module=None, typed=False,
     If typed is True, the node classes' fields will be type-checked.
     primitive_types can be used to override the mapping from names of
     primitives appearing in the ASDL to their corresponding types.
+    
+    If compact is True, the node classes store their fields in
+    __slots__ (see MetaAST), which greatly reduces the memory used
+    per node.
+    
+    If interned is True, the node classes share a weak-value table of
+    live nodes, and constructing a node that is structurally equal to
+    a live node returns that node instead (see MetaAST). Equality of
+    nodes is then identity, and repeated subtrees are stored once.
+    All field values must be hashable.
+    
+    If summarized is True, each node records as _kinds a bitset of
+    the node classes occurring in its subtree, computed when it is
+    constructed from the bitsets of its children (see AST._kinds).
+    Visitors and transformers use it to skip subtrees that contain
+    no node they have a handler for. This costs an integer per node
+    and some construction time, so it pays off for trees that are
+    traversed several times by passes that handle few node types.
+    
+    If codegen is True, each class gets a constructor, __eq__(), and
+    _replace() specialized to its fields (see _gen_methods()). They
+    are generated when the class is first instantiated, so classes
+    that are never used cost little. Setting it to False leaves the
+    generic simplestruct implementations, which is mainly useful for
+    debugging and benchmarking.
+    
+    Each class records its position in the ASDLImporter order as
+    _kind_id, and the names of all classes in that order as
+    _kind_names. Since the order depends only on the grammar, this
+    identifies the node type across processes (see iast.binary). It
+    also records, as _child_fields, which of its fields have node
+    types rather than primitive types, and if typed is True, as
+    _child_reach, which node types may occur under each of them.
+    Visitors use the latter to skip fields that cannot lead to a node
+    they have a handler for.
+    """
+    info = ASDLImporter().run(asdl_tree)
+    return _nodes_from_info(info, module=module, typed=typed,
+                            compact=compact, interned=interned,
+                            summarized=summarized, codegen=codegen,
+                            primitive_types=primitive_types)
+
+def _nodes_from_info(info, *, module, typed, compact, interned, codegen,
+                     primitive_types, summarized=False, factories=None):
+    """Body of nodes_from_asdl(), taking the output of ASDLImporter.
+    If factories is given, it maps class names to precompiled method
+    factories (see _methods_source()).
     """
     # When not using types, we leave it to MetaAST to generate
     # the field descriptors from the _fields attribute.
@@ -211,11 +1022,26 @@ def nodes_from_asdl(asdl_tree, *, module=None, typed=False,
     # the actual type is patched in after creating all nodes.
     
     lang = {'AST': AST}
-    info = ASDLImporter().run(asdl_tree)
-    for name, (fields, base) in info.items():
+    intern_table = WeakValueDictionary() if interned else None
+    kind_names = tuple(info)
+    reach = _grammar_reach(info) if typed else None
+    for kind_id, (name, (fields, base)) in enumerate(info.items()):
         fieldnames = tuple(fn for fn, _ft, _fq in fields)
         namespace = {'__module__': module,
-                     '_fields': fieldnames}
+                     '_fields': fieldnames,
+                     '_kind_id': kind_id,
+                     '_kind_names': kind_names,
+                     '_child_fields': tuple(fn for fn, ft, _fq in fields
+                                            if ft in info)}
+        if typed:
+            namespace['_child_reach'] = tuple(reach[ft] for _fn, ft, _fq
+                                              in fields if ft in info)
+        if compact:
+            namespace['_compact'] = True
+        if interned:
+            namespace['_intern_table'] = intern_table
+        if summarized:
+            namespace['_summarized'] = True
         if typed:
             for fn, _ft, fq in fields:
                 namespace[fn] = TypedASTField(None, fq)
@@ -223,8 +1049,25 @@ def nodes_from_asdl(asdl_tree, *, module=None, typed=False,
         lang[name] = new_node
     if typed:
         for name, (fields, _base) in info.items():
+            descs = lang[name]._fieldmap
             for fn, ft, fq in fields:
                 typ = lang[ft] if ft in lang else primitive_types[ft]
-                desc = getattr(lang[name], fn)
-                desc.kind = typ
+                descs[fn].kind = typ
+        for name in info:
+            _get_field_kinds(lang[name])
+    if codegen:
+        for name, (fields, _base) in info.items():
+            specs = _method_specs(lang[name], fields, typed)
+            if factories:
+                _gen_methods(lang[name], specs, factories[name])
+            else:
+                _defer_methods(lang[name], specs)
     return lang
+
+def _method_specs(cls, fields, typed):
+    """Return the specs argument of _methods_source() for a class made
+    by _nodes_from_info(), given its ASDLImporter field list.
+    """
+    descs = cls._fieldmap
+    return [(fn, descs[fn].kind if typed else None, fq)
+            for fn, _ft, fq in fields]
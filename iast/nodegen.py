@@ -0,0 +1,244 @@
+"""Write the node classes of an ASDL grammar as a Python module, and
+cache such modules on disk.
+
+Most of the time spent creating and first using the classes of
+nodes_from_asdl() goes to compiling the specialized methods of each
+class. A generated module holds these
+methods as ordinary functions, so once Python has byte-compiled it,
+loading the classes takes no compilation at all.
+"""
+
+
+__all__ = [
+    'nodes_to_source',
+    'load_nodes',
+]
+
+
+import os
+import sys
+import types
+import hashlib
+import importlib
+import py_compile
+from collections import OrderedDict
+from importlib.machinery import SourceFileLoader
+
+from . import asdl
+from .node import (ASDLImporter, nodes_from_asdl, _nodes_from_info,
+                   _method_specs, _methods_source)
+
+
+# Bump when the generated source changes in a way that makes cached
+# modules stale.
+FORMAT_VERSION = 1
+
+
+def _type_path(typ):
+    """Return the (module, qualified name) pair locating a type, for
+    writing into generated source.
+    """
+    path = (typ.__module__, typ.__qualname__)
+    if _resolve_type(path) is not typ:
+        raise ValueError('Primitive type {!r} cannot be imported by '
+                         'name'.format(typ))
+    return path
+
+def _resolve_type(path):
+    modname, qualname = path
+    obj = importlib.import_module(modname)
+    for part in qualname.split('.'):
+        obj = getattr(obj, part, None)
+    return obj
+
+def _build(info, options, primitives, factories, module):
+    """Entry point used by generated modules to create the classes."""
+    info = OrderedDict((name, (fields, base))
+                       for name, fields, base in info)
+    primitive_types = {name: _resolve_type(path)
+                       for name, path in primitives.items()}
+    return _nodes_from_info(info, module=module, codegen=True,
+                            primitive_types=primitive_types,
+                            factories=factories, **options)
+
+
+def _module_parts(asdl_tree, typed, compact, interned, summarized,
+                  primitive_types):
+    info = ASDLImporter().run(asdl_tree)
+    options = OrderedDict([('typed', typed), ('compact', compact),
+                           ('interned', interned),
+                           ('summarized', summarized)])
+    primitives = OrderedDict()
+    if typed:
+        used = {ft for fields, _base in info.values()
+                   for _fn, ft, _fq in fields}
+        primitives.update((name, _type_path(primitive_types[name]))
+                          for name in sorted(primitive_types)
+                          if name in used and name not in info)
+    return info, options, primitives
+
+def nodes_to_source(asdl_tree, *, typed=False, compact=False,
+                    interned=False, summarized=False,
+                    primitive_types=asdl.primitive_types):
+    """Return the source of a Python module for the node classes of
+    an ASDL grammar. The options are as for nodes_from_asdl(), except
+    that primitive types must be importable by name.
+    
+    The module's build() function creates and returns the mapping
+    that nodes_from_asdl() would. It takes the same module argument
+    as nodes_from_asdl(), and each call creates new classes.
+    """
+    info, options, primitives = _module_parts(
+        asdl_tree, typed, compact, interned, summarized, primitive_types)
+    # Make throwaway classes to generate the methods from.
+    lang = _nodes_from_info(info, module=None, codegen=False,
+                            primitive_types=primitive_types, **options)
+    
+    lines = ['"""Node classes generated by iast.nodegen. Do not edit."""',
+             '', '',
+             'from iast.nodegen import _build',
+             '', '',
+             'INFO = [']
+    lines.extend('    {!r},'.format((name, fields, base))
+                 for name, (fields, base) in info.items())
+    lines.append(']')
+    lines.append('')
+    lines.append('OPTIONS = {!r}'.format(dict(options)))
+    lines.append('')
+    lines.append('PRIMITIVES = {!r}'.format(dict(primitives)))
+    for name, (fields, _base) in info.items():
+        source, _ns = _methods_source(
+            lang[name], _method_specs(lang[name], fields, typed))
+        lines.append('')
+        lines.append(source)
+    lines.append('FACTORIES = {')
+    lines.extend('    {0!r}: _methods_{0},'.format(name) for name in info)
+    lines.append('}')
+    lines.append('')
+    lines.append('def build(module=None):')
+    lines.append('    return _build(INFO, OPTIONS, PRIMITIVES, '
+                 'FACTORIES, module)')
+    return '\n'.join(lines) + '\n'
+
+
+def default_cache_dir():
+    """Return the directory used by load_nodes() when none is given:
+    the IAST_CACHE_DIR environment variable if set, and otherwise
+    iast under XDG_CACHE_HOME (by default ~/.cache). An empty
+    IAST_CACHE_DIR disables caching.
+    """
+    path = os.environ.get('IAST_CACHE_DIR')
+    if path is None:
+        base = (os.environ.get('XDG_CACHE_HOME') or
+                os.path.join(os.path.expanduser('~'), '.cache'))
+        path = os.path.join(base, 'iast')
+    return path
+
+_generator_digest = None
+
+def _get_generator_digest():
+    """Return a hash of the source of the modules that generate node
+    class modules, so that editing the generator makes cached modules
+    stale without a bump of FORMAT_VERSION. It is computed once.
+    """
+    global _generator_digest
+    if _generator_digest is None:
+        from . import node
+        h = hashlib.sha1()
+        for mod in [node, sys.modules[__name__]]:
+            try:
+                with open(mod.__file__, 'rb') as file:
+                    h.update(file.read())
+            except (AttributeError, OSError):
+                # No source to hash; rely on the version alone.
+                pass
+        _generator_digest = h.hexdigest()
+    return _generator_digest
+
+# Modules loaded by this process, by path.
+_loaded = {}
+
+def load_nodes(asdl_tree, *, module=None, typed=False, compact=False,
+               interned=False, summarized=False,
+               primitive_types=asdl.primitive_types, cache_dir=None):
+    """Like nodes_from_asdl(), but use a generated module (see
+    nodes_to_source()) from a cache directory, writing it there first
+    if needed. Modules are named by a hash of the grammar, the
+    options, the iast version, and the source of the generator, so
+    changing any of them makes a new one.
+    
+    If cache_dir is not given, default_cache_dir() is used. A cached
+    module that fails to import is regenerated. If the cache cannot be
+    written or read, or primitive types are not importable by name,
+    this falls back to nodes_from_asdl().
+    """
+    if cache_dir is None:
+        cache_dir = default_cache_dir()
+    kargs = dict(typed=typed, compact=compact, interned=interned,
+                 summarized=summarized, primitive_types=primitive_types)
+    if not cache_dir:
+        return nodes_from_asdl(asdl_tree, module=module, **kargs)
+    
+    from . import __version__
+    try:
+        key_parts = _module_parts(asdl_tree, typed, compact, interned,
+                                  summarized, primitive_types)
+    except ValueError:
+        return nodes_from_asdl(asdl_tree, module=module, **kargs)
+    info, options, primitives = key_parts
+    key = repr((FORMAT_VERSION, __version__, _get_generator_digest(),
+                list(info.items()), list(options.items()),
+                list(primitives.items())))
+    digest = hashlib.sha1(key.encode('utf-8')).hexdigest()[:16]
+    modname = 'iast_nodes_' + digest
+    path = os.path.join(cache_dir, modname + '.py')
+    
+    mod = _loaded.get(path)
+    if mod is None:
+        try:
+            if not os.path.exists(path):
+                _write_module(asdl_tree, kargs, cache_dir, path)
+            try:
+                mod = _import_path(modname, path)
+            except Exception:
+                # The cached module is unusable, e.g. truncated or
+                # edited. Replace it with a fresh one.
+                _write_module(asdl_tree, kargs, cache_dir, path)
+                mod = _import_path(modname, path)
+        except Exception:
+            return nodes_from_asdl(asdl_tree, module=module, **kargs)
+        _loaded[path] = mod
+    return mod.build(module)
+
+def _write_module(asdl_tree, kargs, cache_dir, path):
+    """Generate the module for a grammar and write it to path, along
+    with its bytecode.
+    """
+    source = nodes_to_source(asdl_tree, **kargs)
+    os.makedirs(cache_dir, exist_ok=True)
+    # Write under a temporary name and rename, so that concurrent
+    # processes never see a partial module.
+    tmp_path = '{}.{}.tmp'.format(path, os.getpid())
+    with open(tmp_path, 'wt', encoding='utf-8') as file:
+        file.write(source)
+    os.replace(tmp_path, path)
+    # Byte-compile now, even if the interpreter was told not to write
+    # bytecode when importing.
+    py_compile.compile(path, doraise=True)
+
+def _import_path(modname, path):
+    """Import the source file at path as a module, using (and writing)
+    its cached bytecode. Raise ImportError if it is not a module made
+    by nodes_to_source().
+    """
+    loader = SourceFileLoader(modname, path)
+    if sys.version_info < (3, 4):
+        mod = loader.load_module()
+    else:
+        mod = types.ModuleType(modname)
+        mod.__file__ = path
+        mod.__loader__ = loader
+        loader.exec_module(mod)
+    if not hasattr(mod, 'build'):
+        raise ImportError('{} is not a node class module'.format(path))
+    return mod
@@ -13,7 +13,7 @@ __all__ = [
 
 
 from .node import AST
-from .visitor import NodeVisitor, NodeTransformer
+from .visitor import NodeVisitor, NodeTransformer, iter_nodes
 
 
 class MatchFailure(Exception):
@@ -37,6 +37,9 @@ class VarExpander(NodeTransformer):
     
     """Expand pattern variables."""
     
+    # Pattern variables may stand in for primitive values.
+    _visit_primitives = True
+    
     def __init__(self, mapping):
         super().__init__()
         self.mapping = mapping
@@ -44,9 +47,23 @@ class VarExpander(NodeTransformer):
     def visit_PatVar(self, node):
         return self.mapping.get(node.id, node)
 
+_patvar_kinds = frozenset(['PatVar'])
+
+def occurs(var, tree):
+    """Run an occurs-check for a variable: return whether tree has a
+    pattern variable named var.
+    """
+    for node in iter_nodes(tree, _patvar_kinds, primitives=True):
+        if node.id == var:
+            return True
+    return False
+
 class OccChecker(NodeVisitor):
     
-    """Run an occurs-check for a variable."""
+    """Run an occurs-check for a variable. Equivalent to occurs(),
+    which process() uses. Visiting a matching PatVar still raises
+    Found, for code that drives the visitor itself.
+    """
     
     class Found(Exception):
         pass
@@ -56,12 +73,7 @@ class OccChecker(NodeVisitor):
         self.var = var
     
     def process(self, tree):
-        try:
-            super().process(tree)
-        except self.Found:
-            return True
-        else:
-            return False
+        return occurs(self.var, tree)
     
     def visit_PatVar(self, node):
         if node.id == self.var:
@@ -90,7 +102,7 @@ def match_step(lhs, rhs):
     if isinstance(lhs, PatVar):
         eqs = []
         if not (isinstance(rhs, PatVar) and rhs.id == lhs.id):
-            if OccChecker.run(rhs, lhs.id):
+            if occurs(lhs.id, rhs):
                 raise MatchFailure('Circular match on ' + lhs.id)
             bindings[lhs.id] = rhs
     
@@ -193,6 +205,10 @@ class PatternTransformer(NodeTransformer):
     according to the match.
     """
     
+    # Rules may match and replace primitive values, such as
+    # identifiers, so those fields are visited too.
+    _visit_primitives = True
+    
     def normalize_repl_func(self, repl):
         """Normalize a value that is either a replacement function
         or an AST to just a replacement function.
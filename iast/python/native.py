@@ -20,8 +20,8 @@ import ast
 import sys
 
 from ..util import trim
-from ..node import AST
-from .pynode import py33_nodes, py34_nodes
+from ..node import AST, unchecked
+from . import pynode
 
 
 # Dictionary of all node classes in the ast library.
@@ -34,9 +34,9 @@ native_nodes = {nodecls.__name__: nodecls
 # Alias for nodes dictionary matching current interpreter version.
 ver = sys.version_info
 if ver[:2] == (3, 3):
-    py_nodes = py33_nodes
+    py_nodes = pynode.py33_nodes
 elif ver[:2] == (3, 4):
-    py_nodes = py34_nodes
+    py_nodes = pynode.py34_nodes
 else:
     raise AssertionError('Unsupported Python version')
 
@@ -65,9 +65,12 @@ def convert_ast(tree, to_struct):
         return tree
 
 def pyToStruct(tree):
-    """Convert from a native AST to a Struct AST."""
+    """Convert from a native AST to a Struct AST. Native ASTs already
+    conform to the grammar, so the nodes are built unchecked.
+    """
     assert isinstance(tree, ast.AST)
-    return convert_ast(tree, to_struct=True)
+    with unchecked():
+        return convert_ast(tree, to_struct=True)
 
 def structToPy(tree):
     """Convert from a Struct AST to a native AST."""
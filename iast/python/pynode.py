@@ -1,4 +1,8 @@
-"""Struct versions of Python's own AST nodes."""
+"""Struct versions of Python's own AST nodes.
+
+The node sets are built on first access to py33_nodes or py34_nodes,
+so a process only pays for the versions it uses.
+"""
 
 
 __all__ = [
@@ -7,29 +11,47 @@ __all__ = [
 ]
 
 
-from ..asdl import python33_asdl, python34_asdl
-from ..node import nodes_from_asdl
-
-
-# Dictionary of all Struct classes for Python 3.3 and 3.4 node types.
-py33_nodes = {}
-py34_nodes = {}
-
-def initialize_nodetypes():
-    """Populate the Struct nodes dictionaries."""
-    assert len(py33_nodes) == len(py34_nodes) == 0
+import sys
+import types
+
+from .. import asdl
+from ..nodegen import load_nodes
+
+
+# If anyone asks, the classes are defined in python33.py and
+# python34.py since they are available on those module's namespaces.
+_package = __name__[:__name__.rfind('.')]
+_versions = {
+    'py33_nodes': ('python33_asdl', _package + '.python33'),
+    'py34_nodes': ('python34_asdl', _package + '.python34'),
+}
+
+# Dictionaries of all Struct classes for Python 3.3 and 3.4 node types,
+# by attribute name, once built.
+_nodes = {}
+
+def _get_nodes(name):
+    """Return the Struct nodes dictionary for the given attribute name,
+    building it if needed.
+    """
+    nodes = _nodes.get(name)
+    if nodes is None:
+        asdl_name, home = _versions[name]
+        # The classes' methods are loaded precompiled from the on-disk
+        # cache (see nodegen.load_nodes()).
+        nodes = _nodes[name] = load_nodes(
+                getattr(asdl, asdl_name), module=home,
+                typed=True, compact=True)
+    return nodes
+
+class _PyNodeModule(types.ModuleType):
     
-    # If anyone asks, these are defined in python33.py and
-    # python34.py since they are available on those module's
-    # namespaces.
-    home33 = __name__[:__name__.rfind('.')] + '.python33'
-    home34 = __name__[:__name__.rfind('.')] + '.python34'
+    # Module type of this module, with properties for the node sets.
+    # (Module-level __getattr__() needs Python 3.7.)
     
-    py33_nodes.update(nodes_from_asdl(
-            python33_asdl, module=home33,
-            typed=True))
-    py34_nodes.update(nodes_from_asdl(
-            python34_asdl, module=home34,
-            typed=True))
-
-initialize_nodetypes()
+    py33_nodes = property(lambda self: _get_nodes('py33_nodes'))
+    py34_nodes = property(lambda self: _get_nodes('py34_nodes'))
+
+_module = _PyNodeModule(__name__)
+_module.__dict__.update(globals())
+sys.modules[__name__] = _module
@@ -8,14 +8,285 @@ __all__ = [
     'AdvNodeVisitor',
     'NodeTransformer',
     'AdvNodeTransformer',
+    'IterNodeVisitor',
+    'IterNodeTransformer',
+    'MemoNodeTransformer',
+    'run_fused',
+    'iter_nodes',
+    'find_first',
+    'any_node',
+    'RunManyError',
     'ChangeCounter',
 ]
 
 
+import os
+import pickle
+import traceback
+from abc import ABCMeta
+from types import FunctionType
+from operator import attrgetter
+from collections import OrderedDict, deque
+from collections.abc import Sequence
+from weakref import WeakKeyDictionary
+
 from .node import AST
+from .binary import Codec
+
+
+# Default of the _field and _index arguments of AdvNodeVisitor's methods,
+# meaning that they are taken from _next_field and _next_index.
+_next = object()
+
+# Per-class tables created and cleared by MetaVisitor.
+_dispatch_tables = ('_dispatch', '_iter_dispatch', '_kind_masks')
+
+class MetaVisitor(ABCMeta):
+    
+    """Metaclass for visitors. Each visitor class gets its own dispatch
+    table, _dispatch, mapping node classes to handler functions (or to
+    None, for generic_visit()). It is filled in by _get_handler() as
+    node classes are encountered, and cleared whenever an attribute of
+    the class or of one of its bases is set or deleted, so handlers
+    may be added or rebound after the class is created. The table
+    _iter_dispatch is the counterpart used by IterNodeVisitor and
+    IterNodeTransformer (see _get_iter_entry()), and _kind_masks
+    caches the results of _kind_mask().
+    
+    This derives from ABCMeta, so that visitors may also inherit from
+    abc.ABC. Visitors mixing in a class with some other metaclass need
+    a metaclass deriving from both.
+    """
+    
+    def __new__(mcls, clsname, bases, namespace, **kargs):
+        namespace = dict(namespace)
+        for table in _dispatch_tables:
+            namespace[table] = {}
+        return super().__new__(mcls, clsname, bases, namespace, **kargs)
+    
+    def __setattr__(cls, name, value):
+        super().__setattr__(name, value)
+        cls._clear_dispatch()
+    
+    def __delattr__(cls, name):
+        super().__delattr__(name)
+        cls._clear_dispatch()
+    
+    def _clear_dispatch(cls):
+        stack = [cls]
+        while stack:
+            c = stack.pop()
+            for table in _dispatch_tables:
+                getattr(c, table).clear()
+            stack.extend(c.__subclasses__())
+
+def _find_handler(vcls, name):
+    """Return the handler of visitor class vcls with the given name,
+    as a function to be called with the visitor instance and the
+    node, or None if there is no such handler.
+    """
+    for c in vcls.__mro__:
+        if name in c.__dict__:
+            raw = c.__dict__[name]
+            break
+    else:
+        return None
+    if raw is None or type(raw) is FunctionType:
+        return raw
+    # Static methods, callable objects, and the like. Let attribute
+    # lookup bind them as usual.
+    def handler(self, *args, **kargs):
+        return getattr(self, name)(*args, **kargs)
+    return handler
+
+def _prunable(vcls):
+    """Return whether visitor class vcls traverses trees in one of the
+    standard ways, so that generically visiting a subtree with no node
+    it has a handler for has no effect other than the default result.
+    """
+    return (not vcls._visit_primitives and
+            all(getattr(vcls, name) in _standard_methods
+                for name in ('visit', 'node_visit', 'seq_visit',
+                             'generic_visit')))
+
+def _kind_mask(vcls, node_cls, prefixes):
+    """Return a pair of the bitset of the node kinds of node_cls's
+    grammar (see AST._kinds) that visitor class vcls has a handler
+    for, with any of the given name prefixes, and whether all of its
+    handlers with those prefixes are for kinds of that grammar. An
+    extra bit, past the grammar's kinds, is always set in the bitset,
+    so that unknown summaries (-1) intersect it.
+    """
+    names = node_cls._kind_names
+    key = (names, prefixes)
+    result = vcls._kind_masks.get(key)
+    if result is None:
+        mask = 1 << len(names)
+        for i, name in enumerate(names):
+            if any(_find_handler(vcls, prefix + name) is not None
+                   for prefix in prefixes):
+                mask |= 1 << i
+        known = set(names)
+        complete = all(attr[len(prefix):] in known
+                       for attr in dir(vcls) for prefix in prefixes
+                       if attr.startswith(prefix))
+        result = vcls._kind_masks[key] = (mask, complete)
+    return result
+
+def _prune_plan(vcls, node_cls, prefixes):
+    """Return how visitor class vcls, which has no handler for node
+    class node_cls, may prune its generic visit of such nodes, as a
+    pair of:
+    
+        - a bitset that a node's summary (see AST._kinds) must
+          intersect for the node's subtree to be traversed, or None
+          if the class is not summarized
+        
+        - the child fields to traverse, or None for all of them;
+          fields whose grammar type cannot lead to a node vcls has a
+          handler for (see AST._child_reach) are left out
+    
+    Return None if nothing can be pruned. Handler names are formed
+    with the given prefixes. Static pruning is not done if vcls has
+    handlers for classes outside the grammar, such as subclasses of
+    grammar classes, since nodes of those may occur anywhere.
+    """
+    if node_cls._kind_names is None or not _prunable(vcls):
+        return None
+    mask, complete = _kind_mask(vcls, node_cls, prefixes)
+    fields = None
+    reach = node_cls._child_reach
+    if reach is not None and complete:
+        kept = tuple(field for field, bits
+                     in zip(node_cls._child_fields, reach)
+                     if bits & mask)
+        if len(kept) < len(reach):
+            fields = kept
+    if not node_cls._summarized:
+        mask = None
+    if mask is None and fields is None:
+        return None
+    return mask, fields
+
+def _make_pruner(vcls, mask, fields):
+    """Return a handler for vcls that does what its generic visit
+    would, but only traverses the node's subtree if its summary
+    intersects mask (unless mask is None), and then only the given
+    child fields (unless fields is None); see _prune_plan(). The pair
+    of mask and fields is recorded as the attribute _prune, for
+    run_fused().
+    """
+    transformer = issubclass(vcls, (NodeTransformer, AdvNodeTransformer))
+    if issubclass(vcls, AdvNodeVisitor) and transformer:
+        def prune(self, node, *args, **kargs):
+            if mask is not None and not node._kinds & mask:
+                return node
+            if fields is None:
+                return self.generic_visit(node, *args, **kargs)
+            repls = {}
+            for field in fields:
+                value = getattr(node, field)
+                self._next_field = field
+                if args or kargs:
+                    result = self.visit(value, *args, **kargs)
+                else:
+                    result = self.visit(value)
+                if result is not value:
+                    repls[field] = result
+            self._next_field = None
+            return node._replace(**repls) if repls else node
+    elif issubclass(vcls, AdvNodeVisitor):
+        def prune(self, node, *args, **kargs):
+            if mask is not None and not node._kinds & mask:
+                return None
+            if fields is None:
+                return self.generic_visit(node, *args, **kargs)
+            for field in fields:
+                self._next_field = field
+                if args or kargs:
+                    self.visit(getattr(node, field), *args, **kargs)
+                else:
+                    self.visit(getattr(node, field))
+            self._next_field = None
+    elif transformer:
+        def prune(self, node):
+            if mask is not None and not node._kinds & mask:
+                return node
+            if fields is None:
+                return self.generic_visit(node)
+            repls = {}
+            for field in fields:
+                value = getattr(node, field)
+                result = self.visit(value)
+                if result is not value:
+                    repls[field] = result
+            return node._replace(**repls) if repls else node
+    else:
+        def prune(self, node):
+            if mask is not None and not node._kinds & mask:
+                return None
+            if fields is None:
+                return self.generic_visit(node)
+            for field in fields:
+                self.visit(getattr(node, field))
+    prune._prune = (mask, fields)
+    return prune
 
+def _get_handler(vcls, node_cls):
+    """Return the handler of visitor class vcls for nodes of class
+    node_cls (see _find_handler()), recording it in the class's
+    dispatch table. For node classes without a handler, this may be
+    a pruner (see _make_pruner()).
+    """
+    handler = _find_handler(vcls, 'visit_' + node_cls.__name__)
+    if handler is None:
+        plan = _prune_plan(vcls, node_cls, ('visit_',))
+        if plan is not None:
+            handler = _make_pruner(vcls, *plan)
+    vcls._dispatch[node_cls] = handler
+    return handler
+
+def _field_getter(fields):
+    """Return a function returning the tuple of the values of the
+    given fields of a node.
+    """
+    if len(fields) == 0:
+        return lambda node: ()
+    elif len(fields) == 1:
+        getter1 = attrgetter(fields[0])
+        return lambda node: (getter1(node),)
+    else:
+        return attrgetter(*fields)
 
-class NodeVisitor:
+def _get_iter_entry(vcls, node_cls):
+    """Return the entry of the explicit-stack engines for visitor
+    class vcls and nodes of class node_cls, recording it in the
+    class's _iter_dispatch table. The entry is a tuple of the visit_
+    handler, the leave_ handler, the names of the fields to traverse,
+    a function returning the values of those fields in reverse order,
+    and a bitset of the kinds that must occur in a node's subtree for
+    it to be traversed (or None to always traverse it). The fields
+    and bitset are as planned by _prune_plan().
+    """
+    handler = _find_handler(vcls, 'visit_' + node_cls.__name__)
+    fields = node_cls._child_fields
+    if fields is None or vcls._visit_primitives:
+        fields = node_cls._fields
+    mask = None
+    if handler is None:
+        plan = _prune_plan(vcls, node_cls, ('visit_', 'leave_'))
+        if plan is not None:
+            mask, kept = plan
+            if kept is not None:
+                fields = kept
+    getter = _field_getter(tuple(reversed(fields)))
+    entry = (handler, _find_handler(vcls, 'leave_' + node_cls.__name__),
+             fields, getter, mask)
+    vcls._iter_dispatch[node_cls] = entry
+    return entry
+
+
+class NodeVisitor(metaclass=MetaVisitor):
     
     """Walk a tree, dispatching to different handlers by node type.
     To use, create a subclass and define or override the visit
@@ -35,6 +306,11 @@ class NodeVisitor:
     it can call self.generic_visit(node) to get them all. Do not call
     self.visit(node), as that would create a call cycle.
     
+    Handlers are looked up on the visitor class, once per node class,
+    and cached (see MetaVisitor). They may be aliased (e.g.
+    'visit_Add = visit_Sub = op_helper') or assigned to the class
+    later, but not assigned to individual visitor instances.
+    
     To invoke the visitor, call the process() method with the tree.
     Subclasses can override process to do initial setup/teardown
     actions or tweak the returned value. The run() classmethod is
@@ -46,6 +322,22 @@ class NodeVisitor:
     
     Note that since Struct nodes are immutable, NodeTransformer must
     be used if you want a tree transformation.
+    
+    For node classes made by nodes_from_asdl(), generic_visit() only
+    visits the fields whose grammar type is a node type (see
+    AST._child_fields), and not those holding identifiers, strings,
+    and other primitive values. Unless the visitor overrides visit(),
+    node_visit(), seq_visit(), or generic_visit(), it also skips parts
+    of the tree that contain no node that has a handler: for typed
+    node classes, the fields whose grammar type cannot lead to such a
+    node (see AST._child_reach), and for summarized node classes, the
+    subtrees whose summary rules them out (see nodes_from_asdl()).
+    """
+    
+    _visit_primitives = False
+    """If True, generic_visit() visits all fields, including those
+    with primitive types. This is needed for trees that may have
+    metasyntactic nodes in primitive fields, such as patterns.
     """
     
     @classmethod
@@ -58,6 +350,54 @@ class NodeVisitor:
         result = visitor.process(tree)
         return result
     
+    @classmethod
+    def run_many(cls, trees, *args, workers=None, nodes=None,
+                 chunksize=8, ordered=True, **kargs):
+        """Run the visitor over each tree of an iterable, in a pool of
+        worker processes, and return an iterator over the results.
+        Each result is that of run(tree, *args, **kargs). If ordered
+        is True, results are produced in the order of trees; otherwise
+        they are produced as they complete, as (index, result) pairs.
+        
+        workers is the number of processes, by default the number of
+        CPUs; if it is 1, the trees are processed in the calling
+        process. Trees are sent in chunks of chunksize. If nodes, the
+        node set the trees belong to, is given, trees and results are
+        sent between processes in the encoding of iast.binary where
+        possible; otherwise they are pickled. A result that is its tree
+        itself, as for a transformer making no change, is produced as
+        the given tree object. The visitor class, args, and kargs must
+        be picklable, i.e. the class must be importable by name.
+        
+        If processing a tree raises an exception, RunManyError is
+        raised with the index of that tree, and no further results
+        are produced.
+        """
+        if workers is None:
+            workers = os.cpu_count() or 1
+        # Map from index to tree, for the trees sent out and not yet
+        # returned.
+        inputs = {}
+        def items(codec):
+            for i, tree in enumerate(trees):
+                inputs[i] = tree
+                yield _batch_pack(codec, i, tree)
+        
+        if workers == 1:
+            worker = _BatchWorker(cls, args, kargs, None, False)
+            tasks = map(worker, items(None))
+            yield from _batch_results(tasks, None, ordered, inputs)
+            return
+        
+        import multiprocessing
+        codec = Codec(nodes) if nodes is not None else None
+        classes = codec.classes if codec is not None else None
+        with multiprocessing.Pool(workers, _batch_init,
+                                  (cls, args, kargs, classes)) as pool:
+            imap = pool.imap if ordered else pool.imap_unordered
+            tasks = imap(_batch_task, items(codec), chunksize)
+            yield from _batch_results(tasks, codec, ordered, inputs)
+    
     def process(self, tree):
         """Entry point for invoking the visitor."""
         result = self.visit(tree)
@@ -78,10 +418,14 @@ class NodeVisitor:
         """Dispatch to a particular node handler if it exists,
         or else to generic_visit().
         """
-        method = 'visit_' + node.__class__.__name__
-        visitor = getattr(self, method, self.generic_visit)
-        result = visitor(node)
-        return result
+        node_cls = node.__class__
+        try:
+            handler = self._dispatch[node_cls]
+        except KeyError:
+            handler = _get_handler(type(self), node_cls)
+        if handler is None:
+            return self.generic_visit(node)
+        return handler(self, node)
     
     def seq_visit(self, seq):
         """Dispatch to each item of a sequence."""
@@ -90,7 +434,10 @@ class NodeVisitor:
     
     def generic_visit(self, node):
         """Dispatch to each field of a node."""
-        for field in node._fields:
+        fields = node._child_fields
+        if fields is None or self._visit_primitives:
+            fields = node._fields
+        for field in fields:
             value = getattr(node, field)
             self.visit(value)
 
@@ -101,7 +448,7 @@ class AdvNodeVisitor(NodeVisitor):
     for passing arbitrary arguments to visit handlers.
     
     The stack of currently visited nodes is made available in the
-    _visit_stack attribute. Its format is a list of tuples (most
+    _visit_stack attribute. Its format is a sequence of tuples (most
     recent last) of form (node, field, index):
     
         - node is the AST object being visited for that entry
@@ -112,56 +459,170 @@ class AdvNodeVisitor(NodeVisitor):
         - index is the location of this node in the currently
           visited sequence, or None if we are not in a sequence.
     
+    The stack is kept as the parallel lists _visit_nodes,
+    _visit_fields, and _visit_indices; _visit_stack is a view of them
+    that builds the tuples on access. It cannot be modified in place,
+    but assigning a list of tuples to it replaces the stack's contents.
+    
     Visitors and handlers may pass *args and **kargs, which get
-    propagated by the default visitor methods unchanged. However,
-    the special keyword arguments '_field' and '_index' are
-    intercepted by node_visit() and used to help manage _visit_stack.
-    Any override of seq_visit() or generic_visit() should pass these
-    keyword arguments to visit().
+    propagated by the default visitor methods unchanged. The field
+    and index of the next node to be visited are passed from
+    generic_visit() and seq_visit() to node_visit() in the attributes
+    _next_field and _next_index, which node_visit() resets to None.
+    Any override of seq_visit() or generic_visit() should set them
+    before calling visit(), or pass them to visit() as the special
+    keyword arguments '_field' and '_index', which take precedence.
+    An override that only passes '_index' gets the field of the
+    enclosing sequence, which visit() records as _seq_field.
     """
     
+    @property
+    def _visit_stack(self):
+        return _VisitStack(self)
+    
+    @_visit_stack.setter
+    def _visit_stack(self, stack):
+        stack = list(stack)
+        for i, name in enumerate(['_visit_nodes', '_visit_fields',
+                                  '_visit_indices']):
+            values = [entry[i] for entry in stack]
+            # Update the lists in place, since node_visit() holds
+            # on to them while a node is visited.
+            lst = self.__dict__.get(name)
+            if lst is None:
+                setattr(self, name, values)
+            else:
+                lst[:] = values
+    
     def process(self, tree):
         """Entry point for invoking the visitor."""
-        self._visit_stack = []
+        self._visit_nodes = []
+        self._visit_fields = []
+        self._visit_indices = []
+        self._next_field = None
+        self._next_index = None
+        self._seq_field = None
         result = super().process(tree)
-        assert len(self._visit_stack) == 0, 'Visit stack unbalanced'
+        assert len(self._visit_nodes) == 0, 'Visit stack unbalanced'
         return result
     
     def visit(self, tree, *args, **kargs):
         """Dispatch on a node or sequence (tuple). Other kinds
         of values are returned without processing.
         """
+        # Calls without extra arguments are made directly, as they are
+        # cheaper than those unpacking args and kargs.
         if isinstance(tree, AST):
-            return self.node_visit(tree, *args, **kargs)
+            if args or kargs:
+                return self.node_visit(tree, *args, **kargs)
+            return self.node_visit(tree)
         elif isinstance(tree, tuple):
-            return self.seq_visit(tree, *args, **kargs)
+            # Record the field of the sequence, for overrides of
+            # seq_visit() that pass only '_index' (see node_visit()).
+            seq_field = self._seq_field
+            self._seq_field = (kargs.get('_field', self._next_field)
+                               if kargs else self._next_field)
+            if args or kargs:
+                result = self.seq_visit(tree, *args, **kargs)
+            else:
+                result = self.seq_visit(tree)
+            self._seq_field = seq_field
+            return result
         else:
             return tree
     
-    def node_visit(self, node, *args, _field=None, _index=None, **kargs):
+    def node_visit(self, node, *args, _field=_next, _index=_next,
+                   **kargs):
         """Dispatch to a particular node handler if it exists,
         or else to generic_visit().
         """
-        entry = (node, _field, _index)
-        self._visit_stack.append(entry)
+        if _field is _next:
+            _field = (self._next_field if _index is _next
+                      else self._seq_field)
+        if _index is _next:
+            _index = self._next_index
+        self._next_field = self._next_index = None
+        nodes = self._visit_nodes
+        fields = self._visit_fields
+        indices = self._visit_indices
+        nodes.append(node)
+        fields.append(_field)
+        indices.append(_index)
         
-        method = 'visit_' + node.__class__.__name__
-        visitor = getattr(self, method, self.generic_visit)
-        result = visitor(node, *args, **kargs)
+        node_cls = node.__class__
+        try:
+            handler = self._dispatch[node_cls]
+        except KeyError:
+            handler = _get_handler(type(self), node_cls)
+        if args or kargs:
+            if handler is None:
+                result = self.generic_visit(node, *args, **kargs)
+            else:
+                result = handler(self, node, *args, **kargs)
+        elif handler is None:
+            result = self.generic_visit(node)
+        else:
+            result = handler(self, node)
         
-        self._visit_stack.pop()
+        nodes.pop()
+        fields.pop()
+        indices.pop()
         return result
     
-    def seq_visit(self, seq, *args, **kargs):
+    def seq_visit(self, seq, *args, _field=_next, _index=_next, **kargs):
         """Dispatch to each item of a sequence."""
+        if _field is _next:
+            _field = self._next_field
         for i, item in enumerate(seq):
-            self.visit(item, _index=i, *args, **kargs)
+            self._next_field = _field
+            self._next_index = i
+            if args or kargs:
+                self.visit(item, *args, **kargs)
+            else:
+                self.visit(item)
+        self._next_field = self._next_index = None
     
     def generic_visit(self, node, *args, **kargs):
         """Dispatch to each field of a node."""
-        for field in node._fields:
+        fields = node._child_fields
+        if fields is None or self._visit_primitives:
+            fields = node._fields
+        for field in fields:
             value = getattr(node, field)
-            self.visit(value, _field=field, *args, **kargs)
+            self._next_field = field
+            if args or kargs:
+                self.visit(value, *args, **kargs)
+            else:
+                self.visit(value)
+        self._next_field = None
+
+
+class _VisitStack(Sequence):
+    
+    """Read-only view of the context stack of an AdvNodeVisitor, as
+    a sequence of (node, field, index) tuples.
+    """
+    
+    __slots__ = ('nodes', 'fields', 'indices')
+    
+    def __init__(self, visitor):
+        self.nodes = visitor._visit_nodes
+        self.fields = visitor._visit_fields
+        self.indices = visitor._visit_indices
+    
+    def __len__(self):
+        return len(self.nodes)
+    
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return list(zip(self.nodes[i], self.fields[i], self.indices[i]))
+        return (self.nodes[i], self.fields[i], self.indices[i])
+    
+    def __iter__(self):
+        return zip(self.nodes, self.fields, self.indices)
+    
+    def __repr__(self):
+        return repr(list(self))
 
 
 class NodeTransformer(NodeVisitor):
@@ -191,7 +652,9 @@ class NodeTransformer(NodeVisitor):
     # it would be costly to recognize the case where distinct trees
     # are equal to each other. (In fact, it would take quadratic time
     # in the depth of the tree.) For efficiency, avoid returning
-    # equal but non-identical values unnecessarily.
+    # equal but non-identical values unnecessarily. (For interned node
+    # classes, see nodes_from_asdl(), equal nodes are identical, so
+    # rebuilding an equal node is recognized as no change.)
     #
     # So long as all children return no change, seq_visit() and
     # generic_visit() return no change. This means that the only
@@ -204,6 +667,81 @@ class NodeTransformer(NodeVisitor):
     considered the same as if the given node were returned.
     """
     
+    _context_free = False
+    """Declares that transforming a subtree gives the same result
+    wherever the subtree occurs, and regardless of what has been
+    transformed before. Required by run_split().
+    """
+    
+    @classmethod
+    def run_split(cls, tree, *args, workers=None, nodes=None,
+                  chunksize=None, **kargs):
+        """Like run(), but transform the items of the sequence fields
+        of tree, e.g. the statements of a Module, in a pool of worker
+        processes using run_many(), and splice the results back as
+        seq_visit() does. The other fields are transformed in the
+        calling process. If tree is a sequence, its items are split up
+        in the same way.
+        
+        The class must be declared _context_free. If it has a handler
+        for the class of tree, which may need to see the whole tree,
+        the tree is transformed in the calling process. Items are sent
+        to the workers in chunks of chunksize, by default about four
+        chunks per worker; see run_many() for the other arguments.
+        
+        The items and their results are rebuilt in the receiving
+        process, so this only pays off for transformations that cost
+        much more than constructing the nodes they are given.
+        """
+        if not cls._context_free:
+            raise TypeError('{} is not declared context-free '
+                            '(_context_free)'.format(cls.__name__))
+        if workers is None:
+            workers = os.cpu_count() or 1
+        
+        # Each chunk of a sequence is sent as a tuple, whose result
+        # is spliced by seq_visit(); the chunk results are joined.
+        def split(seq):
+            size = chunksize
+            if size is None:
+                size = max(1, -(-len(seq) // (workers * 4)))
+            chunks = [seq[i:i + size] for i in range(0, len(seq), size)]
+            results = cls.run_many(chunks, *args, workers=workers,
+                                   nodes=nodes, chunksize=1, **kargs)
+            changed = False
+            new_seq = []
+            for chunk, result in zip(chunks, results):
+                if result is not chunk:
+                    changed = True
+                new_seq.extend(result)
+            return tuple(new_seq) if changed else seq
+        
+        if isinstance(tree, tuple):
+            return split(tree)
+        if not isinstance(tree, AST):
+            return tree
+        handler = _get_handler(cls, tree.__class__)
+        if handler is not None and not hasattr(handler, '_prune'):
+            return cls.run(tree, *args, **kargs)
+        
+        repls = {}
+        fields = tree._child_fields
+        if fields is None or cls._visit_primitives:
+            fields = tree._fields
+        for field in fields:
+            value = getattr(tree, field)
+            if isinstance(value, tuple):
+                result = split(value)
+            else:
+                result = cls.run(value, *args, **kargs)
+            if result is not value:
+                repls[field] = result
+        
+        if len(repls) == 0:
+            return tree
+        else:
+            return tree._replace(**repls)
+    
     def visit(self, tree):
         result = super().visit(tree)
         if self._nochange_none and isinstance(tree, AST) and result is None:
@@ -233,7 +771,10 @@ class NodeTransformer(NodeVisitor):
     
     def generic_visit(self, node):
         repls = {}
-        for field in node._fields:
+        fields = node._child_fields
+        if fields is None or self._visit_primitives:
+            fields = node._fields
+        for field in fields:
             value = getattr(node, field)
             result = self.visit(value)
             if result is not value:
@@ -252,23 +793,34 @@ class AdvNodeTransformer(AdvNodeVisitor):
     _nochange_none = True
     
     def visit(self, tree, *args, **kargs):
-        result = super().visit(tree, *args, **kargs)
+        if args or kargs:
+            result = super().visit(tree, *args, **kargs)
+        else:
+            result = super().visit(tree)
         if self._nochange_none and isinstance(tree, AST) and result is None:
             result = tree
         return result
     
-    def seq_visit(self, seq, *args, **kargs):
+    def seq_visit(self, seq, *args, _field=_next, _index=_next, **kargs):
+        if _field is _next:
+            _field = self._next_field
         changed = False
         new_seq = []
         
         for i, item in enumerate(seq):
-            result = self.visit(item, _index=i, *args, **kargs)
+            self._next_field = _field
+            self._next_index = i
+            if args or kargs:
+                result = self.visit(item, *args, **kargs)
+            else:
+                result = self.visit(item)
             if result is not item:
                 changed = True
             if isinstance(result, (tuple, list)):
                 new_seq.extend(result)
             else:
                 new_seq.append(result)
+        self._next_field = self._next_index = None
         
         if changed:
             return tuple(new_seq)
@@ -280,11 +832,19 @@ class AdvNodeTransformer(AdvNodeVisitor):
     
     def generic_visit(self, node, *args, **kargs):
         repls = {}
-        for field in node._fields:
+        fields = node._child_fields
+        if fields is None or self._visit_primitives:
+            fields = node._fields
+        for field in fields:
             value = getattr(node, field)
-            result = self.visit(value, _field=field, *args, **kargs)
+            self._next_field = field
+            if args or kargs:
+                result = self.visit(value, *args, **kargs)
+            else:
+                result = self.visit(value)
             if result is not value:
                 repls[field] = result
+        self._next_field = None
         
         if len(repls) == 0:
             return node
@@ -292,6 +852,720 @@ class AdvNodeTransformer(AdvNodeVisitor):
             return node._replace(**repls)
 
 
+class _Leave:
+    
+    """Stack entry of IterNodeVisitor, for calling a leave_ handler
+    once a node's subtree has been traversed.
+    """
+    
+    __slots__ = ('handler', 'node')
+    
+    def __init__(self, handler, node):
+        self.handler = handler
+        self.node = node
+
+class IterNodeVisitor(NodeVisitor):
+    
+    """Drop-in replacement for NodeVisitor that traverses subtrees
+    with an explicit stack instead of recursive calls.
+    
+    Handlers have the same meaning as for NodeVisitor, and are called
+    in the same order. The difference is in generic_visit(): rather
+    than calling visit() on each child, it walks the subtree itself,
+    stopping at the nodes that have a handler and calling it. Python
+    frames are therefore only nested where handlers themselves recurse
+    by calling generic_visit(), and the depth of the tree is otherwise
+    not limited by the recursion limit.
+    
+    Postorder processing is available without recursion: a handler
+    named 'leave_' followed by a node type name is called on each node
+    of that type after its subtree has been traversed. It is only used
+    for nodes with no 'visit_' handler.
+    
+    If a subclass overrides visit(), seq_visit(), node_visit(), or
+    generic_visit(), then generic_visit() falls back on the recursive
+    traversal of NodeVisitor, so that the overrides see every child.
+    """
+    
+    def _uses_stack(self):
+        cls = type(self)
+        return (cls.visit is NodeVisitor.visit and
+                cls.seq_visit is NodeVisitor.seq_visit and
+                cls.node_visit is IterNodeVisitor.node_visit and
+                cls.generic_visit is IterNodeVisitor.generic_visit)
+    
+    def node_visit(self, node):
+        node_cls = node.__class__
+        try:
+            entry = self._iter_dispatch[node_cls]
+        except KeyError:
+            entry = _get_iter_entry(type(self), node_cls)
+        handler, leave, _fields, _getter, _mask = entry
+        if handler is not None:
+            return handler(self, node)
+        
+        result = self.generic_visit(node)
+        if leave is not None:
+            result = leave(self, node)
+        return result
+    
+    def generic_visit(self, node):
+        if not self._uses_stack():
+            return super().generic_visit(node)
+        
+        vcls = type(self)
+        dispatch = self._iter_dispatch
+        
+        # Values still to be visited, last one first.
+        try:
+            entry = dispatch[node.__class__]
+        except KeyError:
+            entry = _get_iter_entry(vcls, node.__class__)
+        stack = list(entry[3](node))
+        pop = stack.pop
+        push = stack.append
+        extend = stack.extend
+        
+        while stack:
+            value = pop()
+            if isinstance(value, AST):
+                try:
+                    entry = dispatch[value.__class__]
+                except KeyError:
+                    entry = _get_iter_entry(vcls, value.__class__)
+                handler, leave, _fields, getter, mask = entry
+                if handler is not None:
+                    handler(self, value)
+                    continue
+                if mask is not None and not value._kinds & mask:
+                    continue
+                if leave is not None:
+                    push(_Leave(leave, value))
+                extend(getter(value))
+            elif isinstance(value, tuple):
+                extend(reversed(value))
+            elif type(value) is _Leave:
+                value.handler(self, value.node)
+
+class IterNodeTransformer(NodeTransformer):
+    
+    """Drop-in replacement for NodeTransformer that traverses subtrees
+    with an explicit stack instead of recursive calls, as described
+    for IterNodeVisitor. The result is the same: handler results are
+    interpreted as for NodeTransformer, sequences are spliced, and
+    only the nodes on paths from changed nodes to the root are copied.
+    
+    A 'leave_' handler receives the node after its children have been
+    transformed (a copy, if any of them changed), and returns its
+    replacement as a 'visit_' handler would.
+    """
+    
+    def _uses_stack(self):
+        cls = type(self)
+        return (cls.visit is NodeTransformer.visit and
+                cls.seq_visit is NodeTransformer.seq_visit and
+                cls.node_visit is IterNodeTransformer.node_visit and
+                cls.generic_visit is IterNodeTransformer.generic_visit)
+    
+    def node_visit(self, node):
+        node_cls = node.__class__
+        try:
+            entry = self._iter_dispatch[node_cls]
+        except KeyError:
+            entry = _get_iter_entry(type(self), node_cls)
+        handler, leave, _fields, _getter, _mask = entry
+        if handler is not None:
+            return handler(self, node)
+        
+        result = self.generic_visit(node)
+        if leave is not None:
+            new_result = leave(self, result)
+            if not (self._nochange_none and new_result is None):
+                result = new_result
+        return result
+    
+    def generic_visit(self, node):
+        if not self._uses_stack():
+            return super().generic_visit(node)
+        
+        vcls = type(self)
+        dispatch = self._iter_dispatch
+        nochange_none = self._nochange_none
+        
+        # Each frame is a list of:
+        #   - the node or sequence being processed
+        #   - for a node, the names of the fields to visit; for a
+        #     sequence, None
+        #   - the index of the next field or item to visit
+        #   - for a node, a dict of replaced fields; for a sequence,
+        #     a list of the new items; either is None until the first
+        #     change
+        #   - for a node, its leave_ handler or None
+        try:
+            entry = dispatch[node.__class__]
+        except KeyError:
+            entry = _get_iter_entry(vcls, node.__class__)
+        stack = [[node, entry[2], 0, None, None]]
+        
+        while True:
+            frame = stack[-1]
+            orig, fields, i, acc, leave = frame
+            
+            # Get the next child, or finish the frame.
+            if fields is not None:
+                if i < len(fields):
+                    frame[2] = i + 1
+                    value = getattr(orig, fields[i])
+                else:
+                    stack.pop()
+                    result = orig if acc is None else orig._replace(**acc)
+                    if leave is not None:
+                        new_result = leave(self, result)
+                        if not (nochange_none and new_result is None):
+                            result = new_result
+                    if not stack:
+                        return result
+                    self._deliver(stack[-1], orig, result)
+                    continue
+            else:
+                if i < len(orig):
+                    frame[2] = i + 1
+                    value = orig[i]
+                else:
+                    stack.pop()
+                    result = orig if acc is None else tuple(acc)
+                    self._deliver(stack[-1], orig, result)
+                    continue
+            
+            # Process the child, or push a frame for it.
+            if isinstance(value, AST):
+                try:
+                    entry = dispatch[value.__class__]
+                except KeyError:
+                    entry = _get_iter_entry(vcls, value.__class__)
+                handler, leave, fields, _getter, mask = entry
+                if handler is not None:
+                    result = handler(self, value)
+                    if nochange_none and result is None:
+                        result = value
+                    if result is not value or acc is not None:
+                        self._deliver(frame, value, result)
+                    continue
+                if mask is not None and not value._kinds & mask:
+                    if acc is not None:
+                        self._deliver(frame, value, value)
+                    continue
+                stack.append([value, fields, 0, None, leave])
+            elif isinstance(value, tuple):
+                stack.append([value, None, 0, None, None])
+            elif fields is None and acc is not None:
+                # Unchanged non-node item of a sequence being rebuilt.
+                self._deliver(frame, value, value)
+    
+    @staticmethod
+    def _deliver(frame, value, result):
+        """Record in frame the result of visiting its child value (the
+        one just before its current index).
+        """
+        orig, fields, i, acc, _leave = frame
+        if fields is not None:
+            if result is not value:
+                if acc is None:
+                    acc = frame[3] = {}
+                acc[fields[i - 1]] = result
+            return
+        
+        if acc is None:
+            if result is value:
+                return
+            # First change. As in NodeTransformer.seq_visit(), earlier
+            # (unchanged) items that are sequences are spliced.
+            acc = frame[3] = []
+            for item in orig[:i - 1]:
+                if isinstance(item, (tuple, list)):
+                    acc.extend(item)
+                else:
+                    acc.append(item)
+        if isinstance(result, (tuple, list)):
+            acc.extend(result)
+        else:
+            acc.append(result)
+
+
+class MemoNodeTransformer(NodeTransformer):
+    
+    """NodeTransformer that transforms each distinct subtree once per
+    run. Trees made by substitution (see Templater and MacroProcessor)
+    or from interned node classes often contain the same node or tuple
+    object in several places; the result of visiting it the first time
+    is reused for the others, so the output shares the transformed
+    subtree wherever the input shared the original.
+    
+    Subtrees are identified by identity, not equality. Handlers must
+    not depend on anything but the node they are given, e.g. on state
+    of the visitor that changes as the traversal proceeds, since they
+    are not called again for later occurrences.
+    """
+    
+    _memo_size = 10000
+    """Maximum number of subtrees whose results are remembered during
+    a run, or None for no limit. Beyond it, the least recently used
+    result is forgotten, and that subtree is transformed again if it
+    is met again.
+    """
+    
+    def process(self, tree):
+        self._memo = OrderedDict()
+        try:
+            return super().process(tree)
+        finally:
+            self._memo.clear()
+    
+    def visit(self, tree):
+        if not isinstance(tree, (AST, tuple)):
+            return tree
+        
+        # Keyed by id(), with the subtree kept alive in the entry so
+        # that its id is not reused.
+        memo = self._memo
+        key = id(tree)
+        try:
+            entry = memo[key]
+        except KeyError:
+            pass
+        else:
+            memo.move_to_end(key)
+            return entry[1]
+        
+        result = super().visit(tree)
+        memo[key] = (tree, result)
+        size = self._memo_size
+        if size is not None and len(memo) > size:
+            memo.popitem(last=False)
+        return result
+
+
+def _fusable(visitor):
+    """Return whether visitor may take part in a fused traversal, i.e.
+    whether it uses the traversal of NodeVisitor unchanged.
+    """
+    cls = type(visitor)
+    return ('visit' not in visitor.__dict__ and
+            not visitor._visit_primitives and
+            cls.visit is NodeVisitor.visit and
+            cls.node_visit is NodeVisitor.node_visit and
+            cls.seq_visit is NodeVisitor.seq_visit and
+            cls.generic_visit is NodeVisitor.generic_visit)
+
+def _fused_walk(tree, members, root_results):
+    """Walk tree once on behalf of members, a list of (index, visitor)
+    pairs, calling each visitor's handlers as its own traversal would.
+    A visitor whose handler is called on a node takes no further part
+    in the walk of that node's subtree, nor does one whose pruner (see
+    _make_pruner()) would skip it, or the fields the pruner leaves out.
+    Record in root_results, by index, each visitor's result for the
+    root.
+    """
+    for i, _visitor in members:
+        root_results[i] = None
+    if not isinstance(tree, (AST, tuple)):
+        for i, _visitor in members:
+            root_results[i] = tree
+        return
+    
+    # Pairs of a value still to be visited, and the members that have
+    # yet to handle it, last one first.
+    stack = [(tree, tuple(members))]
+    pop = stack.pop
+    push = stack.append
+    # Map from node class to its child fields, in reverse order.
+    rev_fields = {}
+    
+    while stack:
+        value, active = pop()
+        if isinstance(value, AST):
+            node_cls = value.__class__
+            rest = active
+            # Map from members to the only fields they traverse.
+            restricted = None
+            for member in active:
+                visitor = member[1]
+                try:
+                    handler = visitor._dispatch[node_cls]
+                except KeyError:
+                    handler = _get_handler(type(visitor), node_cls)
+                if handler is None:
+                    continue
+                prune = getattr(handler, '_prune', None)
+                if prune is not None:
+                    mask, fields = prune
+                    if fields != () and (mask is None or
+                                         value._kinds & mask):
+                        # The pruner would traverse the subtree.
+                        if fields is not None:
+                            if restricted is None:
+                                restricted = {}
+                            restricted[member] = fields
+                        continue
+                if rest is active:
+                    rest = list(active)
+                rest.remove(member)
+                if prune is None:
+                    result = handler(visitor, value)
+                    if value is tree:
+                        root_results[member[0]] = result
+            if not rest:
+                continue
+            if rest is not active:
+                rest = tuple(rest)
+            try:
+                fields = rev_fields[node_cls]
+            except KeyError:
+                fields = node_cls._child_fields
+                if fields is None:
+                    fields = node_cls._fields
+                fields = rev_fields[node_cls] = tuple(reversed(fields))
+            for field in fields:
+                child = getattr(value, field)
+                if not isinstance(child, (AST, tuple)):
+                    continue
+                if restricted is None:
+                    push((child, rest))
+                    continue
+                sub = tuple(member for member in rest
+                            if field in restricted.get(member, (field,)))
+                if sub:
+                    push((child, sub))
+        else:
+            for item in reversed(value):
+                if isinstance(item, (AST, tuple)):
+                    push((item, active))
+
+def run_fused(tree, visitors):
+    """Run several visitors over tree in one traversal, and return the
+    list of their results, as if by [v.process(tree) for v in
+    visitors]. Each entry of visitors is either a NodeVisitor instance
+    or a NodeVisitor subclass to instantiate with no arguments.
+    
+    Each node is dispatched to the handler of every visitor in turn.
+    A handler controls the traversal of its node's subtree for its own
+    visitor, as usual: if it calls generic_visit(), that subtree is
+    walked again for that visitor alone, and if it does not, the
+    visitor does not see the subtree. Visitors that only have handlers
+    for leaves, or for nodes whose subtrees they need not see, thus
+    share a single walk of the tree.
+    
+    Each visitor's process() is run as usual, and may do setup and
+    teardown around its call to visit(); the shared walk is done once
+    all of them have reached that call. Visitors that override visit(),
+    node_visit(), seq_visit(), or generic_visit() (including transformers
+    and the explicit-stack and Adv visitors), that set _visit_primitives,
+    or whose process() does not call visit() on tree, are run in a
+    separate pass instead. The visitors should not depend on the order
+    in which their handlers are interleaved.
+    """
+    visitors = [v() if isinstance(v, type) else v for v in visitors]
+    if sum(1 for v in visitors if _fusable(v)) < 2:
+        # Nothing to share.
+        return [v.process(tree) for v in visitors]
+    results = [None] * len(visitors)
+    members = []
+    root_results = {}
+    
+    # Each fusable visitor's process() is run up to its call to
+    # visit(tree), which runs the next visitor's, and so on; the
+    # innermost call does the walk. Results are then returned through
+    # the pending process() calls, in reverse order.
+    def run_from(start):
+        for i in range(start, len(visitors)):
+            visitor = visitors[i]
+            if not _fusable(visitor):
+                results[i] = visitor.process(tree)
+                continue
+            
+            reached = False
+            def intercept(t, i=i, visitor=visitor):
+                nonlocal reached
+                del visitor.visit
+                if t is not tree:
+                    return visitor.visit(t)
+                reached = True
+                members.append((i, visitor))
+                run_from(i + 1)
+                return root_results[i]
+            
+            visitor.visit = intercept
+            try:
+                results[i] = visitor.process(tree)
+            finally:
+                visitor.__dict__.pop('visit', None)
+            if reached:
+                return
+        _fused_walk(tree, members, root_results)
+    
+    run_from(0)
+    return results
+
+
+
+def _walk_plan(node_cls, kinds, primitives, forward):
+    """Return how iter_nodes() walks nodes of class node_cls, as a
+    triple of whether they are of one of the given kinds (or kinds is
+    None), a bitset that their summary must intersect for their
+    subtree to be walked (or None), and a function returning the
+    values to walk next: the values of the fields to walk, in reverse
+    order, or if forward, in order and with sequences flattened.
+    Pruning follows _prune_plan().
+    """
+    fields = node_cls._child_fields
+    if fields is None or primitives:
+        fields = node_cls._fields
+    match = kinds is None or node_cls.__name__ in kinds
+    mask = None
+    names = node_cls._kind_names
+    if kinds is not None and names is not None and not primitives:
+        bits = 1 << len(names)
+        for i, name in enumerate(names):
+            if name in kinds:
+                bits |= 1 << i
+        reach = node_cls._child_reach
+        if reach is not None and all(kind in names for kind in kinds):
+            fields = tuple(field for field, field_bits
+                           in zip(node_cls._child_fields, reach)
+                           if field_bits & bits)
+        if node_cls._summarized:
+            mask = bits
+    if forward:
+        getter = _field_getter(fields)
+        return match, mask, lambda node: _flatten(getter(node))
+    return match, mask, _field_getter(tuple(reversed(fields)))
+
+def iter_nodes(tree, kinds=None, order='pre', primitives=False):
+    """Return an iterator over the nodes of tree, like ast.walk().
+    If kinds is given, it is a collection of node class names, and
+    only nodes whose class has one of those names are produced; parts
+    of the tree that cannot contain such nodes are skipped, as by the
+    visitors. order is 'pre' or 'post' for a depth-first walk that
+    produces nodes before or after their subtrees, or 'bfs' for a
+    breadth-first walk. If primitives is True, fields with primitive
+    types are walked too (see NodeVisitor._visit_primitives).
+    
+    The walk proceeds as the iterator is consumed, so abandoning the
+    iterator ends it early.
+    """
+    if order not in ['pre', 'post', 'bfs']:
+        raise ValueError('Unknown order {!r}'.format(order))
+    if isinstance(kinds, str):
+        kinds = (kinds,)
+    if kinds is not None and type(kinds) is not frozenset:
+        kinds = frozenset(kinds)
+    return _iter_nodes(tree, kinds, order, primitives)
+
+# Map from the kinds, primitives, and forward arguments of _walk_plan()
+# to a weak map from node classes to their plans. Only the most
+# recently used _WALK_PLANS_MAX argument combinations are kept.
+_walk_plans = OrderedDict()
+_WALK_PLANS_MAX = 64
+
+def _get_walk_plans(key):
+    """Return the map of plans of _walk_plans for key, creating it if
+    needed and marking it as the most recently used.
+    """
+    plans = _walk_plans.get(key)
+    if plans is None:
+        plans = _walk_plans[key] = WeakKeyDictionary()
+        while len(_walk_plans) > _WALK_PLANS_MAX:
+            _walk_plans.popitem(last=False)
+    else:
+        try:
+            _walk_plans.move_to_end(key)
+        except KeyError:
+            # Evicted by another thread meanwhile.
+            pass
+    return plans
+
+def _iter_nodes(tree, kinds, order, primitives):
+    post = order == 'post'
+    forward = order == 'bfs'
+    shared_plans = _get_walk_plans((kinds, primitives, forward))
+    # Plans used by this walk, looked up faster than in the weak map.
+    plans = {}
+    # Values still to be walked. Depth-first walks take the last one
+    # and add children in reverse; breadth-first walks take the first,
+    # and add the items of sequences in place of the sequences, so
+    # that they are not a level of their own.
+    if forward:
+        pending = deque(_flatten((tree,)))
+        take = pending.popleft
+    else:
+        pending = [tree]
+        take = pending.pop
+    push = pending.append
+    extend = pending.extend
+    
+    while pending:
+        value = take()
+        if isinstance(value, AST):
+            try:
+                match, mask, getter = plans[value.__class__]
+            except KeyError:
+                node_cls = value.__class__
+                plan = shared_plans.get(node_cls)
+                if plan is None:
+                    plan = _walk_plan(node_cls, kinds, primitives, forward)
+                    shared_plans[node_cls] = plan
+                plans[node_cls] = plan
+                match, mask, getter = plan
+            if mask is not None and not value._kinds & mask:
+                continue
+            if match:
+                if post:
+                    push(_Leave(None, value))
+                else:
+                    yield value
+            extend(getter(value))
+        elif isinstance(value, tuple):
+            extend(reversed(value))
+        elif type(value) is _Leave:
+            yield value.node
+
+def _flatten(seq):
+    """Generate the items of a sequence, with the items of nested
+    sequences in place of those sequences.
+    """
+    stack = [iter(seq)]
+    while stack:
+        for item in stack[-1]:
+            if isinstance(item, tuple):
+                stack.append(iter(item))
+                break
+            yield item
+        else:
+            stack.pop()
+
+def find_first(tree, pred=None, kinds=None, order='pre',
+               primitives=False):
+    """Return the first node of tree, in the given order, that is of
+    one of the given kinds and satisfies pred (if given), or None if
+    there is none. The walk stops at that node. See iter_nodes().
+    """
+    for node in iter_nodes(tree, kinds, order, primitives):
+        if pred is None or pred(node):
+            return node
+    return None
+
+def any_node(tree, pred=None, kinds=None, primitives=False):
+    """Return whether tree has a node of one of the given kinds that
+    satisfies pred (if given). See find_first().
+    """
+    return find_first(tree, pred, kinds, 'pre', primitives) is not None
+
+
+class RunManyError(Exception):
+    
+    """Raised by NodeVisitor.run_many() when processing a tree fails.
+    The exception raised by the visitor is the __cause__, if it could
+    be sent back from the worker process.
+    """
+    
+    def __init__(self, index, detail):
+        super().__init__(index, detail)
+        self.index = index
+        """Position of the tree in the input."""
+        self.detail = detail
+        """Formatted traceback of the failure."""
+    
+    def __str__(self):
+        return 'Processing tree {0.index} failed:\n{0.detail}'.format(self)
+
+# Forms of the values in run_many() work items and results.
+_BATCH_OBJECT = 0       # the value itself, pickled if need be
+_BATCH_BINARY = 1       # the value's iast.binary encoding
+_BATCH_SAME = 2         # for a result, the tree it was computed from
+_BATCH_ERROR = 3        # for a result, the exception and its traceback
+
+def _batch_pack(codec, index, value):
+    """Return a work item or result of run_many() for value: a triple
+    of index, form, and the value in that form. Values that codec
+    cannot encode are left as they are.
+    """
+    if codec is not None:
+        try:
+            return index, _BATCH_BINARY, codec.dumps(value)
+        except TypeError:
+            pass
+    return index, _BATCH_OBJECT, value
+
+def _batch_results(tasks, codec, ordered, inputs):
+    """Decode the results of run_many() tasks, raising RunManyError
+    for the first failure. inputs maps the index of each pending task
+    to its tree.
+    """
+    for index, form, value in tasks:
+        tree = inputs.pop(index)
+        if form == _BATCH_ERROR:
+            exc, detail = value
+            raise RunManyError(index, detail) from exc
+        elif form == _BATCH_BINARY:
+            value = codec.loads(value)
+        elif form == _BATCH_SAME:
+            value = tree
+        yield value if ordered else (index, value)
+
+class _BatchWorker:
+    
+    """Runs a visitor on the work items of run_many(), returning the
+    results packed by _batch_pack(). If remote, results identical to
+    their tree are sent back as _BATCH_SAME, and exceptions are only
+    sent back if they can be pickled.
+    """
+    
+    def __init__(self, vcls, args, kargs, classes, remote):
+        self.vcls = vcls
+        self.args = args
+        self.kargs = kargs
+        self.remote = remote
+        self.codec = None
+        if classes is not None:
+            self.codec = Codec({cls.__name__: cls for cls in classes})
+    
+    def __call__(self, item):
+        index, form, tree = item
+        try:
+            if form == _BATCH_BINARY:
+                tree = self.codec.loads(tree)
+            result = self.vcls.run(tree, *self.args, **self.kargs)
+        except Exception as exc:
+            detail = traceback.format_exc()
+            if self.remote:
+                try:
+                    pickle.dumps(exc)
+                except Exception:
+                    exc = None
+            return index, _BATCH_ERROR, (exc, detail)
+        if self.remote and result is tree:
+            return index, _BATCH_SAME, None
+        return _batch_pack(self.codec, index, result)
+
+# The _BatchWorker of a pool process of run_many().
+_batch_worker = None
+
+def _batch_init(vcls, args, kargs, classes):
+    global _batch_worker
+    _batch_worker = _BatchWorker(vcls, args, kargs, classes, True)
+
+def _batch_task(item):
+    return _batch_worker(item)
+
+# Traversal methods of the visitor classes above, for _prunable().
+_standard_methods = {
+    getattr(cls, name)
+    for cls in [NodeVisitor, AdvNodeVisitor, NodeTransformer,
+                AdvNodeTransformer, IterNodeVisitor, IterNodeTransformer,
+                MemoNodeTransformer]
+    for name in ['visit', 'node_visit', 'seq_visit', 'generic_visit']}
+
+
 class ChangeCounter(NodeTransformer):
     
     """Transformer mixin that instruments the transformation to
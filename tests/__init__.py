@@ -1,4 +1,16 @@
 import unittest
+import os
+import atexit
+import shutil
+import tempfile
+
+# Keep the node class modules generated while testing (see
+# iast.nodegen.load_nodes()) out of the user's cache directory. This
+# runs before the test modules import iast.python, and is inherited
+# by the subprocesses they start.
+_cache_dir = tempfile.mkdtemp(prefix='iast-test-cache-')
+atexit.register(shutil.rmtree, _cache_dir, ignore_errors=True)
+os.environ['IAST_CACHE_DIR'] = _cache_dir
 
 def additional_tests():
     return unittest.defaultTestLoader.discover(
@@ -4,6 +4,9 @@
 import unittest
 import ast
 import pickle
+import sys
+import subprocess
+from os.path import dirname
 
 from iast.node import AST
 from iast.python.default import *
@@ -41,6 +44,20 @@ class NodeCase(unittest.TestCase):
         s = pickle.dumps(node1)
         node2 = pickle.loads(s)
         self.assertEqual(node1, node2)
+    
+    def test_lazy(self):
+        # Importing a version's module builds only that node set.
+        code = ('import iast.python.python34, iast.python.pynode as p; '
+                'print(sorted(p._nodes))')
+        out = subprocess.check_output(
+                [sys.executable, '-c', code],
+                cwd=dirname(dirname(dirname(__file__))),
+                universal_newlines=True)
+        self.assertEqual(out.strip(), "['py34_nodes']")
+        
+        from iast.python import pynode, python33
+        self.assertIs(python33.py_nodes, pynode.py33_nodes)
+        self.assertIs(python33.Name, pynode.py33_nodes['Name'])
 
 
 if __name__ == '__main__':
@@ -0,0 +1,113 @@
+"""Unit tests for the asdl package."""
+
+
+import unittest
+import sys
+import subprocess
+from os.path import dirname
+
+import iast.asdl
+from iast.asdl import asdl
+
+
+class ASDLCase(unittest.TestCase):
+    
+    def test_bundled_lazy(self):
+        # Importing iast doesn't parse the bundled grammars.
+        code = ('import iast, iast.asdl; '
+                'print(len(iast.asdl._bundled))')
+        out = subprocess.check_output([sys.executable, '-c', code],
+                                      cwd=dirname(dirname(__file__)),
+                                      universal_newlines=True)
+        self.assertEqual(out.strip(), '0')
+        
+        # They are parsed once, on first access.
+        tree = iast.asdl.python34_asdl
+        self.assertIsInstance(tree, asdl.Module)
+        self.assertIs(iast.asdl.python34_asdl, tree)
+        from iast.asdl import python33_asdl
+        self.assertIsNot(python33_asdl, tree)
+    
+    def test_tokenize(self):
+        K = asdl.TokenKind
+        source = ('module M -- comment { = }\r\n'
+                  '{\n'
+                  '\tfoo = Bar(int* x)\r'
+                  '}')
+        tokens = [tuple(tok) for tok in asdl.tokenize_asdl(source)]
+        exp_tokens = [
+            (K.TypeId, 'module', 1), (K.ConstructorId, 'M', 1),
+            (K.LBrace, '{', 2),
+            (K.TypeId, 'foo', 3), (K.Equals, '=', 3),
+            (K.ConstructorId, 'Bar', 3), (K.LParen, '(', 3),
+            (K.TypeId, 'int', 3), (K.Asterisk, '*', 3),
+            (K.TypeId, 'x', 3), (K.RParen, ')', 3),
+            (K.RBrace, '}', 4),
+        ]
+        self.assertEqual(tokens, exp_tokens)
+        
+        with self.assertRaises(asdl.ASDLSyntaxError) as cm:
+            list(asdl.tokenize_asdl('module M\n{\n  a = B - C\n}'))
+        self.assertEqual(str(cm.exception),
+                         'Syntax error on line 3: Invalid operator -')
+        with self.assertRaises(asdl.ASDLSyntaxError) as cm:
+            list(asdl.tokenize_asdl('\n\n_x'))
+        self.assertEqual(str(cm.exception),
+                         'Syntax error on line 3: Invalid operator _x')
+    
+    def test_parse(self):
+        tree = asdl.ASDLParser().parse('''
+            -- Leading comment
+            module Toy
+            {
+                stmt = Assign(identifier target, expr value)
+                     | Pass
+                     attributes (int lineno)
+                expr = Num(int n) | Tuple(expr* elts, expr? ctx)
+                pair = (expr, expr second)
+            }
+            ''')
+        self.assertEqual(tree.name, 'Toy')
+        self.assertEqual(
+            repr(tree.dfns),
+            '[Type(stmt, Sum([Constructor(Assign, [Field(identifier, '
+            'target), Field(expr, value)]), Constructor(Pass, [])], '
+            '[Field(int, lineno)])), '
+            'Type(expr, Sum([Constructor(Num, [Field(int, n)]), '
+            'Constructor(Tuple, [Field(expr, elts, seq=True), '
+            'Field(expr, ctx, opt=True)])])), '
+            'Type(pair, Product([Field(expr), Field(expr, second)]))]')
+        self.assertTrue(asdl.check(tree))
+    
+    def test_parse_errors(self):
+        def check(source, msg):
+            with self.assertRaises(asdl.ASDLSyntaxError) as cm:
+                asdl.ASDLParser().parse(source)
+            self.assertEqual(str(cm.exception), msg)
+        
+        check('modul M {}',
+              'Syntax error on line 1: Expected "module" (found modul)')
+        check('module M\n{\n  foo = bar\n}',
+              'Syntax error on line 3: Unmatched ConstructorId '
+              '(found TypeId)')
+        check('module M\n{\n  foo = (int x\n}',
+              'Syntax error on line 4: Unmatched RParen (found RBrace)')
+        # Premature end of input is reported on the last line.
+        check('',
+              'Syntax error on line 1: Expected "module" (found <EOF>)')
+        check('module',
+              'Syntax error on line 1: Unmatched ConstructorId or TypeId '
+              '(found EOF)')
+        check('module M\n{\n  foo = Bar\n',
+              'Syntax error on line 3: Unmatched RBrace (found EOF)')
+        # Invalid characters are only reported if the parser gets to
+        # them.
+        check('module X version "1" {',
+              'Syntax error on line 1: Unmatched LBrace (found TypeId)')
+        check('module X {\n  foo = Bar(int "x")\n}',
+              'Syntax error on line 2: Invalid operator "')
+        check('"', 'Syntax error on line 1: Invalid operator "')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,115 @@
+"""Unit tests for binary.py."""
+
+
+import unittest
+import io
+
+from iast.util import trim
+from iast.asdl import parse_asdl
+from iast.node import nodes_from_asdl
+from iast.binary import *
+import iast.binary as binary
+
+
+class BinaryCase(unittest.TestCase):
+    
+    asdl_spec = trim('''
+        module Dummy
+        {
+            expr = Sum(expr* operands)
+                 | Num(object val)
+                 | Name(identifier id)
+                 | Unit()
+        }
+        ''')
+    
+    def setUp(self):
+        self.lang = nodes_from_asdl(parse_asdl(self.asdl_spec), typed=True)
+    
+    def test_roundtrip(self):
+        Sum, Num, Name, Unit = (self.lang[n] for n in
+                                ['Sum', 'Num', 'Name', 'Unit'])
+        vals = [0, -1, 2 ** 70, -2 ** 70, 1.5, 2j, b'ab', None, True,
+                False, 'x', 'x', '\ud800']
+        tree = Sum([Num(v) for v in vals] + [Name('x'), Unit(), Sum([])])
+        data = dumps(tree, self.lang)
+        self.assertEqual(loads(data, self.lang), tree)
+        
+        # Shared subtrees are written once and stay shared.
+        shared = Sum([Name('y'), Name('z')])
+        tree = Sum([shared, shared])
+        tree2 = loads(dumps(tree, self.lang), self.lang)
+        self.assertEqual(tree2, tree)
+        self.assertIs(tree2.operands[0], tree2.operands[1])
+        self.assertLess(len(dumps(tree, self.lang)),
+                        len(dumps(Sum([shared, Sum([Name('y'),
+                                                    Name('z')])]),
+                                  self.lang)))
+    
+    def test_stream(self):
+        codec = Codec(self.lang)
+        trees = [self.lang['Name']('a'), (), self.lang['Unit']()]
+        file = io.BytesIO()
+        for tree in trees:
+            codec.dump_to(tree, file)
+        file.seek(0)
+        for tree in trees:
+            self.assertEqual(codec.load_from(file), tree)
+        with self.assertRaises(EOFError):
+            codec.load_from(file)
+        
+        # Values of the node set other than classes are ignored, so a
+        # module namespace may be given.
+        nodes = dict(self.lang, __builtins__={}, version=1)
+        self.assertEqual(Codec(nodes).classes, codec.classes)
+    
+    def test_errors(self):
+        data = dumps(self.lang['Name']('a'), self.lang)
+        with self.assertRaisesRegex(ValueError, 'length'):
+            loads(data[:-1], self.lang)
+        
+        # Grammars with different fields don't match.
+        other = nodes_from_asdl(parse_asdl(
+                    self.asdl_spec.replace('id)', 'name)')))
+        with self.assertRaisesRegex(ValueError, 'different node set'):
+            loads(data, other)
+        
+        # Nodes must belong to the node set.
+        with self.assertRaises(TypeError):
+            dumps(other['Name']('a'), self.lang)
+    
+    def test_corrupt(self):
+        codec = Codec(self.lang)
+        def decode(payload):
+            return codec.decode(bytes(payload), 0, len(payload))
+        self.assertEqual(decode([binary.TAG_INT, 0x80, 0x01]), 64)
+        
+        # Values that run past the end of the payload.
+        for payload in [[binary.TAG_INT, 0x80],
+                        [binary.TAG_STR, 5, ord('a')],
+                        [binary.TAG_FLOAT, 0, 0]]:
+            with self.assertRaisesRegex(ValueError, '^Truncated record'):
+                decode(payload)
+        # Truncation within a record's length varint.
+        data = dumps(self.lang['Unit'](), self.lang)
+        with self.assertRaisesRegex(ValueError, '^Truncated record'):
+            loads(data[:binary.HEADER.size] + b'\x80', self.lang)
+        
+        # References to unknown kinds, strings, and nodes. A node
+        # cannot refer to itself.
+        buf = bytearray()
+        binary.write_varint(buf, binary.NODE_BASE + 100)
+        sum_tag = binary.NODE_BASE + self.lang['Sum']._kind_id
+        for payload, msg in [
+                (buf, 'node kind 100'),
+                ([binary.TAG_STRREF, 0], 'string 0'),
+                ([binary.TAG_NODEREF, 0], 'node 0'),
+                ([sum_tag, binary.TAG_TUPLE, 1, binary.TAG_NODEREF, 0],
+                 'node 0')]:
+            with self.assertRaisesRegex(ValueError,
+                                        '^Bad reference to ' + msg):
+                decode(payload)
+
+
+if __name__ == '__main__':
+    unittest.main()
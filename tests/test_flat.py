@@ -0,0 +1,98 @@
+"""Unit tests for flat.py."""
+
+
+import unittest
+
+from iast.util import trim
+from iast.asdl import parse_asdl
+from iast.node import nodes_from_asdl, dump
+from iast.flat import *
+
+
+class FlatCase(unittest.TestCase):
+    
+    def setUp(self):
+        asdl = parse_asdl(trim('''
+            module Dummy
+            {
+                expr = Sum(expr* operands)
+                     | Num(int val)
+                     | Name(identifier id)
+                     | Unit()
+            }
+            '''))
+        self.lang = lang = nodes_from_asdl(asdl, typed=True)
+        Sum, Num, Name, Unit = (lang[n] for n in
+                                ['Sum', 'Num', 'Name', 'Unit'])
+        self.tree = Sum([Num(1), Sum([Name('x'), Unit(), Num(1)]),
+                         Sum([]), Name('y')])
+    
+    def test_roundtrip(self):
+        flat = to_flat(self.tree)
+        self.assertEqual(len(flat), 8)
+        # Equal primitives are stored once.
+        self.assertEqual(flat.values, [1, 'x', 'y'])
+        self.assertEqual(list(flat.ends), [8, 2, 6, 4, 5, 6, 7, 8])
+        self.assertEqual(from_flat(flat), self.tree)
+        
+        # Non-node roots.
+        for value in [5, (self.tree, 'a', ()), ()]:
+            self.assertEqual(from_flat(to_flat(value)), value)
+        
+        # Equal primitives of different types or signs are kept apart.
+        value = (0.0, -0.0, 1, True, 1.0)
+        result = from_flat(to_flat(value))
+        self.assertEqual([repr(v) for v in result],
+                         ['0.0', '-0.0', '1', 'True', '1.0'])
+    
+    def test_dump_counts(self):
+        flat = to_flat(self.tree)
+        self.assertEqual(flat.dump(), dump(self.tree))
+        self.assertEqual(flat.kind_counts(),
+                         {'Sum': 3, 'Num': 2, 'Name': 2, 'Unit': 1})
+    
+    def test_visitor(self):
+        Unit = self.lang['Unit']
+        class Names(FlatVisitor):
+            def process(self, flat):
+                self.names = []
+                super().process(flat)
+                return self.names
+            def visit_Name(self, node):
+                self.names.append(node.id)
+        class Pruned(Names):
+            def visit_Sum(self, node):
+                # Skip sums with a unit.
+                if not any(op._kind is Unit for op in node.operands):
+                    self.generic_visit(node)
+        
+        flat = to_flat(self.tree)
+        self.assertEqual(Names.run(flat), ['x', 'y'])
+        self.assertEqual(Pruned.run(flat), ['y'])
+        
+        node = FlatNode(flat, 2)
+        self.assertEqual(node._build(), self.tree.operands[1])
+    
+    def test_view_field_names(self):
+        # Fields named like the view's attributes are not hidden.
+        lang = nodes_from_asdl(parse_asdl(trim('''
+            module Dummy
+            {
+                expr = Tok(string kind, int index, expr* build)
+                     | Unit()
+            }
+            ''')))
+        Tok, Unit = lang['Tok'], lang['Unit']
+        tree = Tok('k', 5, (Unit(),))
+        flat = to_flat(tree)
+        node = flat.decode(flat.root, view=True)
+        self.assertEqual(node.kind, 'k')
+        self.assertEqual(node.index, 5)
+        self.assertEqual(len(node.build), 1)
+        self.assertIs(node.build[0]._kind, Unit)
+        self.assertIs(node._kind, Tok)
+        self.assertEqual(node._build(), tree)
+
+
+if __name__ == '__main__':
+    unittest.main()
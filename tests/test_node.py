@@ -2,6 +2,12 @@
 
 
 import unittest
+import gc
+import io
+import sys
+import pickle
+import types
+import threading
 from collections import OrderedDict
 from simplestruct import Field
 
@@ -47,6 +53,26 @@ class NodeCase(unittest.TestCase):
         # Reconstruct the tree from dump.
         tree2 = eval(s, locals())
         self.assertEqual(tree2, tree)
+        
+        # Options.
+        s = dump(tree, oneline=True)
+        self.assertEqual(s, repr(tree))
+        s = dump(tree, max_depth=3, max_width=2)
+        exp_s = trim('''
+            Sum(operands = (Add(left = 1,
+                                right = 2),
+                            Sum(operands = (...)),
+                            ...))
+            ''')
+        self.assertEqual(s, exp_s)
+        file = io.StringIO()
+        self.assertIsNone(dump(tree, file=file))
+        self.assertEqual(file.getvalue(), dump(tree))
+        
+        # Deep trees don't hit the recursion limit.
+        for _ in range(sys.getrecursionlimit()):
+            tree = Sum((tree,))
+        self.assertTrue(dump(tree, oneline=True).endswith('),)),)),))'))
     
     asdl_spec = trim('''
         module Dummy
@@ -80,12 +106,30 @@ class NodeCase(unittest.TestCase):
         self.assertEqual(lang['Sum'].__bases__, (lang['expr'],))
         self.assertEqual(lang['num']._fields, ('real', 'imag'))
         self.assertEqual(lang['num'].__bases__, (lang['AST'],))
+        
+        # Fields with node types are recorded, and not inherited.
+        self.assertEqual(lang['Sum']._child_fields, ('operands',))
+        self.assertEqual(lang['Num']._child_fields, ('val',))
+        self.assertEqual(lang['num']._child_fields, ())
+        self.assertEqual(lang['expr']._child_fields, ())
+        class SubNum(lang['Num']):
+            _fields = ('val', 'extra')
+        self.assertIsNone(SubNum._child_fields)
+        self.assertIsNone(lang['Sum']._child_reach)
     
     def test_from_asdl_typed(self):
         asdl = parse_asdl(self.asdl_spec)
         lang = nodes_from_asdl(asdl, typed=True,
                                primitive_types={'int': int})
         
+        # Node types that may occur under each child field.
+        bits = lambda *names: sum(1 << lang[name]._kind_id
+                                  for name in names)
+        self.assertEqual(lang['Sum']._child_reach,
+                         (bits('expr', 'Sum', 'Num', 'Unit', 'num'),))
+        self.assertEqual(lang['Num']._child_reach, (bits('num'),))
+        self.assertEqual(lang['Unit']._child_reach, ())
+        
         Numcls = lang['Num']
         numcls = lang['num']
         
@@ -104,6 +148,286 @@ class NodeCase(unittest.TestCase):
         Unitcls = lang['Unit']
         with self.assertRaises(TypeError):
             Sumcls(Unitcls())
+    
+    def test_from_asdl_compact(self):
+        asdl = parse_asdl(self.asdl_spec)
+        lang = nodes_from_asdl(asdl, typed=True, compact=True,
+                               primitive_types={'int': int})
+        Sumcls = lang['Sum']
+        Numcls = lang['Num']
+        numcls = lang['num']
+        
+        self.assertEqual(Sumcls.__slots__, ('operands',))
+        self.assertEqual(numcls._fields, ('real', 'imag'))
+        
+        # Fields live in slots, not the instance dict.
+        node = Sumcls([Numcls(numcls(1, 2))])
+        self.assertEqual(node.operands, (Numcls(numcls(1, 2)),))
+        self.assertEqual(vars(node), {})
+        
+        # Struct behavior is preserved.
+        self.assertEqual(node, Sumcls([Numcls(numcls(1, 2))]))
+        self.assertEqual(hash(node), hash(Sumcls([Numcls(numcls(1, 2))])))
+        self.assertEqual(node._replace(operands=[]), Sumcls(()))
+        with self.assertRaises(AttributeError):
+            node.operands = ()
+        
+        # Type checking still applies.
+        with self.assertRaises(TypeError):
+            numcls('a', 2)
+        with self.assertRaises(TypeError):
+            Sumcls(lang['Unit']())
+    
+    def test_from_asdl_codegen(self):
+        asdl = parse_asdl(self.asdl_spec)
+        for codegen in [False, True]:
+            lang = nodes_from_asdl(asdl, typed=True, codegen=codegen,
+                                   primitive_types={'int': int})
+            Sumcls = lang['Sum']
+            Numcls = lang['Num']
+            numcls = lang['num']
+            self.assertEqual(Sumcls._make is not None, codegen)
+            
+            node = Sumcls([Numcls(numcls(1, imag=None))])
+            self.assertEqual(node.operands, (Numcls(numcls(1, None)),))
+            self.assertEqual(node, Sumcls((Numcls(numcls(1, None)),)))
+            self.assertNotEqual(node, Sumcls(()))
+            self.assertEqual(node._replace(operands=[]), Sumcls(()))
+            num = numcls(1, 2)
+            self.assertEqual(num._replace(imag=3), numcls(1, 3))
+            with self.assertRaises(TypeError):
+                num._replace(foo=3)
+            # Bad arguments are reported as by Struct.
+            with self.assertRaisesRegex(
+                    TypeError, "^Error constructing num: missing .*'imag'"):
+                numcls(1)
+            with self.assertRaisesRegex(
+                    TypeError, '^Error constructing num: too many'):
+                numcls(1, 2, 3)
+            with self.assertRaisesRegex(
+                    TypeError, "^Error constructing num \\(field 'imag'\\)"):
+                numcls(1, 'b')
+            if codegen:
+                self.assertEqual(numcls._make.__qualname__, 'num._make')
+            with self.assertRaises(TypeError):
+                Sumcls([Numcls(num), 1])
+            
+            # Subclasses with their own fields get the generic methods.
+            class Foo(Numcls):
+                _fields = ('val', 'extra')
+            self.assertIsNone(Foo._make)
+            self.assertEqual(Foo(num, 1)._replace(extra=2), Foo(num, 2))
+            self.assertNotEqual(Foo(num, 1), Foo(num, 2))
+        
+        # Field names may shadow builtins used by generated code.
+        asdl = parse_asdl(trim('''
+            module Dummy
+            {
+                stmt = Handler(expr? type, expr* tuple)
+                expr = Unit()
+            }
+            '''))
+        lang = nodes_from_asdl(asdl, typed=True)
+        Handler = lang['Handler']
+        node = Handler(lang['Unit'](), [lang['Unit']()])
+        self.assertEqual(node._replace(type=None).tuple, (lang['Unit'](),))
+    
+    def test_codegen_deferred(self):
+        asdl = parse_asdl(self.asdl_spec)
+        lang = nodes_from_asdl(asdl, typed=True,
+                               primitive_types={'int': int})
+        numcls = lang['num']
+        # Methods are generated on first use, through either
+        # constructor, including one looked up beforehand.
+        make_unchecked = numcls._make_unchecked
+        self.assertEqual(make_unchecked.__qualname__,
+                         'num._make_unchecked')
+        self.assertEqual(make_unchecked(1, 'b').imag, 'b')
+        self.assertIsNot(numcls._make_unchecked, make_unchecked)
+        self.assertEqual(make_unchecked(1, 2), numcls(1, 2))
+        self.assertEqual(numcls(1, 2)._replace(imag=3), numcls(1, 3))
+        with self.assertRaises(TypeError):
+            numcls(1, 'b')
+    
+    def test_unchecked_validate(self):
+        asdl = parse_asdl(self.asdl_spec)
+        for codegen in [False, True]:
+            lang = nodes_from_asdl(asdl, typed=True, codegen=codegen,
+                                   primitive_types={'int': int})
+            Sumcls = lang['Sum']
+            Numcls = lang['Num']
+            numcls = lang['num']
+            
+            good = Sumcls([Numcls(numcls(1, 2))])
+            with unchecked():
+                bad = Sumcls([good, Numcls(numcls(1, 'b'))])
+            # Sequences are still normalized.
+            self.assertEqual(bad.operands[0], good)
+            
+            validate(good)
+            self.assertTrue(good._valid)
+            with self.assertRaisesRegex(TypeError, r"num \(field 'imag'\) "
+                                        r"at Sum.operands\[1\].val"):
+                validate(bad)
+            self.assertFalse(getattr(bad, '_valid', False))
+            
+            # Checking resumes outside the context.
+            with self.assertRaises(TypeError):
+                numcls(1, 'b')
+            
+            # A singular node is not taken as a sequence.
+            for make in [Sumcls, Sumcls._make_unchecked]:
+                if make is None:
+                    continue
+                with unchecked():
+                    with self.assertRaisesRegex(TypeError,
+                                                'Expected sequence'):
+                        make(good)
+            
+            # The setting is per-thread.
+            results = []
+            def build():
+                try:
+                    numcls(1, 'b')
+                except TypeError:
+                    results.append('checked')
+            with unchecked():
+                thread = threading.Thread(target=build)
+                thread.start()
+                thread.join()
+            self.assertEqual(results, ['checked'])
+    
+    def test_pickle(self):
+        # Pickling needs the classes to be found in a module.
+        mod = types.ModuleType('iast_test_pickle_nodes')
+        sys.modules[mod.__name__] = mod
+        self.addCleanup(sys.modules.pop, mod.__name__)
+        asdl = parse_asdl(self.asdl_spec)
+        for codegen in [False, True]:
+            lang = nodes_from_asdl(asdl, module=mod.__name__, typed=True,
+                                   codegen=codegen,
+                                   primitive_types={'int': int})
+            for name, cls in lang.items():
+                setattr(mod, name, cls)
+            Sumcls = lang['Sum']
+            Numcls = lang['Num']
+            numcls = lang['num']
+            
+            tree = Sumcls([Numcls(numcls(1, 2)), Numcls(numcls(3, None))])
+            for protocol in range(2, pickle.HIGHEST_PROTOCOL + 1):
+                self.assertEqual(pickle.loads(pickle.dumps(tree, protocol)),
+                                 tree)
+            
+            # Unpickling doesn't type-check.
+            with unchecked():
+                bad = Sumcls([Numcls(numcls(1, 'b'))])
+            bad2 = pickle.loads(pickle.dumps(bad))
+            self.assertEqual(bad2.operands[0].val.imag, 'b')
+    
+    def test_hash(self):
+        asdl = parse_asdl(self.asdl_spec)
+        lang = nodes_from_asdl(asdl)
+        Sumcls = lang['Sum']
+        Unitcls = lang['Unit']
+        
+        # Equal nodes have equal hashes, which are cached at
+        # construction.
+        node1 = Sumcls((Sumcls((Unitcls(),)), Unitcls()))
+        node2 = Sumcls((Sumcls((Unitcls(),)), Unitcls()))
+        self.assertEqual(node1._hash, hash(node1))
+        self.assertEqual(hash(node1), hash(node2))
+        self.assertEqual(node1, node2)
+        self.assertNotEqual(node1, Sumcls((Unitcls(), Sumcls((Unitcls(),)))))
+        
+        # Unhashable field values make the node unhashable, but do
+        # not prevent comparison.
+        node = Sumcls([Unitcls()])
+        self.assertIsNone(node._hash)
+        with self.assertRaises(TypeError):
+            hash(node)
+        self.assertEqual(node, Sumcls([Unitcls()]))
+        
+        # Mutable nodes are not hashable.
+        class Foo(AST):
+            _fields = ('a',)
+            _immutable = False
+        with self.assertRaises(TypeError):
+            hash(Foo(1))
+    
+    def test_from_asdl_interned(self):
+        asdl = parse_asdl(self.asdl_spec)
+        lang = nodes_from_asdl(asdl, typed=True, interned=True,
+                               primitive_types={'int': int})
+        Sumcls = lang['Sum']
+        Numcls = lang['Num']
+        numcls = lang['num']
+        Unitcls = lang['Unit']
+        
+        node1 = Sumcls([Numcls(numcls(1, 2)), Unitcls()])
+        node2 = Sumcls((Numcls(numcls(1, 2)), Unitcls()))
+        self.assertIs(node1, node2)
+        self.assertIs(node1.operands[1], Unitcls())
+        self.assertIs(node1._replace(operands=node1.operands), node1)
+        self.assertNotEqual(node1, Sumcls(()))
+        
+        # Primitives of different types are not conflated.
+        self.assertIsNot(numcls(1, None), numcls(True, None))
+        
+        # Dead nodes leave the table.
+        table = Sumcls._intern_table
+        size = len(table)
+        del node1, node2
+        gc.collect()
+        self.assertLess(len(table), size)
+        
+        # Values must be hashable.
+        lang = nodes_from_asdl(asdl, interned=True)
+        with self.assertRaises(TypeError):
+            lang['Sum']([])
+        
+        # The sign of zero is kept.
+        numcls = lang['num']
+        pos, neg = numcls(0.0, 0j), numcls(-0.0, -0j)
+        self.assertIsNot(pos, neg)
+        self.assertEqual(str(neg.real), '-0.0')
+        self.assertEqual(str(neg.imag), '(-0-0j)')
+    
+    def test_from_asdl_summarized(self):
+        asdl = parse_asdl(self.asdl_spec)
+        class Meta(AST):
+            _fields = ('name',)
+            _meta = True
+        
+        for options in [{}, {'compact': True}, {'interned': True},
+                        {'codegen': False},
+                        {'typed': True, 'primitive_types': {'int': int}}]:
+            lang = nodes_from_asdl(asdl, summarized=True, **options)
+            Sumcls = lang['Sum']
+            Numcls = lang['Num']
+            numcls = lang['num']
+            Unitcls = lang['Unit']
+            bit = lambda name: 1 << lang[name]._kind_id
+            self.assertEqual(Sumcls._kind_names,
+                             ('expr', 'num', 'Sum', 'Num', 'Unit'))
+            
+            node = Sumcls((Numcls(numcls(1, None)), Unitcls()))
+            self.assertEqual(node._kinds, bit('Sum') | bit('Num') |
+                                          bit('num') | bit('Unit'))
+            self.assertEqual(node.operands[1]._kinds, bit('Unit'))
+            with unchecked():
+                self.assertEqual(Sumcls((Unitcls(),))._kinds,
+                                 bit('Sum') | bit('Unit'))
+            
+            # Children of other classes make the summary unknown.
+            self.assertEqual(Sumcls((Unitcls(), Meta('x')))._kinds, -1)
+            class Sub(Numcls):
+                _fields = ('val',)
+            self.assertEqual(Sub(numcls(1, None))._kinds, -1)
+            self.assertEqual(Sumcls((Sub(numcls(1, None)),))._kinds, -1)
+        
+        lang = nodes_from_asdl(asdl)
+        self.assertFalse(lang['Sum']._summarized)
+        self.assertEqual(lang['Sum'](())._kinds, -1)
 
 
 if __name__ == '__main__':
@@ -0,0 +1,136 @@
+"""Unit tests for nodegen.py."""
+
+
+import unittest
+import os
+import tempfile
+
+from iast.util import trim
+from iast.asdl import parse_asdl
+from iast.nodegen import *
+from iast.nodegen import _loaded
+import iast.node
+import iast.nodegen as nodegen
+
+
+class NodegenCase(unittest.TestCase):
+    
+    asdl_spec = trim('''
+        module Dummy
+        {
+            expr = Sum(expr* operands)
+                 | Num(num val)
+                 | Unit()
+            num = (int real, int? imag)
+        }
+        ''')
+    
+    def check_lang(self, lang):
+        Sumcls = lang['Sum']
+        Numcls = lang['Num']
+        numcls = lang['num']
+        node = Sumcls([Numcls(numcls(1, 2)), lang['Unit']()])
+        self.assertEqual(node.operands[0], Numcls(numcls(1, 2)))
+        self.assertEqual(node._replace(operands=[]), Sumcls(()))
+        self.assertIsNotNone(Sumcls._make)
+        with self.assertRaises(TypeError):
+            numcls(1, 'b')
+    
+    def test_source(self):
+        asdl = parse_asdl(self.asdl_spec)
+        source = nodes_to_source(asdl, typed=True, compact=True)
+        namespace = {}
+        exec(compile(source, '<test>', 'exec'), namespace)
+        lang = namespace['build'](module='foo')
+        self.check_lang(lang)
+        self.assertEqual(lang['Sum'].__module__, 'foo')
+        self.assertEqual(lang['Sum'].__slots__, ('operands',))
+        
+        # Each build makes new classes.
+        self.assertIsNot(namespace['build']()['Sum'], lang['Sum'])
+    
+    def test_load(self):
+        asdl = parse_asdl(self.asdl_spec)
+        with tempfile.TemporaryDirectory() as cache_dir:
+            lang = load_nodes(asdl, typed=True, cache_dir=cache_dir)
+            self.check_lang(lang)
+            files = [fn for fn in os.listdir(cache_dir)
+                     if fn.endswith('.py')]
+            self.assertEqual(len(files), 1)
+            
+            # Same grammar and options reuse the module, others don't.
+            lang = load_nodes(asdl, typed=True, cache_dir=cache_dir)
+            self.check_lang(lang)
+            load_nodes(asdl, cache_dir=cache_dir)
+            files = [fn for fn in os.listdir(cache_dir)
+                     if fn.endswith('.py')]
+            self.assertEqual(len(files), 2)
+            
+            # A warm load generates no method source.
+            load_nodes(asdl, typed=True, compact=True, summarized=True,
+                       cache_dir=cache_dir)
+            old_source = iast.node._methods_source
+            try:
+                iast.node._methods_source = None
+                lang = load_nodes(asdl, typed=True, compact=True,
+                                  summarized=True, cache_dir=cache_dir)
+            finally:
+                iast.node._methods_source = old_source
+            self.check_lang(lang)
+        
+        # A corrupt cached module is regenerated.
+        with tempfile.TemporaryDirectory() as cache_dir:
+            load_nodes(asdl, typed=True, cache_dir=cache_dir)
+            path, = [os.path.join(cache_dir, fn)
+                     for fn in os.listdir(cache_dir) if fn.endswith('.py')]
+            for junk in ['def build(:\n', '']:
+                with open(path, 'w') as file:
+                    file.write(junk)
+                _loaded.clear()
+                lang = load_nodes(asdl, typed=True, cache_dir=cache_dir)
+                self.check_lang(lang)
+                with open(path) as file:
+                    self.assertIn('def build(', file.read())
+        
+        # Primitive types that can't be written out fall back to
+        # building the classes directly.
+        class Int(int):
+            pass
+        with tempfile.TemporaryDirectory() as cache_dir:
+            lang = load_nodes(asdl, typed=True, cache_dir=cache_dir,
+                              primitive_types={'int': Int})
+            lang['num'](Int(1), None)
+            self.assertEqual(os.listdir(cache_dir), [])
+
+    
+    def test_cache_dir(self):
+        old_env = dict(os.environ)
+        try:
+            os.environ.pop('IAST_CACHE_DIR', None)
+            os.environ['XDG_CACHE_HOME'] = os.path.join('x', 'cache')
+            self.assertEqual(nodegen.default_cache_dir(),
+                             os.path.join('x', 'cache', 'iast'))
+            os.environ['IAST_CACHE_DIR'] = ''
+            self.assertEqual(nodegen.default_cache_dir(), '')
+        finally:
+            os.environ.clear()
+            os.environ.update(old_env)
+    
+    def test_generator_digest(self):
+        # Editing the generator changes the module names.
+        asdl = parse_asdl(self.asdl_spec)
+        with tempfile.TemporaryDirectory() as cache_dir:
+            load_nodes(asdl, cache_dir=cache_dir)
+            old_digest = nodegen._generator_digest
+            try:
+                nodegen._generator_digest = 'edited'
+                load_nodes(asdl, cache_dir=cache_dir)
+            finally:
+                nodegen._generator_digest = old_digest
+            files = [fn for fn in os.listdir(cache_dir)
+                     if fn.endswith('.py')]
+            self.assertEqual(len(files), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
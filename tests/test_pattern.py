@@ -3,9 +3,13 @@
 
 import unittest
 
-from iast.python.default import parse, make_pattern, Num, BinOp, Add, Mult
+from iast.util import trim
+from iast.asdl import parse_asdl
+from iast.node import nodes_from_asdl
+from iast.python.default import (parse, make_pattern, Num, BinOp, Add, Mult,
+                                 Name, Load)
 from iast.pattern import *
-from iast.pattern import match_step
+from iast.pattern import match_step, occurs, OccChecker
 
 
 class PatternCase(unittest.TestCase):
@@ -43,6 +47,8 @@ class PatternCase(unittest.TestCase):
         # Circular equation.
         with self.assertRaises(MatchFailure):
             match_step(PatVar('_X'), BinOp(PatVar('_X'), Add(), Num(1)))
+        with self.assertRaises(MatchFailure):
+            match_step(PatVar('_X'), Name(PatVar('_X'), Load()))
         
         # Nodes, constants.
         result = match_step(Num(1), Num(1))
@@ -104,6 +110,31 @@ class PatternCase(unittest.TestCase):
         tree = Trans.run(tree)
         exp_tree = parse('(5 * 2) * (0 - 1)')
         self.assertEqual(tree, exp_tree)
+    
+    def test_pattrans_primitives(self):
+        lang = nodes_from_asdl(parse_asdl(trim('''
+            module Dummy
+            {
+                tree = N(identifier id, tree* kids)
+            }
+            ''')))
+        N = lang['N']
+        
+        # Rules may rewrite values of primitive fields.
+        class Trans(PatternTransformer):
+            rules = [('a', lambda: 'b')]
+        tree = Trans.run(N('a', (N('a', ()),)))
+        self.assertEqual(tree, N('b', (N('b', ()),)))
+    
+    def test_occurs(self):
+        tree = BinOp(Num(1), Add(), PatVar('_X'))
+        self.assertTrue(occurs('_X', tree))
+        self.assertFalse(occurs('_Y', tree))
+        self.assertTrue(OccChecker.run(tree, '_X'))
+        self.assertFalse(OccChecker.run(tree, '_Y'))
+        # Driving the visitor directly reports a match by raising.
+        with self.assertRaises(OccChecker.Found):
+            OccChecker('_X').visit(tree)
 
 
 if __name__ == '__main__':
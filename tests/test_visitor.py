@@ -2,14 +2,39 @@
 
 
 import unittest
+import sys
+import abc
+import gc
 
 from iast.util import trim
-from iast.node import dump
+from iast.asdl import parse_asdl
+from iast.node import dump, nodes_from_asdl, unchecked
+from iast.pattern import PatVar, match
 import iast.python.default as L
 from iast.python.default import parse
 from iast.visitor import *
 
 
+# Visitors for run_many(), which must be importable by worker processes.
+
+class Renamer(NodeTransformer):
+    def visit_Name(self, node):
+        return node._replace(id=node.id + '_')
+
+class Failer(NodeVisitor):
+    def visit_Name(self, node):
+        if node.id == 'bad':
+            raise ValueError(node.id)
+
+class Splicer(Renamer):
+    _context_free = True
+    def visit_Expr(self, node):
+        node = self.generic_visit(node)
+        return [node, node]
+    def visit_Pass(self, node):
+        return []
+
+
 class VisitorCase(unittest.TestCase):
     
     def test_visitor(self):
@@ -25,6 +50,217 @@ class VisitorCase(unittest.TestCase):
         result = Foo.run(tree)
         self.assertEqual(result, {'a', 'foo'})
     
+    def test_visitor_primitive_fields(self):
+        lang = nodes_from_asdl(parse_asdl(trim('''
+            module Dummy
+            {
+                expr = Name(identifier id)
+                     | Call(expr func, string tag, expr* args)
+            }
+            ''')))
+        Name, Call = lang['Name'], lang['Call']
+        tree = Call(Name('f'), 't', (Name('a'), PatVar('_x')))
+        
+        class Foo(NodeVisitor):
+            def process(self, tree):
+                self.values = []
+                super().process(tree)
+                return self.values
+            def visit(self, tree):
+                self.values.append(tree)
+                return super().visit(tree)
+        
+        # Primitive fields are skipped.
+        res = Foo.run(tree)
+        self.assertNotIn('f', res)
+        self.assertNotIn('t', res)
+        self.assertIn(PatVar('_x'), res)
+        
+        # Unless the visitor asks for them.
+        class Bar(Foo):
+            _visit_primitives = True
+        res = Bar.run(tree)
+        self.assertEqual(res, [tree, Name('f'), 'f', 't', tree.args,
+                               Name('a'), 'a', PatVar('_x'), '_x'])
+        
+        # Metasyntactic nodes in primitive fields are still expanded.
+        tree = Call(Name(PatVar('_f')), 't', ())
+        self.assertEqual(match(tree, Call(Name('g'), 't', ())),
+                         {'_f': 'g'})
+    
+    def test_visitor_dispatch(self):
+        lang = nodes_from_asdl(parse_asdl(trim('''
+            module Dummy
+            {
+                expr = BinOp(expr left, op op, expr right) | Num(int n)
+                op = Add | Sub | Mult
+            }
+            ''')))
+        BinOp, Num = lang['BinOp'], lang['Num']
+        Add, Sub, Mult = lang['Add'](), lang['Sub'](), lang['Mult']()
+        tree = BinOp(BinOp(Num(1), Add, Num(2)), Sub, Num(3))
+        
+        class Foo(NodeVisitor):
+            def process(self, tree):
+                self.ops = []
+                super().process(tree)
+                return self.ops
+            def op_helper(self, node):
+                self.ops.append(node.__class__.__name__)
+            visit_Add = visit_Sub = op_helper
+        
+        self.assertEqual(Foo.run(tree), ['Add', 'Sub'])
+        
+        # Handlers assigned after dispatching are honored, including
+        # by subclasses.
+        class Bar(Foo):
+            pass
+        self.assertEqual(Bar.run(tree), ['Add', 'Sub'])
+        Foo.visit_Num = lambda self, node: self.ops.append(node.n)
+        self.assertEqual(Foo.run(tree), [1, 'Add', 2, 'Sub', 3])
+        self.assertEqual(Bar.run(tree), [1, 'Add', 2, 'Sub', 3])
+        del Foo.visit_Num
+        self.assertEqual(Bar.run(tree), ['Add', 'Sub'])
+        
+        # Static methods are bound as usual.
+        class Baz(NodeTransformer):
+            @staticmethod
+            def visit_Add(node):
+                return Mult
+        self.assertEqual(Baz.run(tree),
+                         BinOp(BinOp(Num(1), Mult, Num(2)), Sub, Num(3)))
+        
+        # Visitors may be abstract base classes.
+        class Abstract(NodeVisitor, abc.ABC):
+            @abc.abstractmethod
+            def visit_Add(self, node):
+                pass
+        class Concrete(Abstract, Foo):
+            def visit_Add(self, node):
+                self.ops.append('add')
+        with self.assertRaises(TypeError):
+            Abstract()
+        self.assertEqual(Concrete.run(tree), ['add', 'Sub'])
+    
+    def test_visitor_pruning(self):
+        lang = nodes_from_asdl(parse_asdl(trim('''
+            module Dummy
+            {
+                stmt = Block(stmt* body) | Expr(expr value)
+                expr = BinOp(expr left, expr right) | Num(int n)
+                     | Name(identifier id)
+            }
+            ''')), summarized=True)
+        Block, Expr, BinOp, Num, Name = (lang[name] for name in
+            ['Block', 'Expr', 'BinOp', 'Num', 'Name'])
+        binop = BinOp(Num(1), Num(2))
+        tree = Block((Expr(binop), Expr(Name('a')),
+                      Block((Expr(Num(3)),))))
+        # Make the summary of binop stale, to observe which subtrees
+        # are skipped.
+        binop.__dict__['left'] = Name('z')
+        
+        for base in [NodeVisitor, AdvNodeVisitor, IterNodeVisitor]:
+            class Foo(base):
+                def process(self, tree):
+                    self.names = []
+                    super().process(tree)
+                    return self.names
+                def visit_Name(self, node):
+                    self.names.append(node.id)
+            self.assertEqual(Foo.run(tree), ['a'])
+            
+            # Not when the traversal is overridden.
+            class Bar(Foo):
+                def visit(self, tree, *args, **kargs):
+                    return super().visit(tree, *args, **kargs)
+            self.assertEqual(Bar.run(tree), ['z', 'a'])
+        
+        # leave_ handlers count for the explicit-stack engines.
+        class Baz(IterNodeVisitor):
+            def process(self, tree):
+                self.count = 0
+                super().process(tree)
+                return self.count
+            def leave_BinOp(self, node):
+                self.count += 1
+        self.assertEqual(Baz.run(tree), 1)
+        
+        for base in [NodeTransformer, AdvNodeTransformer,
+                     IterNodeTransformer]:
+            class Foo(base):
+                def visit_Name(self, node):
+                    return node._replace(id='b')
+            result = Foo.run(tree)
+            self.assertIs(result.body[0], tree.body[0])
+            self.assertIs(result.body[2], tree.body[2])
+            self.assertEqual(result.body[1], Expr(Name('b')))
+        
+        class Nums(NodeVisitor):
+            def process(self, tree):
+                self.nums = []
+                super().process(tree)
+                return self.nums
+            def visit_Num(self, node):
+                self.nums.append(node.n)
+        self.assertEqual(run_fused(tree, [Nums, Nums]), [[2, 3], [2, 3]])
+    
+    def test_visitor_static_pruning(self):
+        lang = nodes_from_asdl(parse_asdl(trim('''
+            module Dummy
+            {
+                stmt = Expr(expr value, tag tag)
+                expr = Name(identifier id) | Num(int n)
+                tag = Tag(int n)
+            }
+            ''')), typed=True)
+        Expr, Name, Num, Tag = (lang[name] for name in
+                                ['Expr', 'Name', 'Num', 'Tag'])
+        # A Name where the grammar does not allow one, to observe which
+        # fields are skipped.
+        with unchecked():
+            tree = (Expr(Name('a'), Name('hidden')), Expr(Num(1), Tag(2)))
+        
+        for base in [NodeVisitor, AdvNodeVisitor, IterNodeVisitor]:
+            class Foo(base):
+                def process(self, tree):
+                    self.names = []
+                    super().process(tree)
+                    return self.names
+                def visit_Name(self, node):
+                    self.names.append(node.id)
+            self.assertEqual(Foo.run(tree), ['a'])
+            
+            # Not when there are handlers for classes outside the
+            # grammar, whose nodes could be anywhere.
+            class Bar(Foo):
+                def visit_Other(self, node):
+                    pass
+            self.assertEqual(Bar.run(tree), ['a', 'hidden'])
+        
+        for base in [NodeTransformer, AdvNodeTransformer,
+                     IterNodeTransformer]:
+            class Foo(base):
+                def visit_Name(self, node):
+                    return Num(0)
+            with unchecked():
+                result = Foo.run(tree)
+            self.assertEqual(result[0].value, Num(0))
+            self.assertEqual(result[0].tag, Name('hidden'))
+            self.assertIs(result[1], tree[1])
+        
+        class Names(NodeVisitor):
+            def process(self, tree):
+                self.names = []
+                super().process(tree)
+                return self.names
+            def visit_Name(self, node):
+                self.names.append(node.id)
+        class Nums(Names):
+            def visit_Num(self, node):
+                self.names.append(node.n)
+        self.assertEqual(run_fused(tree, [Names, Nums]), [['a'], ['a', 1]])
+
     def test_visitor_context(self):
         class Foo(AdvNodeVisitor):
             def process(self, tree):
@@ -47,6 +283,72 @@ class VisitorCase(unittest.TestCase):
             (L.Name('b', L.Load()), 'value', None)
         ]
         self.assertEqual(res, exp_res)
+        
+        # Same for transformers, and for overrides passing the field
+        # and index as keyword arguments.
+        class Bar(AdvNodeTransformer):
+            def process(self, tree):
+                self.occ = []
+                return super().process(tree)
+            def visit_Pass(self, node):
+                self.occ.append(self._visit_stack[-1])
+            def visit_Name(self, node):
+                self.occ.append(self._visit_stack[-1])
+        class Baz(Bar):
+            def generic_visit(self, node, *args, **kargs):
+                for field in node._fields:
+                    self.visit(getattr(node, field), _field=field,
+                               _index=None, *args, **kargs)
+                return node
+        for cls in [Bar, Baz]:
+            visitor = cls()
+            self.assertIs(visitor.process(tree), tree)
+            self.assertEqual(visitor.occ, exp_res)
+        
+        # Overrides of seq_visit() that pass only the index get the
+        # field of the sequence for each item.
+        class Quux(Foo):
+            def seq_visit(self, seq, *args, **kargs):
+                for i, item in enumerate(seq):
+                    self.visit(item, _index=i, *args, **kargs)
+        res = Quux.run(parse('pass; pass'))
+        self.assertEqual(res, [(L.Pass(), 'body', 0), (L.Pass(), 'body', 1)])
+        
+        # The stack may be assigned.
+        visitor = Foo()
+        visitor._visit_stack = [(tree, None, None)]
+        self.assertEqual(list(visitor._visit_stack), [(tree, None, None)])
+        
+        # The stack as a whole.
+        class Foo(AdvNodeVisitor):
+            def visit_Name(self, node):
+                stack = self._visit_stack
+                self.parents = [n.__class__.__name__ for n, _f, _i
+                                in stack[:-1]]
+                self.length = len(stack)
+                self.parent = stack[-2][0]
+        visitor = Foo()
+        visitor.process(parse('a'))
+        self.assertEqual(visitor.parents, ['Module', 'Expr'])
+        self.assertEqual(visitor.length, 3)
+        self.assertIsInstance(visitor.parent, L.Expr)
+        
+        # Extra arguments are passed along.
+        class Foo(AdvNodeVisitor):
+            def process(self, tree):
+                self.occ = []
+                super().process(tree)
+                return self.occ
+            def visit_Assign(self, node):
+                self.generic_visit(node, 'x', key='y')
+            def visit_Name(self, node, *args, **kargs):
+                self.occ.append((self._visit_stack[-1], args, kargs))
+        res = Foo.run(parse('a = b'))
+        exp_res = [
+            ((L.Name('a', L.Store()), 'targets', 0), ('x',), {'key': 'y'}),
+            ((L.Name('b', L.Load()), 'value', None), ('x',), {'key': 'y'}),
+        ]
+        self.assertEqual(res, exp_res)
     
     def test_transformer(self):
         # Basic functionality.
@@ -98,6 +400,315 @@ class VisitorCase(unittest.TestCase):
         exp_tree = parse('return')
         self.assertEqual(tree, exp_tree)
     
+    def test_memo_transformer(self):
+        class Foo(MemoNodeTransformer):
+            def process(self, tree):
+                self.calls = 0
+                return super().process(tree)
+            def visit_Name(self, node):
+                self.calls += 1
+                return node._replace(id=node.id + '_')
+        
+        expr = L.BinOp(L.Name('x', L.Load()), L.Add(), L.Num(1))
+        body = (L.Expr(expr), L.Expr(expr))
+        tree = L.Module(body + (L.If(L.Name('c', L.Load()), body, ()),))
+        exp_tree = parse(trim('''
+            x_ + 1
+            x_ + 1
+            if c_:
+                x_ + 1
+                x_ + 1
+            '''))
+        
+        visitor = Foo()
+        result = visitor.process(tree)
+        self.assertEqual(result, exp_tree)
+        self.assertEqual(visitor.calls, 2)
+        # Sharing is preserved in the output.
+        self.assertIs(result.body[0].value, result.body[1].value)
+        self.assertIs(result.body[2].body[0], result.body[0])
+        
+        # With a bounded cache, the result is the same.
+        visitor._memo_size = 1
+        result = visitor.process(tree)
+        self.assertEqual(result, exp_tree)
+        self.assertGreater(visitor.calls, 2)
+    
+    def test_iter_engine(self):
+        # Same results as the recursive engine.
+        def make_visitor(base):
+            class Foo(base):
+                def process(self, tree):
+                    self.log = []
+                    super().process(tree)
+                    return self.log
+                def visit_Name(self, node):
+                    self.log.append(node.id)
+                def visit_FunctionDef(self, node):
+                    self.log.append('def ' + node.name)
+                    self.generic_visit(node)
+                    self.log.append('end')
+            return Foo
+        
+        def make_transformer(base):
+            class Foo(base):
+                def visit_Name(self, node):
+                    if node.id == 'a':
+                        return node._replace(id='c')
+                def visit_Expr(self, node):
+                    node = self.generic_visit(node)
+                    if isinstance(node.value, L.Str):
+                        return []
+                    return [node, node]
+            return Foo
+        
+        tree = parse('''
+            def f(a, b):
+                "doc"
+                a = b + g(a)
+                print(a)
+            x = [a, (b, a)]
+            ''')
+        self.assertEqual(make_visitor(IterNodeVisitor).run(tree),
+                         make_visitor(NodeVisitor).run(tree))
+        self.assertEqual(make_transformer(IterNodeTransformer).run(tree),
+                         make_transformer(NodeTransformer).run(tree))
+        self.assertIs(IterNodeTransformer.run(tree), tree)
+        
+        # Postorder handlers.
+        class Foo(IterNodeVisitor):
+            def process(self, tree):
+                self.log = []
+                super().process(tree)
+                return self.log
+            def leave_BinOp(self, node):
+                self.log.append('BinOp')
+            def leave_Name(self, node):
+                self.log.append(node.id)
+        tree = parse('(a + b) * c')
+        self.assertEqual(Foo.run(tree), ['a', 'b', 'BinOp', 'c', 'BinOp'])
+        
+        class Foo(IterNodeTransformer):
+            def leave_BinOp(self, node):
+                if (isinstance(node.left, L.Num) and
+                    isinstance(node.right, L.Num)):
+                    return L.Num(node.left.n + node.right.n)
+        tree = parse('x = (1 + 2) + 3')
+        self.assertEqual(Foo.run(tree), parse('x = 6'))
+    
+    def test_iter_engine_deep(self):
+        # Trees deeper than the recursion limit.
+        depth = 2 * sys.getrecursionlimit()
+        tree = L.Name('x', L.Load())
+        for _ in range(depth):
+            tree = L.UnaryOp(L.USub(), tree)
+        
+        class Foo(IterNodeVisitor):
+            def process(self, tree):
+                self.count = 0
+                super().process(tree)
+                return self.count
+            def visit_USub(self, node):
+                self.count += 1
+        self.assertEqual(Foo.run(tree), depth)
+        
+        class Bar(IterNodeTransformer):
+            def visit_Name(self, node):
+                return node._replace(id='y')
+        result = Bar.run(tree)
+        for _ in range(depth):
+            result = result.operand
+        self.assertEqual(result, L.Name('y', L.Load()))
+    
+    def test_fused(self):
+        log = []
+        
+        class Names(NodeVisitor):
+            def process(self, tree):
+                self.names = []
+                super().process(tree)
+                return self.names
+            def visit_Name(self, node):
+                log.append('Names')
+                self.names.append(node.id)
+        
+        # Prunes function bodies.
+        class TopNames(Names):
+            def visit_FunctionDef(self, node):
+                pass
+        
+        # Recurses itself, postorder.
+        class Calls(NodeVisitor):
+            def process(self, tree):
+                self.calls = []
+                super().process(tree)
+                return self.calls
+            def visit_Call(self, node):
+                self.generic_visit(node)
+                self.calls.append(node.func.id)
+        
+        # Overrides the traversal.
+        class Counter(NodeVisitor):
+            def process(self, tree):
+                self.count = 0
+                super().process(tree)
+                return self.count
+            def visit(self, tree):
+                self.count += 1
+                return super().visit(tree)
+        
+        class Root(NodeVisitor):
+            def visit_Module(self, node):
+                return 'root'
+        
+        tree = parse(trim('''
+            a = f(g(b))
+            def h(x):
+                return c
+            '''))
+        visitors = [Names, TopNames, Calls, Counter, Root]
+        expected = [v.run(tree) for v in visitors]
+        self.assertEqual(expected[:3], [['a', 'f', 'g', 'b', 'c'],
+                                        ['a', 'f', 'g', 'b'],
+                                        ['g', 'f']])
+        self.assertEqual(run_fused(tree, visitors), expected)
+        
+        # Instances may be passed, and handlers of the same visitor
+        # are called in the same order.
+        v = Names()
+        result = run_fused(tree, [v, Calls])
+        self.assertEqual(result[0], expected[0])
+        self.assertIs(result[0], v.names)
+        self.assertNotIn('visit', v.__dict__)
+        
+        # Instances of the same class each see every name.
+        log.clear()
+        run_fused(tree, [Names, Names])
+        self.assertEqual(len(log), 10)
+        
+        self.assertEqual(run_fused((), [Names, Root]), [[], None])
+        self.assertEqual(run_fused(5, [Root]), [5])
+        self.assertEqual(run_fused(tree, []), [])
+    
+    def test_iter_nodes(self):
+        tree = parse('a = b + f(c)')
+        def ids(nodes):
+            return [node.id if isinstance(node, L.Name) else
+                    type(node).__name__ for node in nodes]
+        
+        result = ids(iter_nodes(tree, kinds=['Name', 'Call']))
+        self.assertEqual(result, ['a', 'b', 'Call', 'f', 'c'])
+        result = ids(iter_nodes(tree, kinds='Name', order='post'))
+        self.assertEqual(result, ['a', 'b', 'f', 'c'])
+        result = ids(iter_nodes(tree, kinds=['Name', 'BinOp'],
+                                order='post'))
+        self.assertEqual(result, ['a', 'b', 'f', 'c', 'BinOp'])
+        result = ids(iter_nodes(tree, kinds=['Name', 'BinOp'],
+                                order='bfs'))
+        self.assertEqual(result, ['a', 'BinOp', 'b', 'f', 'c'])
+        result = ids(iter_nodes(tree.body[0].value))
+        self.assertEqual(result, ['BinOp', 'b', 'Load', 'Add', 'Call',
+                                  'f', 'Load', 'c', 'Load'])
+        with self.assertRaises(ValueError):
+            iter_nodes(tree, order='in')
+        
+        # Early termination.
+        seen = []
+        def pred(node):
+            seen.append(node.id)
+            return node.id == 'b'
+        result = find_first(tree, pred, kinds=['Name'])
+        self.assertEqual(result.id, 'b')
+        self.assertEqual(seen, ['a', 'b'])
+        self.assertIsNone(find_first(tree, kinds=['Pass']))
+        self.assertTrue(any_node(tree, lambda node: node.id == 'c',
+                                 kinds=['Name']))
+        self.assertFalse(any_node(tree, lambda node: node.id == 'd',
+                                  kinds=['Name']))
+        
+        # Primitive fields.
+        tree = L.Name(PatVar('x'), L.Load())
+        self.assertIsNone(find_first(tree, kinds=['PatVar']))
+        self.assertEqual(find_first(tree, kinds=['PatVar'], primitives=True),
+                         PatVar('x'))
+        
+        # Pruning by summaries and by grammar reachability.
+        lang = nodes_from_asdl(parse_asdl(trim('''
+            module Dummy
+            {
+                stmt = Expr(expr value, tag tag)
+                expr = BinOp(expr left, expr right) | Num(int n)
+                     | Name(identifier id)
+                tag = Tag(int n)
+            }
+            ''')), typed=True, summarized=True)
+        Expr, BinOp, Num, Name, Tag = (lang[name] for name in
+            ['Expr', 'BinOp', 'Num', 'Name', 'Tag'])
+        binop = BinOp(Num(1), Num(2))
+        with unchecked():
+            tree = (Expr(binop, Tag(1)), Expr(Name('a'), Name('hidden')))
+        # Make the summary of binop stale.
+        binop.__dict__['left'] = Name('z')
+        result = [node.id for node in iter_nodes(tree, kinds=['Name'])]
+        self.assertEqual(result, ['a'])
+        result = [type(node).__name__ for node in iter_nodes(tree[0])]
+        self.assertEqual(result, ['Expr', 'BinOp', 'Name', 'Num', 'Tag'])
+        
+        # Cached plans are bounded, and do not keep node classes alive.
+        from iast import visitor
+        for i in range(visitor._WALK_PLANS_MAX + 10):
+            list(iter_nodes(tree[0], kinds=['Name', str(i)]))
+        self.assertEqual(len(visitor._walk_plans), visitor._WALK_PLANS_MAX)
+        plans = visitor._walk_plans[(frozenset(['Name', str(i)]),
+                                     False, False)]
+        self.assertIn(Expr, plans)
+        del lang, Expr, BinOp, Num, Name, Tag, binop, tree
+        gc.collect()
+        self.assertEqual(len(plans), 0)
+    
+    def test_run_many(self):
+        trees = [parse('a = b + {}'.format(i)) for i in range(10)]
+        exp = [Renamer.run(tree) for tree in trees]
+        for workers, nodes in [(1, None), (2, None), (2, L.py_nodes)]:
+            results = Renamer.run_many(trees, workers=workers, nodes=nodes,
+                                       chunksize=3)
+            self.assertEqual(list(results), exp)
+            results = Renamer.run_many(trees, workers=workers, nodes=nodes,
+                                       ordered=False)
+            self.assertEqual(dict(results), dict(enumerate(exp)))
+        
+        # Failures report the index of the tree.
+        trees[3] = parse('bad')
+        for workers, nodes in [(1, None), (2, L.py_nodes)]:
+            with self.assertRaises(RunManyError) as cm:
+                list(Failer.run_many(trees, workers=workers, nodes=nodes))
+            self.assertEqual(cm.exception.index, 3)
+            self.assertIsInstance(cm.exception.__cause__, ValueError)
+    
+    def test_run_split(self):
+        tree = parse(trim('''
+            a = 1
+            b
+            pass
+            def f():
+                c
+            '''))
+        exp_tree = Splicer.run(tree)
+        for workers, nodes in [(1, None), (2, None), (2, L.py_nodes)]:
+            result = Splicer.run_split(tree, workers=workers, nodes=nodes)
+            self.assertEqual(result, exp_tree)
+            result = Splicer.run_split(tree.body, workers=workers,
+                                       nodes=nodes)
+            self.assertEqual(result, exp_tree.body)
+        
+        # Unchanged statements are kept.
+        tree = parse('import os; pass')
+        result = Splicer.run_split(tree, workers=2, nodes=L.py_nodes)
+        self.assertIs(result.body[0], tree.body[0])
+        
+        with self.assertRaises(TypeError):
+            Renamer.run_split(tree)
+    
     def test_counter(self):
         class Foo(ChangeCounter, NodeTransformer):
             def visit_Name(self, node):
@@ -109,7 +720,7 @@ class VisitorCase(unittest.TestCase):
         exp_tree = parse('aa + bb + cc + "s"')
         
         self.assertEqual(tree, exp_tree)
-        self.assertEqual(instr['visited'], 14)
+        self.assertEqual(instr['visited'], 13)
         self.assertEqual(instr['changed'], 9)
 
 